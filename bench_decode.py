@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+ひらがな→数字の変換のマイクロベンチマーク
+
+OCR の結果は前処理のバリエーションごと・ソルバーごとに変換されるため、1回あたりの時間を
+以前の実装（呼び出しごとに表を作り、先頭から最長一致で1文字ずつ print する）と比べる。
+Chrome や EasyOCR は不要。
+
+使い方:
+    python bench_decode.py
+    python bench_decode.py --number 20000
+"""
+
+import argparse
+import contextlib
+import io
+import re
+import timeit
+
+from captcha_answer import best_decode, decode_digits
+
+# (OCR の読み, 正解)
+SAMPLES = [
+    ("さんろくきゅうにいちはち", "369218"),
+    ("しち よん ご-ろく に いち", "745621"),
+    ("ななしちきゅうくはちぜろ", "779980"),
+    ("れいいち２３よんご", "012345"),
+    ("さん・ろく・きゅう・に・いち・はち", "369218"),
+    ("「さん」ろくきゅう?にいち。はち", "369218"),     # 読み飛ばす文字があるため区切り方を探索する
+    ("369218 になります", "369218"),                 # 最長一致では7桁になるため区切り方を探索する
+    ("369218", "369218"),
+]
+
+
+def previous_convert(text):
+    """以前の convert_hiragana_to_numbers（比較用）"""
+    hiragana_map = {
+        'ぜろ': '0', 'れい': '0', 'いち': '1', 'に': '2', 'さん': '3',
+        'よん': '4', 'よ': '4', 'し': '4', 'ご': '5', 'ろく': '6',
+        'なな': '7', 'しち': '7', 'はち': '8', 'きゅう': '9', 'く': '9'
+    }
+    hiragana_keys = sorted(hiragana_map.keys(), key=len, reverse=True)
+    text = re.sub(r'[\s\-ー]', '', text)
+    result = ""
+    i = 0
+    while i < len(text):
+        found = False
+        for key in hiragana_keys:
+            if text[i:].startswith(key):
+                result += hiragana_map[key]
+                print(f"🔢 変換: '{key}' → '{hiragana_map[key]}'")
+                i += len(key)
+                found = True
+                break
+        if not found:
+            if text[i].isdigit():
+                result += text[i]
+                print(f"🔢 数字を直接追加: '{text[i]}'")
+            else:
+                print(f"⚠️  変換できない文字をスキップ: '{text[i]}'")
+            i += 1
+    return result
+
+
+def _per_call_us(func, number):
+    texts = [text for text, _ in SAMPLES]
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds = timeit.timeit(lambda: [func(text) for text in texts], number=number)
+    return seconds / (number * len(texts)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ひらがな→数字の変換のマイクロベンチマーク")
+    parser.add_argument("--number", type=int, default=5000, help="サンプル全体を変換する回数")
+    args = parser.parse_args()
+
+    cases = [
+        ("以前の実装（表の作成・print あり）", previous_convert),
+        ("decode_digits", lambda text: decode_digits(text)[0]),
+        ("best_decode（候補2件）", lambda text: best_decode([text, text[:-1]])["text"]),
+    ]
+
+    print(f"🧪 ひらがな→数字の変換（{len(SAMPLES)}件 × {args.number}回、1回あたり）")
+    print("=" * 60)
+    for name, func in cases:
+        print(f"{name:<36}{_per_call_us(func, args.number):>10.2f}µs")
+    print("=" * 60)
+
+    print("正解との比較（以前の実装 / decode_digits）:")
+    with contextlib.redirect_stdout(io.StringIO()):
+        previous = [previous_convert(text) for text, _ in SAMPLES]
+    for (text, expected), old in zip(SAMPLES, previous):
+        new = decode_digits(text)[0]
+        marks = "".join("✅" if result == expected else "❌" for result in (old, new))
+        print(f"  {marks} {text} → {old} / {new}（正解 {expected}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+更新処理のベンチマーク: ローカルの XServer パネル（fake_xserver_panel.py）に対して各エントリーポイントの
+main() を実行し、ステップ（ページ）ごとの時間と全体の時間を計測する
+
+ステップの時間は、パネルがそのページのリクエストを受けてから次のリクエストを受けるまでの時間
+（ページの読み込み・要素の待機・入力を含む）。最初のリクエストまでは Python と Chrome の起動、
+最後のリクエストの後はブラウザの終了の時間になる。
+
+画像認証は、OCR などの解析時間を含めないよう既定ではパネルの正解を返す（--captcha fixture）:
+    xserver2.py          solve_captcha.py と同じ受け渡し（captcha_handoff）で正解を送る
+    xserver_improved.py  OCR の代わりに正解を返す
+    xserver.py           画像認証に対応していないため、画像認証なしのパネルで計測する
+--captcha real でスクリプト自身の解析を使い、--captcha off で画像認証を出さない。
+
+Chrome と chromedriver（selenium）が必要。
+
+使い方:
+    python bench_panel.py                               # 各エントリーポイントを3回ずつ計測
+    python bench_panel.py --runs 5 --latency 0.1 --fail detail=1
+    python bench_panel.py --only xserver2.py --page-latency captcha=2
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from fake_xserver_panel import add_panel_arguments, panel_from_arguments
+
+ENTRY_POINTS = {
+    "xserver.py": "xserver",
+    "xserver2.py": "xserver2",
+    "xserver_improved.py": "xserver_improved",
+}
+
+# --captcha fixture でスクリプトに加える設定（画像認証の解析時間を計測から除く）
+# （解析ステージは renewal_engine から名前で引かれるため、エンジンの関数を置き換える）
+CAPTCHA_FIXTURES = {
+    "xserver2": "renewal_engine.OCR_AVAILABLE = False  # 受け渡し（captcha_handoff）で正解を受け取る",
+    "xserver_improved": ("renewal_engine.OCR_AVAILABLE = True\n"
+                         "    renewal_engine.preload_reader = lambda *args, **kwargs: None\n"
+                         "    renewal_engine.solve_with_ocr = lambda *args, **kwargs: {answer!r}"),
+}
+
+CHILD_TEMPLATE = """
+import contextlib, importlib, io, json, sys
+import renewal_engine
+output = io.StringIO()
+with contextlib.redirect_stdout(output):
+    module = importlib.import_module({module!r})
+    module.SERVER_ID = {server_id!r}
+    module.HEADLESS = {headless!r}
+    {fixture}
+    result = module.main()
+sys.stderr.write(output.getvalue()[-4000:])
+print("BENCH_RESULT " + json.dumps({{"ok": result is not False}}))
+"""
+
+
+def _answer_over_handoff(answer, port, stop):
+    """xserver2.py の画像認証に solve_captcha.py と同じ方法で正解を送る"""
+    from captcha_handoff import SolutionClient
+
+    while not stop.is_set():
+        client = SolutionClient(port=port)
+        if client.wait_for_captcha(timeout=0.5) is not None:
+            client.submit(answer)
+        client.close()
+
+
+def run_once(entry_point, panel, args, workdir, handoff_port):
+    """新しいプロセスで1回実行し、結果の dict を返す（失敗時は error キーを含む）"""
+    module = ENTRY_POINTS[entry_point]
+    fixture = "pass"
+    if args.captcha == "fixture" and module in CAPTCHA_FIXTURES:
+        fixture = CAPTCHA_FIXTURES[module].format(answer=panel.captcha_answer)
+    code = CHILD_TEMPLATE.format(module=module, server_id=next(iter(panel.servers)),
+                                 headless=not args.show_browser, fixture=fixture)
+
+    env = dict(os.environ,
+               XSERVER_BASE_URL=panel.base_url,
+               XSERVER_SERVER_IDS=",".join(panel.servers),
+               XSERVER_STATE_FILE=os.path.join(workdir, "xserver_state.json"),
+               XSERVER_IGNORE_STATE="true",
+               CAPTCHA_HANDOFF_PORT=str(handoff_port),
+               CAPTCHA_RACE_MODE="false",
+               CLAUDE_CODE_FIRST="false",
+               PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                        os.environ.get("PYTHONPATH")])))
+    # 毎回ログインから計測する
+    env.pop("XSERVER_COOKIE_JAR", None)
+    env.pop("XSERVER_CHROME_PROFILE_DIR", None)
+
+    stop = threading.Event()
+    helper = None
+    if module == "xserver2" and args.captcha != "off":
+        helper = threading.Thread(target=_answer_over_handoff, args=(panel.captcha_answer, handoff_port, stop),
+                                  daemon=True)
+        helper.start()
+
+    panel.reset_log()
+    started = time.perf_counter()
+    try:
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env,
+                                cwd=workdir, timeout=args.timeout)
+    except subprocess.TimeoutExpired:
+        return {"error": f"{args.timeout}秒以内に終了しませんでした"}
+    finally:
+        stop.set()
+    finished = time.perf_counter()
+    if helper:
+        helper.join(timeout=2)
+
+    measured = None
+    for line in result.stdout.splitlines():
+        if line.startswith("BENCH_RESULT "):
+            measured = json.loads(line[len("BENCH_RESULT "):])
+    if measured is None:
+        error = (result.stderr.strip().splitlines() or ["不明なエラー"])[-1]
+        return {"error": error}
+
+    measured["total"] = finished - started
+    measured["steps"] = step_times(panel.requests, started, finished)
+    measured["failures"] = sum(1 for *_, status in panel.requests if status >= 500)
+    if not measured["ok"]:
+        measured["log"] = result.stderr
+    return measured
+
+
+def step_times(requests, started, finished):
+    """
+    パネルが受けたリクエストの時刻から、ステップ名 → 時間（秒）を求める
+
+    同じページへのリクエスト（再読み込み・複数サーバー）はまとめて合計する。
+    """
+    steps = {}
+    timeline = [(at, f"{method} {page}") for at, method, page, _ in sorted(requests) if page != "other"]
+    if not timeline:
+        steps["起動〜終了（リクエストなし）"] = finished - started
+        return steps
+
+    steps["起動〜最初のリクエスト"] = timeline[0][0] - started
+    for (at, name), (next_at, _) in zip(timeline, timeline[1:] + [(finished, None)]):
+        steps[name] = steps.get(name, 0.0) + (next_at - at)
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ローカルの XServer パネルに対する更新処理のベンチマーク")
+    add_panel_arguments(parser)
+    parser.add_argument("--runs", type=int, default=3, help="エントリーポイントごとの実行回数")
+    parser.add_argument("--only", action="append", choices=list(ENTRY_POINTS), help="計測するエントリーポイント")
+    parser.add_argument("--captcha", choices=["fixture", "real", "off"], default="fixture",
+                        help="画像認証の扱い（fixture: 正解を返す, real: スクリプト自身の解析, off: 画像認証なし）")
+    parser.add_argument("--show-browser", action="store_true", help="ヘッドレスにせずブラウザを表示する")
+    parser.add_argument("--timeout", type=float, default=600, help="1回の実行の制限時間（秒）")
+    parser.add_argument("--handoff-port", type=int, default=47616, help="xserver2.py の画像認証の受け渡しに使うポート")
+    args = parser.parse_args()
+    if args.captcha == "off":
+        args.no_captcha = True
+
+    workdir = tempfile.mkdtemp(prefix="bench_panel_")
+    keep_workdir = False
+    with panel_from_arguments(args) as panel:
+        initial_servers = dict(panel.servers)
+        initial_failures = dict(panel.failures)
+        print(f"🧪 ローカルパネルでの更新ベンチマーク（{panel.base_url}、各{args.runs}回の中央値）")
+
+        try:
+            for entry_point in args.only or ENTRY_POINTS:
+                # xserver.py は画像認証に対応していないため、画像認証なしで計測する
+                panel.captcha = not args.no_captcha and entry_point != "xserver.py"
+                runs = []
+                for _ in range(args.runs):
+                    panel.servers = dict(initial_servers)   # 毎回「更新が必要」な状態から始める
+                    panel.failures = dict(initial_failures)
+                    runs.append(run_once(entry_point, panel, args, workdir, args.handoff_port))
+
+                print("=" * 78)
+                print(f"{entry_point}（画像認証: {'あり' if panel.captcha else 'なし'}）")
+                errors = [run["error"] for run in runs if "error" in run]
+                if errors:
+                    print(f"  ❌ 計測できませんでした: {errors[0]}")
+                    continue
+                failed = [run for run in runs if not run["ok"]]
+                if failed:
+                    keep_workdir = True
+                    print(f"  ⚠️  {len(failed)}/{len(runs)}回は更新に失敗しました（スクリーンショット: {workdir}）")
+                    print("  " + "\n  ".join(failed[0]["log"].strip().splitlines()[-5:]))
+
+                names = list(dict.fromkeys(name for run in runs for name in run["steps"]))
+                for name in names:
+                    values = [run["steps"].get(name, 0.0) for run in runs]
+                    print(f"  {name:<40}{statistics.median(values) * 1000:>10.0f}ms")
+                print("  " + "-" * 50)
+                print(f"  {'合計':<40}{statistics.median(run['total'] for run in runs) * 1000:>10.0f}ms")
+                injected = sum(run["failures"] for run in runs)
+                if injected:
+                    print(f"  （HTTP 503 を返したリクエスト: 計{injected}回）")
+        finally:
+            if not keep_workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+起動時間ベンチマーク: 各エントリーポイントの import から更新判定までの時間を計測する
+
+スケジュール実行の大半は「まだ更新時期ではない」で終わるため、その経路で
+cv2 / torch / anthropic などの重いパッケージが読み込まれていないかも合わせて確認する。
+計測中は一時的な状態ファイル（利用期限が3日後）を使うため、ブラウザは起動しない。
+
+使い方:
+    python bench_startup.py            # 各エントリーポイントを5回ずつ計測
+    python bench_startup.py --runs 10
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import renewal_state
+
+HEAVY_MODULES = ["selenium", "cv2", "numpy", "PIL", "easyocr", "torch", "anthropic", "claude_code_integration"]
+
+# 各エントリーポイントで「更新不要」と判定されるまでの処理
+DECISIONS = {
+    "xserver.py": ("xserver", "module.is_update_due()"),
+    "xserver2.py": ("xserver2", "module.main()"),
+    "xserver_improved.py": ("xserver_improved", "module.main()"),
+}
+
+CHILD_TEMPLATE = """
+import contextlib, importlib, io, json, sys, time
+from datetime import datetime, timedelta
+started = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    module = importlib.import_module({module!r})
+    imported = time.perf_counter()
+    {decision}
+decided = time.perf_counter()
+print("BENCH_RESULT " + json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "decision_ms": (decided - imported) * 1000,
+    "loaded": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def write_not_due_state(path):
+    """全エントリーポイントのサーバーIDについて、利用期限が3日後の状態ファイルを作る"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    expiry = datetime.now() + timedelta(days=3)
+    for entry_point in DECISIONS:
+        with open(os.path.join(here, entry_point), encoding="utf-8") as f:
+            match = re.search(r'^SERVER_ID = "(\w+)"', f.read(), re.MULTILINE)
+        if match:
+            renewal_state.record_expiry(match.group(1), expiry, path)
+
+
+def run_once(entry_point, state_path):
+    """新しいプロセスで1回計測し、結果の dict を返す（失敗時は error キーを含む）"""
+    module, decision = DECISIONS[entry_point]
+    code = CHILD_TEMPLATE.format(module=module, decision=decision, heavy=HEAVY_MODULES)
+    env = dict(os.environ, XSERVER_STATE_FILE=state_path, XSERVER_IGNORE_STATE="false", XSERVER_TRACE_FILE="")
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=300)
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    for line in result.stdout.splitlines():
+        if line.startswith("BENCH_RESULT "):
+            measured = json.loads(line[len("BENCH_RESULT "):])
+            measured["wall_ms"] = wall_ms
+            return measured
+
+    error = (result.stderr.strip().splitlines() or ["不明なエラー"])[-1]
+    return {"error": error}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="エントリーポイントの起動時間ベンチマーク")
+    parser.add_argument("--runs", type=int, default=5, help="エントリーポイントごとの計測回数")
+    args = parser.parse_args()
+
+    print(f"🧪 起動時間ベンチマーク（import → 更新判定、各{args.runs}回の中央値）")
+    print("=" * 78)
+    print(f"{'エントリーポイント':<22}{'プロセス全体':>12}{'import':>10}{'判定':>8}  読み込まれた重いモジュール")
+    print("-" * 78)
+
+    state_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    state_path = os.path.join(state_dir, "xserver_state.json")
+    write_not_due_state(state_path)
+
+    try:
+        for entry_point in DECISIONS:
+            runs = [run_once(entry_point, state_path) for _ in range(args.runs)]
+            errors = [run["error"] for run in runs if "error" in run]
+            if errors:
+                print(f"{entry_point:<22}❌ 計測できませんでした: {errors[0]}")
+                continue
+
+            wall = statistics.median(run["wall_ms"] for run in runs)
+            imported = statistics.median(run["import_ms"] for run in runs)
+            decided = statistics.median(run["decision_ms"] for run in runs)
+            loaded = ", ".join(runs[-1]["loaded"]) or "なし"
+            print(f"{entry_point:<22}{wall:>10.1f}ms{imported:>8.1f}ms{decided:>6.1f}ms  {loaded}")
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
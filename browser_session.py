@@ -0,0 +1,261 @@
+"""
+ブラウザの起動・ログインと、認証済みセッションの再利用
+
+専用の Chrome プロファイル（XSERVER_CHROME_PROFILE_DIR）または保存したクッキー
+（XSERVER_COOKIE_JAR）を使うと、フォームに入力する前に VPS 詳細ページを直接開いて
+セッションがまだ有効かを確認し、無効な場合だけログインする。
+
+環境変数:
+    XSERVER_CHROME_PROFILE_DIR  自分のアカウント専用の Chrome ユーザーデータディレクトリ
+    XSERVER_COOKIE_JAR          ログイン後のクッキーを保存する JSON ファイル
+    XSERVER_CONCURRENT_TABS     true で各サーバーの詳細ページを別タブで同時に読み込む
+    XSERVER_BASE_URL            パネルのURL（fake_xserver_panel.py のローカルサーバーで試す場合に指定）
+"""
+import json
+import os
+import tempfile
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+
+import failure_artifacts
+import lean_navigation
+from page_waits import wait_for_any, wait_for, any_visible, text_visible
+
+BASE_URL = os.getenv("XSERVER_BASE_URL", "https://secure.xserver.ne.jp").rstrip("/")
+LOGIN_URL = f"{BASE_URL}/xapanel/login/xvps/"
+PANEL_URL = f"{BASE_URL}/xapanel/xvps/"
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36'
+
+CHROME_PROFILE_DIR = os.getenv("XSERVER_CHROME_PROFILE_DIR")
+COOKIE_JAR = os.getenv("XSERVER_COOKIE_JAR")
+CONCURRENT_TABS = os.getenv("XSERVER_CONCURRENT_TABS", "false").lower() == "true"
+
+
+def detail_url(server_id):
+    """VPS詳細ページのURL"""
+    return f"{PANEL_URL}server/detail?id={server_id}"
+
+
+def build_chrome_options(headless=False):
+    """Chrome の起動オプションを作成（専用プロファイルが指定されていれば使用）"""
+    options = webdriver.ChromeOptions()
+    options.add_argument(f'--user-agent={USER_AGENT}')
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    if headless:
+        options.add_argument("--headless")
+    if CHROME_PROFILE_DIR:
+        options.add_argument(f"--user-data-dir={os.path.abspath(CHROME_PROFILE_DIR)}")
+        print(f"📂 専用の Chrome プロファイルを使用します: {CHROME_PROFILE_DIR}")
+    return lean_navigation.apply_page_load_strategy(options)
+
+
+def session_reuse_enabled():
+    """保存済みセッションを再利用する設定になっているか"""
+    return bool(CHROME_PROFILE_DIR or COOKIE_JAR)
+
+
+def load_cookies(driver, path=None):
+    """
+    保存したクッキーをブラウザに読み込む（ページ遷移なしで DevTools 経由で設定）
+
+    Returns:
+        bool: クッキーを読み込めた場合 True
+    """
+    path = path or COOKIE_JAR
+    if not path or not os.path.exists(path):
+        return False
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cookies = json.load(f)
+        for cookie in cookies:
+            params = {key: cookie[key] for key in ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite")
+                      if key in cookie}
+            if "expiry" in cookie:
+                params["expires"] = cookie["expiry"]
+            driver.execute_cdp_cmd("Network.setCookie", params)
+        print(f"🍪 保存済みのクッキーを読み込みました: {path} ({len(cookies)}件)")
+        return True
+    except (OSError, ValueError, WebDriverException) as e:
+        print(f"⚠️  クッキーの読み込みに失敗しました: {e}")
+        return False
+
+
+def save_cookies(driver, path=None):
+    """現在のクッキーを保存する（本人だけが読めるファイルにアトミックに書き込む）"""
+    path = path or COOKIE_JAR
+    if not path:
+        return
+    try:
+        cookies = driver.get_cookies()
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(prefix=".xserver_cookies_", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(cookies, f, ensure_ascii=False, indent=2)
+            os.chmod(temp_path, 0o600)
+            os.replace(temp_path, path)
+        finally:
+            # 書き込みに失敗した場合はセッションを含む一時ファイルを残さない
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        print(f"🍪 ログイン後のクッキーを保存しました: {path}")
+    except (OSError, TypeError, ValueError, WebDriverException) as e:
+        print(f"⚠️  クッキーの保存に失敗しました: {e}")
+
+
+def resume_session(driver, server_id, timeout=15):
+    """
+    保存済みのセッションで VPS 詳細ページを直接開き、ログイン済みかを確認する
+
+    Returns:
+        bool: セッションが有効で詳細ページが表示された場合 True
+              （False の場合、ブラウザはログインページにいる可能性がある）
+    """
+    if not session_reuse_enabled():
+        return False
+
+    load_cookies(driver)
+    print("🔑 保存済みのセッションで VPS 詳細ページを開きます。")
+    driver.get(detail_url(server_id))
+    try:
+        page_state, _ = wait_for_any(driver, {
+            "login_form": EC.presence_of_element_located((By.NAME, "memberid")),
+            "detail": text_visible('利用期限'),
+        }, timeout=timeout)
+    except TimeoutException:
+        page_state = None
+
+    if page_state == "detail":
+        print("✅ セッションは有効です。ログインをスキップします。")
+        lean_navigation.report_page(driver, "detail")
+        return True
+    print("🔑 セッションが無効なため、ログインします。")
+    return False
+
+
+def login(driver, wait, username, password):
+    """
+    ログインフォームに入力してログインする
+
+    Returns:
+        bool: ログインに成功した場合 True
+    """
+    # 1. ログインページ（セッション確認でログインページに戻されていれば再読み込みしない）
+    if not driver.find_elements(By.NAME, "memberid"):
+        print("1. ログインページにアクセスします。")
+        driver.get(LOGIN_URL)
+
+    # 要素がクリック可能になるまで待機
+    print("2. ログインIDの要素を待機します。")
+    login_id_element = wait.until(EC.element_to_be_clickable((By.NAME, "memberid")))
+    lean_navigation.report_page(driver, "login")
+    print("3. パスワードの要素を待機します。")
+    login_pw_element = wait.until(EC.element_to_be_clickable((By.NAME, "user_password")))
+
+    print("4. ユーザー名とパスワードを入力します。")
+    login_id_element.clear()
+    login_id_element.send_keys(username)
+    login_pw_element.clear()
+    login_pw_element.send_keys(password)
+
+    # ログインボタンをクリック
+    print("5. ログインボタンの要素を待機します。")
+    login_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@value='ログインする']")))
+    print("6. ログインボタンをクリックします。")
+    login_button.click()
+    print("✅ ログイン試行。")
+
+    # ログイン成否を判定（ページ遷移とエラーメッセージ表示のどちらか早い方を待つ）
+    print("7. ログイン後のページ遷移を待ちます。")
+    login_state, login_result = wait_for_any(driver, {
+        "logged_in": EC.url_contains(PANEL_URL),
+        "login_error": any_visible("//div[contains(@class, 'error-message') or contains(text(), 'IDまたはパスワードが違います')]"),
+    })
+    if login_state == "login_error":
+        print(f"❌ ログインに失敗しました。エラーメッセージ: {login_result.text}")
+        failure_artifacts.capture(driver, "login_failed_error")
+        return False
+
+    print("✅ ログイン成功。")
+    save_cookies(driver)
+    return True
+
+
+def open_detail_page(driver, server_id, timeout=10):
+    """VPS詳細ページを開き、利用期限の行が表示されるまで待つ（既に開いていれば再読み込みしない）"""
+    url = detail_url(server_id)
+    if driver.current_url != url:
+        driver.get(url)
+    # 表示されなければ利用期限の取得処理側で扱う
+    wait_for(driver, text_visible('利用期限'), timeout=timeout)
+    lean_navigation.report_page(driver, "detail")
+
+
+def read_expiries(driver, server_ids, read_expiry, concurrent=None, timeout=10):
+    """
+    各サーバーのVPS詳細ページから利用期限を読み取る（読み取りのみで更新はしない）
+
+    Args:
+        server_ids (list): サーバーIDの一覧
+        read_expiry (callable): (driver, サーバーID) を受け取り、表示中の詳細ページから利用期限（datetime または None）を返す関数
+        concurrent (bool): True で全ての詳細ページを別タブで同時に読み込む（None で XSERVER_CONCURRENT_TABS）
+
+    Returns:
+        dict: サーバーID → 利用期限（取得できなかった場合は None）
+    """
+    if concurrent is None:
+        concurrent = CONCURRENT_TABS
+    expiries = {}
+
+    if not concurrent or len(server_ids) < 2:
+        for server_id in server_ids:
+            print(f"8. サーバー {server_id} のVPS詳細ページを開きます。")
+            open_detail_page(driver, server_id, timeout)
+            expiries[server_id] = read_expiry(driver, server_id)
+        return expiries
+
+    # 先に全てのタブで読み込みを開始してから、タブの順に利用期限を読む（読み込み待ちが重なる）
+    print(f"8. {len(server_ids)}台分のVPS詳細ページを別タブで同時に開きます。")
+    main_window = driver.current_window_handle
+    known_windows = set(driver.window_handles)
+    tabs = {}
+    for server_id in server_ids:
+        # 軽量モードのブロックリストはタブごとの設定のため、空白のタブで設定してから読み込みを始める
+        first_url = "about:blank" if lean_navigation.ENABLED else detail_url(server_id)
+        driver.execute_script("window.open(arguments[0], '_blank');", first_url)
+        new_window = next((handle for handle in driver.window_handles if handle not in known_windows), None)
+        if new_window is None:
+            # ポップアップがブロックされた場合などは、後でメインのタブで読み取る
+            print(f"⚠️  サーバー {server_id} のタブを開けませんでした。メインのタブで読み取ります。")
+            continue
+        known_windows.add(new_window)
+        tabs[server_id] = new_window
+        if lean_navigation.ENABLED:
+            driver.switch_to.window(new_window)
+            lean_navigation.apply_blocklist(driver, BASE_URL, quiet=True)
+            driver.execute_script("location.href = arguments[0];", detail_url(server_id))
+
+    try:
+        for server_id, window in tabs.items():
+            driver.switch_to.window(window)
+            wait_for(driver, text_visible('利用期限'), timeout=timeout)
+            print(f"📄 サーバー {server_id} の利用期限を読み取ります。")
+            expiries[server_id] = read_expiry(driver, server_id)
+    finally:
+        for window in tabs.values():
+            try:
+                driver.switch_to.window(window)
+                driver.close()
+            except WebDriverException:
+                pass
+        driver.switch_to.window(main_window)
+
+    for server_id in server_ids:
+        if server_id not in tabs:
+            open_detail_page(driver, server_id, timeout)
+            expiries[server_id] = read_expiry(driver, server_id)
+    return expiries
@@ -0,0 +1,243 @@
+"""
+画像認証の回答（6桁の数字）の検証と、ストリーミング応答からの検出
+
+LLM の応答は「369218」のような半角数字のほか、「さんろくきゅうにいちはち」のような
+ひらがなで返ることもあるため、どちらも数字として読む。DigitStream は応答を受け取るたびに
+先頭から読み直し、6桁の数字の並びが区切られた時点で回答を確定する
+（以降の出力を待たずにストリームを閉じられる）。
+
+読みの表は import 時に1度だけトライ木にし、decode_digits() は文字列全体で6桁に最も近く、
+その中で読み飛ばす文字が最も少ない区切り方を選ぶ（先頭から最長一致で決めると「ろく」を「ろ」「く」と
+読むような区切りの誤りを後から直せないため）。
+"""
+from captcha_ocr import EXPECTED_DIGITS
+
+HIRAGANA_DIGITS = {
+    'ぜろ': '0', 'れい': '0',
+    'いち': '1', 'ひと': '1',
+    'に': '2', 'ふた': '2',
+    'さん': '3', 'みっ': '3',
+    'よん': '4', 'よ': '4', 'し': '4',
+    'ご': '5', 'いつ': '5',
+    'ろく': '6', 'むっ': '6',
+    'なな': '7', 'しち': '7',
+    'はち': '8',
+    'きゅう': '9', 'く': '9'
+}
+_FULLWIDTH_DIGITS = str.maketrans("０１２３４５６７８９", "0123456789")
+_IGNORABLE = " \t　,、・-ー"   # 数字の並びの途中にあっても無視する文字
+_DIGIT = ""                   # トライ木のノードで、そこまでの読みが表す数字を入れるキー
+
+
+def _build_trie(readings):
+    root = {}
+    for reading, digit in readings.items():
+        node = root
+        for char in reading:
+            node = node.setdefault(char, {})
+        node[_DIGIT] = digit
+    return root
+
+
+_TRIE = _build_trie(HIRAGANA_DIGITS)
+
+
+def _readings_at(text, i):
+    """text[i:] の先頭に一致する読みを (終わりの位置, 数字) で返す（短い順）"""
+    node = _TRIE
+    matches = []
+    for j in range(i, len(text)):
+        node = node.get(text[j])
+        if node is None:
+            break
+        if _DIGIT in node:
+            matches.append((j + 1, node[_DIGIT]))
+    return matches
+
+
+def is_valid_code(text):
+    """画像認証の回答として妥当か（6桁の半角数字）"""
+    return bool(text) and len(text) == EXPECTED_DIGITS and text.isdigit()
+
+
+def digit_runs(text):
+    """
+    文字列を数字の並びに分ける（ひらがなの読みも数字として扱う）
+
+    半角数字の並びと読みの並びは別の並びとし、半角数字の並びは空白でも区切る
+    （「369218 になります」の「に」を回答の7桁目として読まないため）。
+    読みの並びの途中の空白（「さん ろく」）は無視する。
+
+    Returns:
+        list: (数字の並び, 後ろが区切られているか, 読みの並びか) のリスト。末尾の並びは区切られていない
+    """
+    text = text.translate(_FULLWIDTH_DIGITS)
+    runs = []
+    current = ""
+    reading = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char in "0123456789":
+            if current and reading:
+                runs.append((current, True, True))
+                current = ""
+            current += char
+            reading = False
+            i += 1
+            continue
+        matches = _readings_at(text, i)
+        if matches:
+            if current and not reading:
+                runs.append((current, True, False))
+                current = ""
+            end, digit = matches[-1]     # 最長一致
+            current += digit
+            reading = True
+            i = end
+            continue
+        delimits = char not in _IGNORABLE or (char.isspace() and not reading)
+        if delimits and current:
+            runs.append((current, True, reading))
+            current = ""
+        i += 1
+    if current:
+        runs.append((current, False, reading))
+    return runs
+
+
+def _longest_match(text):
+    digits = []
+    skipped = 0
+    i = 0
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if char in "0123456789":
+            digits.append(char)
+            i += 1
+            continue
+        node = _TRIE.get(char)
+        end = None
+        j = i
+        while node is not None:
+            j += 1
+            if _DIGIT in node:
+                end, digit = j, node[_DIGIT]
+            node = node.get(text[j]) if j < length else None
+        if end is not None:
+            digits.append(digit)
+            i = end
+            continue
+        if char not in _IGNORABLE and not char.isspace():
+            skipped += 1
+        i += 1
+    return "".join(digits), skipped
+
+
+def decode_digits(text):
+    """
+    OCR などで読んだ文字列を数字に変換する（ひらがなの読み・全角数字・半角数字）
+
+    文字列全体で6桁に最も近く、その中で読みにも数字にもならずに読み飛ばす文字が最も少ない
+    区切り方を選ぶ（best_decode と同じ順）。空白や区切り記号（_IGNORABLE）は読み飛ばしても数えない。
+
+    Returns:
+        tuple: (数字の文字列, 読み飛ばした文字の数)
+    """
+    text = text.translate(_FULLWIDTH_DIGITS)
+    if text.isascii() and text.isdigit():
+        return text, 0
+
+    # ほとんどの読みは最長一致で読み飛ばしなく6桁に読める（その場合は他の区切り方より良くはならない）
+    digits, skipped = _longest_match(text)
+    if skipped == 0 and len(digits) == EXPECTED_DIGITS:
+        return digits, 0
+
+    # best[i]: 位置 i まで読んだ時点の 桁数（上限 EXPECTED_DIGITS + 1）→ (読み飛ばした数, 数字)
+    limit = EXPECTED_DIGITS + 1
+    best = [None] * (len(text) + 1)
+    best[0] = {0: (0, "")}
+    for i, char in enumerate(text):
+        states = best[i]
+        if states is None:
+            continue
+        if char in "0123456789":
+            moves = [(i + 1, char, 0)]
+        else:
+            moves = [(end, digit, 0) for end, digit in _readings_at(text, i)]
+            moves.append((i + 1, "", 0 if char in _IGNORABLE or char.isspace() else 1))
+        for skipped, digits in states.values():
+            for end, digit, cost in moves:
+                state = (skipped + cost, digits + digit)
+                bucket = min(len(state[1]), limit)
+                target = best[end]
+                if target is None:
+                    best[end] = {bucket: state}
+                elif bucket not in target or state[0] < target[bucket][0]:
+                    target[bucket] = state
+
+    skipped, digits = min(best[len(text)].values(),
+                          key=lambda state: (abs(len(state[1]) - EXPECTED_DIGITS), state[0]))
+    return digits, skipped
+
+
+def best_decode(candidates):
+    """
+    複数の候補文字列（OCR の結果の組み合わせ方の違いなど）を変換し、最も確からしいものを返す
+
+    6桁に最も近く、読み飛ばした文字が少なく、先に渡した候補ほど良いものとする。
+
+    Returns:
+        dict: text（数字）, candidate（元の文字列）, index（候補の番号）, skipped。候補がなければ text は空文字
+    """
+    best = {"text": "", "candidate": None, "index": None, "skipped": 0}
+    best_key = None
+    for index, candidate in enumerate(candidates):
+        if not candidate:
+            continue
+        digits, skipped = decode_digits(candidate)
+        key = (abs(len(digits) - EXPECTED_DIGITS), skipped, index)
+        if best_key is None or key < best_key:
+            best_key = key
+            best = {"text": digits, "candidate": candidate, "index": index, "skipped": skipped}
+    return best
+
+
+class DigitStream:
+    """
+    ストリーミングで届く応答から6桁の回答を検出する
+
+    parser = DigitStream()
+    for chunk in stream:
+        answer = parser.feed(chunk)
+        if answer:
+            break              # 残りの出力は読まずに閉じてよい
+    else:
+        answer = parser.close()
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.answer = None
+
+    def feed(self, chunk):
+        """応答の続きを追加し、回答が確定していればそれを返す"""
+        if self.answer is None:
+            self.text += chunk
+            self.answer = next((run for run, closed, _ in digit_runs(self.text)
+                                if closed and is_valid_code(run)), None)
+        return self.answer
+
+    def close(self):
+        """
+        応答の終わりで呼ぶ。区切られていない末尾や、空白などで分かれた半角数字の並びをつなげた6桁も回答として認める
+        （文中のひらがなを数字に読んでつなげないよう、読みの並びはつなげない）
+        """
+        if self.answer is None:
+            runs = digit_runs(self.text)
+            self.answer = next((run for run, _, _ in runs if is_valid_code(run)), None)
+            if self.answer is None:
+                joined = "".join(run for run, _, from_readings in runs if not from_readings)
+                self.answer = joined if is_valid_code(joined) else None
+        return self.answer
@@ -0,0 +1,176 @@
+"""
+画像認証の画像・入力欄・送信ボタンを1回の execute_script で探す DOM 探索
+
+find_element と is_displayed() / size / get_attribute() はそれぞれ chromedriver への
+HTTP の往復になるため、セレクタを1つずつ試したり全ての <img> を調べたりすると数十回の往復になる。
+probe() はページに1つのスクリプトを注入し、候補の要素ごとに表示状態・位置とサイズ・属性をまとめて
+1回の往復で受け取り、pick() が Python 側で順位付けする。
+
+前回画像認証を通過したときのセレクタは renewal_state に保存しておき、次回はそれを最初に採用する。
+"""
+
+# 画像認証の画像（先に書いたものほど優先する）
+IMAGE_SELECTORS = [
+    "//img[contains(@src, 'captcha')]",
+    "//img[contains(@src, 'security')]",
+    "//img[contains(@alt, '認証')]",
+    "//canvas",  # Canvas要素の場合もある
+    "//div[contains(@class, 'captcha')]//img",
+    "//img[contains(@src, 'image')]",  # 一般的な画像要素
+    "//div[@class='form-captcha']//img",  # XServerの特定クラス
+    "//div[contains(text(), '画像認証')]//following-sibling::*//img",
+    "//div[contains(text(), '画像認証')]//ancestor::*//img",
+]
+
+# 画像認証の入力欄
+INPUT_SELECTORS = [
+    "//input[@type='text'][contains(@class, 'input-captcha')]",
+    "//input[@type='text' and (@name='captcha' or @name='security_code' or @id='captcha')]",
+    "//input[@type='text'][contains(@placeholder, '画像') or contains(@placeholder, '認証')]",
+    "//input[@type='text'][contains(@class, 'captcha')]",
+]
+
+# 画像認証の送信ボタン（見つからなければ入力欄で Enter を押す）
+SUBMIT_SELECTORS = [
+    "//button[contains(text(), '送信')]",
+    "//button[contains(text(), '確認')]",
+    "//input[@type='submit']",
+    "//button[@type='submit']",
+    "//button[contains(@class, 'submit')]",
+]
+
+# 役割 → (セレクタ, どのセレクタにも一致しなかった場合に候補とする要素の CSS セレクタ。None なら推定しない)
+ROLES = {
+    "image": (IMAGE_SELECTORS, "img"),
+    "input": (INPUT_SELECTORS, "input[type='text']"),
+    "submit": (SUBMIT_SELECTORS, None),
+}
+
+IMAGE_KEYWORDS = ("captcha", "security", "image")
+
+PROBE_SCRIPT = """
+const roles = arguments[0], messageXPath = arguments[1];
+
+function snapshot(xpath) {
+    try {
+        return document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    } catch (e) {
+        return null;
+    }
+}
+
+function isVisible(el, rect) {
+    const style = window.getComputedStyle(el);
+    return el.getClientRects().length > 0 && style.visibility !== 'hidden' && style.display !== 'none'
+        && rect.width > 0 && rect.height > 0;
+}
+
+function describe(el) {
+    const rect = el.getBoundingClientRect();
+    return {
+        element: el,
+        selectors: [],
+        visible: isVisible(el, rect),
+        rect: {x: rect.left + window.scrollX, y: rect.top + window.scrollY,
+               width: rect.width, height: rect.height},
+        tag: el.tagName.toLowerCase(),
+        src: el.getAttribute('src') || '',
+        alt: el.getAttribute('alt') || '',
+        name: el.getAttribute('name') || '',
+        id: el.id || '',
+    };
+}
+
+const result = {candidates: {}, message: null};
+for (const role of Object.keys(roles)) {
+    const [selectors, fallback] = roles[role];
+    const found = new Map();
+    for (const selector of selectors) {
+        const nodes = snapshot(selector);
+        if (!nodes) continue;
+        for (let i = 0; i < nodes.snapshotLength; i++) {
+            const el = nodes.snapshotItem(i);
+            if (!found.has(el)) found.set(el, describe(el));
+            found.get(el).selectors.push(selector);
+        }
+    }
+    if (fallback) {
+        for (const el of document.querySelectorAll(fallback)) {
+            if (!found.has(el)) found.set(el, describe(el));
+        }
+    }
+    result.candidates[role] = Array.from(found.values());
+}
+
+const messages = snapshot(messageXPath);
+if (messages && messages.snapshotLength > 0) {
+    result.message = false;
+    for (let i = 0; i < messages.snapshotLength; i++) {
+        const el = messages.snapshotItem(i);
+        if (isVisible(el, el.getBoundingClientRect())) result.message = true;
+    }
+}
+return result;
+"""
+
+
+def probe(driver, message_text):
+    """
+    画像認証の案内文・画像・入力欄・送信ボタンの候補を1回の execute_script で集める
+
+    Args:
+        driver: WebDriver
+        message_text (str): 画像認証の案内文（「画像認証を行ってください」）
+
+    Returns:
+        dict: message（案内文がなければ None、あれば表示されているか）と
+              candidates（役割 → 候補のリスト。各候補は element, selectors, visible, rect, tag, src, alt, name, id）
+    """
+    roles = {role: [selectors, fallback] for role, (selectors, fallback) in ROLES.items()}
+    result = driver.execute_script(PROBE_SCRIPT, roles, f"//*[contains(text(), '{message_text}')]")
+    counts = ", ".join(f"{role} {len(found)}件" for role, found in result["candidates"].items())
+    print(f"🔎 DOM探索（1回の往復）: {counts}")
+    return result
+
+
+def _area(candidate):
+    return candidate["rect"]["width"] * candidate["rect"]["height"]
+
+
+def pick(probed, role, remembered=None):
+    """
+    探索結果から役割に合う要素を1つ選ぶ
+
+    表示されている候補のうち、前回通過したセレクタ（remembered）に一致するもの →
+    セレクタの優先順で最初に一致したもの → どのセレクタにも一致しない要素からの推定 の順に選ぶ。
+
+    Returns:
+        dict: 選んだ候補（selector に採用したセレクタ、推定で選んだ場合は None）。見つからなければ None
+    """
+    selectors = ROLES[role][0]
+    visible = [candidate for candidate in probed["candidates"].get(role, []) if candidate["visible"]]
+
+    if remembered in selectors:
+        for candidate in visible:
+            if remembered in candidate["selectors"]:
+                return dict(candidate, selector=remembered)
+
+    matched = [candidate for candidate in visible if candidate["selectors"]]
+    if matched:
+        best = min(matched, key=lambda candidate: selectors.index(candidate["selectors"][0]))
+        return dict(best, selector=best["selectors"][0])
+
+    if role == "image":
+        large = [candidate for candidate in visible if candidate["rect"]["height"] > 20]
+        for candidate in large:
+            if candidate["rect"]["width"] > 50 and any(word in candidate["src"].lower() for word in IMAGE_KEYWORDS):
+                print(f"✅ CAPTCHAらしい画像を発見: {candidate['src']}")
+                return dict(candidate, selector=None)
+        if large:
+            # 最後の手段：一番大きい画像を選択
+            best = max(large, key=_area)
+            print(f"⚠️  最大サイズの画像をCAPTCHA画像として選択: size={best['rect']}")
+            return dict(best, selector=None)
+        return None
+
+    return dict(visible[0], selector=None) if visible else None
@@ -0,0 +1,297 @@
+"""
+xserver2.py と solve_captcha.py の間で画像認証の画像と解答を受け渡す
+
+xserver2.py（待つ側）は 127.0.0.1 の固定ポートで待ち受け、solve_captcha.py が接続すると
+切り取った画像のパスをすぐに送る。入力された解答はその接続で送り返され、
+xserver2.py は受信した瞬間に処理を再開する（ファイルの定期確認による待ち時間がない）。
+
+ソケットが使えない場合に備えて、解答ファイル（captcha_solution.txt）も引き続き受け付ける。
+ファイルは一時ファイルに書いてから os.replace() で置き換えるため、書きかけの内容が読まれることはない。
+
+通信は1行1つの JSON（UTF-8）:
+    待つ側 → 解答側: {"type": "captcha", "image": "/path/to/captcha_cropped.png"}
+    解答側 → 待つ側: {"type": "solution", "solution": "123456"}
+    待つ側 → 解答側: {"type": "accepted"} または {"type": "rejected", "reason": "..."}
+
+環境変数:
+    CAPTCHA_HANDOFF_PORT  待ち受けるポート（デフォルト: 47615）
+"""
+import json
+import os
+import selectors
+import socket
+import tempfile
+import time
+
+from captcha_answer import is_valid_code
+
+HANDOFF_HOST = "127.0.0.1"
+HANDOFF_PORT = int(os.getenv("CAPTCHA_HANDOFF_PORT", "47615"))
+SOLUTION_FILE = "captcha_solution.txt"
+FILE_POLL = 0.25      # 秒。解答ファイルを確認する間隔（ソケットの受信はこの間隔を待たずに検出する）
+CONNECT_RETRY = 0.2   # 秒。solve_captcha.py が待つ側の起動を待つときの再接続間隔
+REPLY_TIMEOUT = 5.0   # 秒。接続後に待つ側の応答を待つ上限（別のプロセスがポートを使っている場合に止まらないよう）
+
+
+def _send(conn, message):
+    conn.sendall(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+def write_solution_file(solution, path=SOLUTION_FILE):
+    """
+    解答ファイルを原子的に書き出す（同じディレクトリの一時ファイルから os.replace で置き換える）
+
+    Returns:
+        str: 書き出したファイルの絶対パス
+    """
+    path = os.path.abspath(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=".captcha_solution_", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(solution)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def _read_solution_file(path):
+    """解答ファイルを読んで削除する。まだなければ None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            solution = f.read().strip()
+    except FileNotFoundError:
+        return None
+    os.remove(path)
+    return solution
+
+
+class SolutionWaiter:
+    """
+    画像のパスを solve_captcha.py に渡し、解答を待つ（xserver2.py 側）
+
+    with SolutionWaiter("captcha_cropped.png") as waiter:
+        solution = waiter.wait(timeout=300)
+    """
+
+    def __init__(self, image_path, solution_file=SOLUTION_FILE, host=HANDOFF_HOST, port=HANDOFF_PORT):
+        self.image_path = os.path.abspath(image_path)
+        self.solution_file = os.path.abspath(solution_file)
+        self.host = host
+        self.port = port
+        self.address = None     # 待ち受けているアドレス（ポートを使えない場合は None）
+        self._listener = None
+        self._selector = None
+        self._buffers = {}
+
+    def start(self):
+        # 前回の実行で残った解答を使わないよう、古い解答ファイルを削除する
+        if os.path.exists(self.solution_file):
+            os.remove(self.solution_file)
+
+        self._selector = selectors.DefaultSelector()
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # 同じプロセスで続けて待ち受けられるようにする（Windows では他のプロセスに奪われないようにする）
+        if os.name == "nt":
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        else:
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            listener.bind((self.host, self.port))
+            listener.listen()
+        except OSError as e:
+            listener.close()
+            print(f"⚠️  ポート {self.port} で待ち受けできませんでした（{e}）。解答ファイルのみで待機します。")
+            return self
+        listener.setblocking(False)
+        self._selector.register(listener, selectors.EVENT_READ)
+        self._listener = listener
+        self.address = listener.getsockname()[:2]
+        return self
+
+    def close(self):
+        if self._selector is None:
+            return
+        for key in list(self._selector.get_map().values()):
+            self._selector.unregister(key.fileobj)
+            key.fileobj.close()
+        self._selector.close()
+        self._selector = None
+        self._listener = None
+        self._buffers.clear()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def wait(self, timeout=300):
+        """
+        解答が届くまで待つ
+
+        ソケットで届いた解答は受信した瞬間に返す。解答ファイルは FILE_POLL 秒ごとに確認する。
+
+        Returns:
+            str: 6桁の解答。timeout 秒以内に届かなければ None
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            solution = _read_solution_file(self.solution_file)
+            if solution is not None:
+                if is_valid_code(solution):
+                    print("✅ 解答ファイルを検出しました。")
+                    return solution
+                print(f"⚠️  解答ファイルの内容が6桁の数字ではありません: {solution!r}")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if self._listener is None:
+                time.sleep(min(FILE_POLL, remaining))
+                continue
+            for key, _ in self._selector.select(min(FILE_POLL, remaining)):
+                if key.fileobj is self._listener:
+                    self._accept()
+                    continue
+                solution = self._receive(key.fileobj)
+                if solution is not None:
+                    print("✅ solve_captcha.py から解答を受信しました。")
+                    return solution
+
+    def _accept(self):
+        try:
+            conn, _ = self._listener.accept()
+        except BlockingIOError:
+            return
+        try:
+            _send(conn, {"type": "captcha", "image": self.image_path})
+        except OSError:
+            conn.close()
+            return
+        conn.setblocking(False)
+        self._buffers[conn] = b""
+        self._selector.register(conn, selectors.EVENT_READ)
+
+    def _drop(self, conn):
+        self._selector.unregister(conn)
+        self._buffers.pop(conn, None)
+        conn.close()
+
+    def _receive(self, conn):
+        try:
+            data = conn.recv(4096)
+        except BlockingIOError:
+            return None
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(conn)
+            return None
+
+        self._buffers[conn] += data
+        while b"\n" in self._buffers[conn]:
+            line, self._buffers[conn] = self._buffers[conn].split(b"\n", 1)
+            try:
+                message = json.loads(line.decode("utf-8"))
+            except ValueError:
+                continue
+            solution = str(message.get("solution", "")).strip() if message.get("type") == "solution" else ""
+            accepted = is_valid_code(solution)
+            try:
+                if accepted:
+                    _send(conn, {"type": "accepted"})
+                else:
+                    _send(conn, {"type": "rejected", "reason": "6桁の半角数字ではありません"})
+            except OSError:
+                self._drop(conn)
+                return solution if accepted else None
+            if accepted:
+                self._drop(conn)
+                return solution
+        return None
+
+
+class SolutionClient:
+    """
+    xserver2.py から画像のパスを受け取り、解答を送る（solve_captcha.py 側）
+    """
+
+    def __init__(self, host=HANDOFF_HOST, port=HANDOFF_PORT):
+        self.host = host
+        self.port = port
+        self._conn = None
+        self._reader = None
+
+    def wait_for_captcha(self, timeout=None):
+        """
+        待つ側に接続し、送られてくる画像のパスを返す
+
+        待つ側がまだ待ち受けていなければ、CONNECT_RETRY 秒ごとに接続し直す。
+        接続できても REPLY_TIMEOUT 秒以内に何も送られてこなければ、別のプロセスがポートを
+        使っているとみなして None を返す。
+
+        Returns:
+            str: 画像のパス。timeout 秒以内に受け取れなければ None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                conn = socket.create_connection((self.host, self.port), timeout=CONNECT_RETRY * 5)
+            except OSError:
+                conn = None
+            if conn is not None:
+                conn.settimeout(REPLY_TIMEOUT)
+                reader = conn.makefile("rb")
+                try:
+                    line = reader.readline()
+                    message = json.loads(line.decode("utf-8")) if line else {}
+                except socket.timeout:
+                    reader.close()
+                    conn.close()
+                    print(f"⚠️  {self.host}:{self.port} に接続しましたが応答がありません"
+                          "（別のプロセスがポートを使っている可能性があります）。")
+                    return None
+                except (OSError, ValueError):
+                    message = {}
+                if message.get("type") == "captcha":
+                    self._conn, self._reader = conn, reader
+                    return message.get("image")
+                reader.close()
+                conn.close()
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(CONNECT_RETRY)
+
+    def submit(self, solution):
+        """
+        解答を送る
+
+        Returns:
+            bool: 待つ側が受け取った場合 True（接続が切れていた場合は False）
+        """
+        if self._conn is None:
+            return False
+        try:
+            _send(self._conn, {"type": "solution", "solution": solution})
+            line = self._reader.readline()
+            reply = json.loads(line.decode("utf-8")) if line else {}
+        except (OSError, ValueError):
+            self.close()
+            return False
+        if reply.get("type") == "accepted":
+            self.close()
+            return True
+        if reply.get("type") == "rejected":
+            print(f"⚠️  解答が受け付けられませんでした: {reply.get('reason')}")
+        return False
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
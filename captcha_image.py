@@ -0,0 +1,123 @@
+"""
+画像認証の画像をメモリ上で扱うためのヘルパー
+
+スクリーンショットは PNG バイト列のまま受け取り、1度だけ NumPy 配列にデコードして
+切り取り・前処理・OCR まで配列のまま受け渡す。ファイルが必要になるのは
+Claude Code CLI や手動入力など外部に画像を渡す場合と、デバッグ画像を有効にした場合のみ。
+
+環境変数:
+    CAPTCHA_DEBUG_IMAGES=true  前処理の途中画像を captcha_debug/ に保存する
+"""
+import os
+import tempfile
+from datetime import datetime
+
+DEBUG_IMAGES = os.getenv("CAPTCHA_DEBUG_IMAGES", "false").lower() == "true"
+DEBUG_IMAGE_DIR = "captcha_debug"
+
+# 同時に複数の実行があってもデバッグ画像が上書きされないよう、実行ごとに識別子を付ける
+RUN_ID = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+
+
+def decode_png(png_bytes):
+    """PNG バイト列を BGR の NumPy 配列にデコードする（失敗時は None）"""
+    import cv2
+    import numpy as np
+    buffer = np.frombuffer(png_bytes, dtype=np.uint8)
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def encode_png(image):
+    """NumPy 配列を PNG バイト列にエンコードする（失敗時は None）"""
+    import cv2
+    ok, buffer = cv2.imencode(".png", image)
+    return buffer.tobytes() if ok else None
+
+
+def load_image(image):
+    """ファイルパスまたは配列を受け取り、配列を返す（既存の呼び出し方との互換用）"""
+    if isinstance(image, str):
+        import cv2
+        return cv2.imread(image)
+    return image
+
+
+def crop_image(image, left, top, right, bottom):
+    """配列のスライスで切り取る（コピーは行わない）"""
+    return image[top:bottom, left:right]
+
+
+def save_debug_image(name, image):
+    """
+    デバッグ画像を保存する（CAPTCHA_DEBUG_IMAGES=true の場合のみ）
+
+    Returns:
+        str: 保存したパス、保存しなかった場合は None
+    """
+    if not DEBUG_IMAGES:
+        return None
+    import cv2
+    os.makedirs(DEBUG_IMAGE_DIR, exist_ok=True)
+    path = os.path.join(DEBUG_IMAGE_DIR, f"{RUN_ID}_{name}.png")
+    cv2.imwrite(path, image)
+    print(f"🔍 デバッグ画像を保存: {path}")
+    return path
+
+
+def write_image_file(image, path=None):
+    """
+    外部ツールに渡すために画像をファイルへ書き出す
+
+    Args:
+        image: BGR の NumPy 配列
+        path (str): 保存先（省略時は実行ごとに一意な一時ファイル。不要になったら呼び出し側で削除する）
+
+    Returns:
+        str: 保存したファイルパス、失敗時は None
+    """
+    png_bytes = encode_png(image)
+    if png_bytes is None:
+        print("❌ 画像のエンコードに失敗しました。")
+        return None
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix=f"captcha_{RUN_ID}_", suffix=".png")
+        with os.fdopen(fd, "wb") as f:
+            f.write(png_bytes)
+    else:
+        with open(path, "wb") as f:
+            f.write(png_bytes)
+    return path
+
+
+def prepare_for_vision(image, max_height=80, margin=4):
+    """
+    画像解析APIに送る最小限の画像を作る（グレースケール化 → 文字部分で切り詰め → 縮小 → PNG）
+
+    Args:
+        image: BGR の NumPy 配列（またはファイルパス）
+        max_height (int): これより高い画像は縦横比を保って縮小する
+        margin (int): 文字部分の周囲に残す余白（ピクセル）
+
+    Returns:
+        bytes: グレースケール PNG のバイト列、失敗時は None
+    """
+    import cv2
+    image = load_image(image)
+    if image is None:
+        return None
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+    # 背景より暗い画素（文字）を囲む最小の矩形で切り詰める
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    points = cv2.findNonZero(ink)
+    if points is not None:
+        x, y, w, h = cv2.boundingRect(points)
+        gray = crop_image(gray, max(x - margin, 0), max(y - margin, 0),
+                          min(x + w + margin, gray.shape[1]), min(y + h + margin, gray.shape[0]))
+
+    if gray.shape[0] > max_height:
+        width = max(1, round(gray.shape[1] * max_height / gray.shape[0]))
+        gray = cv2.resize(gray, (width, max_height), interpolation=cv2.INTER_AREA)
+
+    ok, buffer = cv2.imencode(".png", gray, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+    return buffer.tobytes() if ok else None
@@ -0,0 +1,209 @@
+"""
+EasyOCR リーダーの共有レジストリ
+
+easyocr.Reader の生成（torch と CRAFT/認識モデルの重みの読み込み）は数秒かかるため、
+プロセス内で1度だけ行い、以降の画像認証解析では同じインスタンスを再利用する。
+preload_reader() をログイン処理の開始前に呼ぶと、ブラウザ操作と並行して
+バックグラウンドスレッドでモデルを読み込んでおける。
+
+evaluate_variants() は複数の二値化バリエーションを並列にOCRし、
+十分な信頼度の6桁の結果が出た時点で残りを打ち切る。
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import stage_profiler
+
+_lock = threading.Lock()
+_entries = {}
+
+
+class _ReaderEntry:
+    """読み込み中・読み込み済みのリーダー1件分の状態"""
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.reader = None
+        self.error = None
+
+
+def _reader_key(languages, gpu):
+    return (tuple(languages), bool(gpu))
+
+
+def _load_reader(key, entry):
+    languages, gpu = key
+    try:
+        import easyocr
+        print(f"⏳ EasyOCR モデルを読み込んでいます... (言語: {', '.join(languages)})")
+        entry.reader = easyocr.Reader(list(languages), gpu=gpu)
+        print("✅ EasyOCR モデルの読み込みが完了しました。")
+    except Exception as e:
+        print(f"❌ EasyOCR モデルの読み込みでエラー: {e}")
+        entry.error = e
+    finally:
+        entry.ready.set()
+
+
+def preload_reader(languages, gpu=False):
+    """
+    リーダーの読み込みをバックグラウンドで開始する（既に開始済みなら何もしない）
+
+    Args:
+        languages (list): EasyOCR の言語リスト（例: ['ja', 'en']）
+        gpu (bool): GPU を使用するか
+    """
+    key = _reader_key(languages, gpu)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry.error is None:
+            return entry
+        entry = _ReaderEntry()
+        _entries[key] = entry
+
+    # デーモンスレッドにして、更新不要で早期終了する場合に読み込み完了を待たない
+    thread = threading.Thread(target=_load_reader, args=(key, entry),
+                              name="easyocr-preload", daemon=True)
+    thread.start()
+    return entry
+
+
+def get_reader(languages, gpu=False, timeout=None):
+    """
+    読み込み済みのリーダーを返す（未開始なら読み込みを開始して完了を待つ）
+
+    Args:
+        languages (list): EasyOCR の言語リスト
+        gpu (bool): GPU を使用するか
+        timeout (float): 読み込み完了を待つ最大秒数（None で無制限）
+
+    Returns:
+        easyocr.Reader: 共有リーダー
+
+    Raises:
+        TimeoutError: timeout 秒以内に読み込みが完了しなかった場合
+        Exception: モデルの読み込み自体が失敗した場合はその例外
+    """
+    entry = preload_reader(languages, gpu)
+    if not entry.ready.is_set():
+        print("⏳ EasyOCR モデルの読み込み完了を待っています...")
+    if not entry.ready.wait(timeout):
+        raise TimeoutError("EasyOCR モデルの読み込みがタイムアウトしました")
+    if entry.error is not None:
+        raise entry.error
+    return entry.reader
+
+
+# ▼ 複数の前処理画像（二値化バリエーション）の並列評価
+
+DEFAULT_CONFIDENCE_FLOOR = 0.5  # この信頼度以上の6桁の結果が出たら残りの評価を打ち切る
+EXPECTED_DIGITS = 6
+
+
+def _read_variant(reader, name, image, decode, segment_confidence, stop, cancel_event=None):
+    """1つのバリエーションをOCRし、数字に変換した結果を返す"""
+    started = time.perf_counter()
+    if stop.is_set() or (cancel_event is not None and cancel_event.is_set()):
+        return {"variant": name, "skipped": True, "elapsed": 0.0}
+
+    results = reader.readtext(image, detail=1, paragraph=False)
+    segments = [res for res in results if res[2] > segment_confidence]
+    raw_text = "".join(res[1].strip() for res in segments)
+    confidence = (sum(res[2] for res in segments) / len(segments)) if segments else 0.0
+    text = decode(raw_text) if raw_text else ""
+    # 信頼度の低い断片を除いたために6桁にならなかった場合は、全ての断片をつなげた読みも試す
+    if len(text) != EXPECTED_DIGITS and len(segments) < len(results):
+        all_text = "".join(res[1].strip() for res in results)
+        all_decoded = decode(all_text)
+        if len(all_decoded) == EXPECTED_DIGITS:
+            raw_text, text = all_text, all_decoded
+            confidence = sum(res[2] for res in results) / len(results)
+    return {
+        "variant": name,
+        "skipped": False,
+        "raw_text": raw_text,
+        "text": text,
+        "confidence": confidence,
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+def _score(result):
+    """6桁に近いほど、同じ桁数なら信頼度が高いほど良い結果とする"""
+    return (-abs(len(result["text"]) - EXPECTED_DIGITS), result["confidence"])
+
+
+def evaluate_variants(reader, variants, decode, confidence_floor=DEFAULT_CONFIDENCE_FLOOR,
+                      segment_confidence=0.2, max_workers=None, cancel_event=None):
+    """
+    前処理バリエーションを並列にOCRし、最も確からしい結果を返す
+
+    信頼度が confidence_floor 以上の6桁の結果が得られた時点で、
+    まだ開始していないバリエーションの評価を打ち切って即座に返す。
+
+    Args:
+        reader: easyocr.Reader（get_reader() で取得した共有インスタンス）
+        variants (list): (名前, 画像配列) のリスト
+        decode (callable): OCR文字列を数字文字列に変換する関数
+        confidence_floor (float): 早期終了に必要な平均信頼度
+        segment_confidence (float): 結合に使うOCR断片の最低信頼度
+        max_workers (int): 並列数（省略時はバリエーション数、ただし CPU 数まで。
+                           上限を超えた分は前のものが終わってから開始し、打ち切った時点で未開始なら評価しない）
+        cancel_event (threading.Event): 外部から評価を打ち切るためのイベント（他のソルバーが先に解いた場合など）
+
+    Returns:
+        dict: 最良の結果（text, raw_text, confidence, variant, elapsed）と
+              各バリエーションの所要時間 latencies。認識できなかった場合の text は空文字
+    """
+    stop = threading.Event()
+    started = time.perf_counter()
+    finished = []
+    best = None
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(variants))),
+                                  thread_name_prefix="ocr-variant")
+    try:
+        # プロファイル中は、ワーカーでの readtext もOCRのステージの統計に含める
+        read_variant = stage_profiler.in_worker(_read_variant)
+        futures = [executor.submit(read_variant, reader, name, image, decode, segment_confidence,
+                                   stop, cancel_event)
+                   for name, image in variants]
+        for future in as_completed(futures):
+            if cancel_event is not None and cancel_event.is_set():
+                print("  ⏹️  他の方法で解決済みのため、OCRを打ち切ります。")
+                break
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"  ⚠️  OCR試行でエラー: {e}")
+                continue
+            if result["skipped"]:
+                continue
+
+            finished.append(result)
+            print(f"  🔍 {result['variant']}: '{result['raw_text']}' → '{result['text']}' "
+                  f"(信頼度: {result['confidence']:.2f}, {result['elapsed']:.2f}秒)")
+
+            if best is None or _score(result) > _score(best):
+                best = result
+
+            if len(result["text"]) == EXPECTED_DIGITS and result["confidence"] >= confidence_floor:
+                print(f"  ⚡ {result['variant']} で十分な結果が得られたため残りの評価を打ち切ります。")
+                stop.set()
+                break
+    finally:
+        # 実行中のOCRは待たずに戻る（未開始のものはキャンセルされる）
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    latencies = {result["variant"]: result["elapsed"] for result in finished}
+    print(f"⏱️  バリエーション評価: {len(finished)}/{len(variants)}件, "
+          f"合計 {time.perf_counter() - started:.2f}秒")
+
+    if best is None:
+        return {"text": "", "raw_text": "", "confidence": 0.0, "variant": None,
+                "elapsed": 0.0, "latencies": latencies}
+    return dict(best, latencies=latencies)
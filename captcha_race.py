@@ -0,0 +1,72 @@
+"""
+画像認証ソルバーのレースモード
+
+利用可能なソルバー（OCR / Claude API / Claude Code CLI）を同時に開始し、
+最初に検証を通過した回答（6桁の数字）を採用する。残りのソルバーには
+キャンセルを通知し（CLI は子プロセスを終了させる）、結果を待たずに戻る。
+画像認証から回答までの時間は、全ソルバーの合計ではなく最速のソルバーの時間になる。
+"""
+import queue
+import threading
+import time
+
+from captcha_answer import is_valid_code
+
+DEFAULT_RACE_TIMEOUT = 90  # 秒。全ソルバーの回答を待つ最大時間
+
+
+def race_solvers(solvers, validate=is_valid_code, timeout=DEFAULT_RACE_TIMEOUT):
+    """
+    ソルバーを並列に実行し、最初に検証を通過した回答を返す
+
+    Args:
+        solvers (list): (名前, solve) のリスト。solve(cancel_event) は回答文字列か None を返し、
+                        cancel_event がセットされたらできるだけ早く処理を打ち切る
+        validate (callable): 回答を採用してよいかを判定する関数
+        timeout (float): 全体の待ち時間の上限（秒）
+
+    Returns:
+        dict: text（採用した回答、なければ None）, solver（勝者の名前）, elapsed（勝者の所要時間）,
+              latencies（完了したソルバーごとの所要時間）
+    """
+    cancel_event = threading.Event()
+    answers = queue.Queue()
+    started = time.perf_counter()
+
+    def run(name, solve):
+        try:
+            answer = solve(cancel_event)
+        except Exception as e:
+            print(f"  ⚠️  {name} でエラー: {e}")
+            answer = None
+        answers.put((name, answer, time.perf_counter() - started))
+
+    # 結果を採用した後も待たずに戻れるよう、デーモンスレッドで実行する
+    for name, solve in solvers:
+        threading.Thread(target=run, args=(name, solve), name=f"captcha-{name}", daemon=True).start()
+    print(f"🏁 {len(solvers)}個のソルバーを同時に開始しました: {', '.join(name for name, _ in solvers)}")
+
+    winner = {"text": None, "solver": None, "elapsed": None, "latencies": {}}
+    pending = len(solvers)
+    deadline = started + timeout
+    while pending:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            print(f"⏰ {timeout}秒以内に有効な回答が得られませんでした。")
+            break
+        try:
+            name, answer, elapsed = answers.get(timeout=remaining)
+        except queue.Empty:
+            continue
+        pending -= 1
+        winner["latencies"][name] = elapsed
+
+        if validate(answer):
+            winner.update(text=answer, solver=name, elapsed=elapsed)
+            print(f"🏆 {name} が {elapsed:.2f}秒で回答しました: '{answer}'")
+            break
+        print(f"  ❌ {name} の回答は無効でした（{answer!r}, {elapsed:.2f}秒）")
+
+    # 残りのソルバーを打ち切る
+    cancel_event.set()
+    return winner
@@ -1,9 +1,195 @@
 import subprocess
+import codecs
 import json
 import os
+import queue
+import shutil
+import tempfile
+import threading
 import time
 from pathlib import Path
 
+import step_timing
+from captcha_answer import DigitStream
+
+CLI_TIMEOUT = 60      # 秒。Claude Code CLI の最大実行時間
+CANCEL_POLL = 0.2     # 秒。キャンセル要求を確認する間隔
+# CLAUDE_STREAMING=false で、CLI の終了を待ってから出力を読む
+STREAMING = os.getenv("CLAUDE_STREAMING", "true").lower() == "true"
+
+# `claude --version` による利用可否の確認結果のキャッシュ（CLI の実体のパスと更新日時が変わるまで有効）
+# 作業ディレクトリ（リポジトリ）を汚さないよう、ユーザーのキャッシュディレクトリに保存する
+PROBE_CACHE_FILE = os.getenv("CLAUDE_CLI_PROBE_CACHE") or os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "xservervps", "claude_cli_probe.json")
+PROBE_TTL = 24 * 60 * 60   # 秒
+_probe_results = {}        # (実体のパス, 更新日時) → 利用可否
+_probe_lock = threading.Lock()
+_integration = None
+_integration_lock = threading.Lock()
+
+def _run_cancellable(cmd, timeout=CLI_TIMEOUT, cancel_event=None):
+    """
+    コマンドを実行し、タイムアウトまたはキャンセル要求があれば子プロセスを終了させる
+
+    Returns:
+        (returncode, stdout, stderr)。キャンセルされた場合は None
+
+    Raises:
+        subprocess.TimeoutExpired: timeout 秒以内に終了しなかった場合
+    """
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            stdout, stderr = process.communicate(timeout=CANCEL_POLL)
+            return process.returncode, stdout, stderr
+        except subprocess.TimeoutExpired:
+            cancelled = cancel_event is not None and cancel_event.is_set()
+            if cancelled or time.monotonic() >= deadline:
+                process.kill()
+                process.communicate()
+                if cancelled:
+                    return None
+                raise subprocess.TimeoutExpired(cmd, timeout)
+
+def _stream_cancellable(cmd, on_output, timeout=CLI_TIMEOUT, cancel_event=None):
+    """
+    コマンドを実行し、標準出力を受け取るたびに on_output(text) を呼ぶ
+
+    on_output が真を返した時点（回答が確定した時点）で子プロセスを終了させ、残りの出力は待たない。
+
+    Returns:
+        (returncode, stdout, stderr)。on_output で打ち切った場合の returncode は None、
+        キャンセルされた場合は None
+
+    Raises:
+        subprocess.TimeoutExpired: timeout 秒以内に終了しなかった場合
+    """
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    chunks = queue.Queue()
+    stderr_chunks = []
+
+    # パイプの読み込みはブロックするため、別スレッドで読んでキューに渡す（Windows でも動くように select は使わない）
+    def pump_stdout():
+        for data in iter(lambda: process.stdout.read1(4096), b""):
+            chunks.put(data)
+        chunks.put(None)
+
+    def pump_stderr():
+        for data in iter(lambda: process.stderr.read1(4096), b""):
+            stderr_chunks.append(data)
+
+    readers = [threading.Thread(target=pump, daemon=True) for pump in (pump_stdout, pump_stderr)]
+    for reader in readers:
+        reader.start()
+
+    def stop():
+        process.kill()
+        process.wait()
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    output = []
+    deadline = time.monotonic() + timeout
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            stop()
+            return None
+        if time.monotonic() >= deadline:
+            stop()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        try:
+            data = chunks.get(timeout=CANCEL_POLL)
+        except queue.Empty:
+            continue
+        if data is None:
+            break
+        text = decoder.decode(data)
+        output.append(text)
+        if text and on_output(text):
+            stop()
+            return None, "".join(output), b"".join(stderr_chunks).decode("utf-8", "replace")
+
+    output.append(decoder.decode(b"", final=True))
+    process.wait()
+    for reader in readers:
+        reader.join(timeout=1)
+    return process.returncode, "".join(output), b"".join(stderr_chunks).decode("utf-8", "replace")
+
+def _probe_key():
+    """PATH 上の claude の実体のパスと更新日時（見つからなければ None）"""
+    command = shutil.which("claude")
+    if command is None:
+        return None
+    path = os.path.realpath(command)
+    try:
+        return path, os.stat(path).st_mtime
+    except OSError:
+        return None
+
+def _load_probe_cache(key, path=None):
+    """ディスク上のキャッシュが同じ CLI について有効期限内なら、その結果を返す（なければ None）"""
+    path = path or PROBE_CACHE_FILE
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if [cached.get("path"), cached.get("mtime")] != list(key):
+        return None
+    if time.time() - cached.get("checked_at", 0) > PROBE_TTL:
+        return None
+    return bool(cached.get("available"))
+
+def _save_probe_cache(key, available, path=None):
+    """確認結果をディスクに保存する（一時ファイルに書いてから置き換える）"""
+    path = path or PROBE_CACHE_FILE
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".claude_cli_probe_", suffix=".tmp",
+                                         dir=os.path.dirname(os.path.abspath(path)))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"path": key[0], "mtime": key[1], "available": available,
+                       "checked_at": time.time()}, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"⚠️  Claude Code CLI の確認結果を保存できませんでした: {e}")
+
+def check_claude_availability():
+    """
+    Claude Code CLI が利用可能かを返す
+
+    `claude --version` の実行はプロセス内で1回、ディスクのキャッシュが有効な間は0回で済ませる。
+    CLI を更新・再インストールすると実体の更新日時が変わるため、改めて確認する。
+    """
+    key = _probe_key()
+    if key is None:
+        return False
+
+    with _probe_lock:
+        if key in _probe_results:
+            return _probe_results[key]
+
+        available = _load_probe_cache(key)
+        if available is None:
+            try:
+                result = subprocess.run([key[0], '--version'],
+                                        capture_output=True, text=True, timeout=10)
+                available = result.returncode == 0
+            except (subprocess.TimeoutExpired, OSError):
+                available = False
+            _save_probe_cache(key, available)
+        _probe_results[key] = available
+        return available
+
+def get_integration():
+    """プロセス内で共有する ClaudeCodeIntegration を返す"""
+    global _integration
+    with _integration_lock:
+        if _integration is None:
+            _integration = ClaudeCodeIntegration()
+        return _integration
+
 class ClaudeCodeIntegration:
     """Claude Code CLI を自動で呼び出して画像認証を解析するクラス"""
     
@@ -11,26 +197,21 @@ class ClaudeCodeIntegration:
         self.claude_available = self._check_claude_availability()
         
     def _check_claude_availability(self):
-        """Claude Code CLI が利用可能かチェック"""
-        try:
-            result = subprocess.run(['claude', '--version'], 
-                                 capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
-                print("✅ Claude Code CLI が利用可能です")
-                return True
-            else:
-                print("⚠️  Claude Code CLI が見つかりません")
-                return False
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            print("⚠️  Claude Code CLI が見つかりません")
-            return False
+        """Claude Code CLI が利用可能かチェック（確認結果はキャッシュされる）"""
+        if check_claude_availability():
+            print("✅ Claude Code CLI が利用可能です")
+            return True
+        print("⚠️  Claude Code CLI が見つかりません")
+        return False
     
-    def solve_captcha_with_claude_code(self, image_path):
+    def solve_captcha_with_claude_code(self, image_path, cancel_event=None, stream=None):
         """
         Claude Code CLI を使用して画像認証を解く
         
         Args:
             image_path (str): 画像認証の画像ファイルパス
+            cancel_event (threading.Event): セットされたら CLI のプロセスを終了して None を返す
+            stream (bool): 出力を受け取りながら読み、6桁が揃った時点で CLI を終了するか（None で CLAUDE_STREAMING）
             
         Returns:
             str: 認識された文字列、失敗時は None
@@ -97,36 +278,40 @@ class ClaudeCodeIntegration:
                     print("💡 デフォルトプロンプトを使用します")
             
             print("🚀 Claude Code CLI 実行中...")
-            result = subprocess.run(cmd, 
-                                 capture_output=True, 
-                                 text=True, 
-                                 timeout=60)  # 60秒でタイムアウト
+            parser = DigitStream()
+            if STREAMING if stream is None else stream:
+                completed = _stream_cancellable(cmd, parser.feed, CLI_TIMEOUT, cancel_event)  # 60秒でタイムアウト
+            else:
+                completed = _run_cancellable(cmd, CLI_TIMEOUT, cancel_event)  # 60秒でタイムアウト
+            if completed is None:
+                print("⏹️  他の方法で解決済みのため、Claude Code CLI を終了しました")
+                return None
+            returncode, stdout, stderr = completed
+            
+            if returncode is None:
+                # ストリーミング中に6桁が揃った
+                print("⚡ 6桁の数字を受信した時点で Claude Code CLI を終了しました")
+                print(f"✅ 画像認証解析成功: {parser.answer}")
+                return parser.answer
             
-            if result.returncode == 0:
+            if returncode == 0:
                 # 成功時の処理
-                response = result.stdout.strip()
-                print(f"✅ Claude Code CLI 実行成功")
+                response = stdout.strip()
+                print("✅ Claude Code CLI 実行成功")
                 print(f"🤖 Claude Code 応答: {response}")
                 
-                # 数字のみを抽出
-                import re
-                numbers_only = re.findall(r'\d+', response)
-                if numbers_only:
-                    captcha_result = ''.join(numbers_only)
-                    print(f"🔢 抽出された数字: {captcha_result}")
-                    
-                    # 6桁の数字であることを確認
-                    if len(captcha_result) == 6 and captcha_result.isdigit():
-                        print(f"✅ 画像認証解析成功: {captcha_result}")
-                        return captcha_result
-                    else:
-                        print(f"⚠️  期待された6桁の数字ではありません: {captcha_result}")
-                        return None
+                # 数字（ひらがなの読みを含む）を抽出し、6桁の数字であることを確認
+                if not parser.text:
+                    parser.feed(stdout)
+                captcha_result = parser.close()
+                if captcha_result:
+                    print(f"✅ 画像認証解析成功: {captcha_result}")
+                    return captcha_result
                 else:
-                    print("❌ 応答から数字を抽出できませんでした")
+                    print(f"⚠️  期待された6桁の数字ではありません: {response}")
                     return None
             else:
-                print(f"❌ Claude Code CLI 実行失敗: {result.stderr}")
+                print(f"❌ Claude Code CLI 実行失敗: {stderr}")
                 return None
                 
         except subprocess.TimeoutExpired:
@@ -199,6 +384,7 @@ class ClaudeCodeIntegration:
                 print("❌ 6桁の数字を入力してください")
                 continue
 
+@step_timing.timed("solver.claude_code")
 def enhanced_solve_captcha_with_claude_code(image_path):
     """
     Claude Code統合を使用した画像認証解決関数
@@ -210,7 +396,7 @@ def enhanced_solve_captcha_with_claude_code(image_path):
     Returns:
         str: 認識された文字列、失敗時は None
     """
-    claude_integration = ClaudeCodeIntegration()
+    claude_integration = get_integration()
     
     # 1. 自動解析を試行
     result = claude_integration.solve_captcha_with_claude_code(image_path)
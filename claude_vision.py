@@ -0,0 +1,118 @@
+"""
+Claude API で画像認証を読み取るためのクライアント
+
+プロセス内で1つの anthropic クライアントを共有し、HTTP の接続を使い回す（keep-alive）。
+送信する画像は prepare_for_vision() でグレースケール・文字部分のみ・縮小した PNG にし、
+回答は数字6桁だけなので出力トークン数も小さく抑える。
+
+環境変数:
+    ANTHROPIC_API_KEY   API キー
+    ANTHROPIC_BASE_URL  API のURL（fake_claude_api.py のローカルサーバーで試す場合に指定）
+    CLAUDE_MODEL        使用するモデル（デフォルト: claude-3-sonnet-20240229）
+    CLAUDE_STREAMING=false  ストリーミングを使わず、応答全体を受け取ってから読む
+"""
+import base64
+import os
+import threading
+import time
+
+from captcha_answer import DigitStream
+from captcha_image import prepare_for_vision
+
+CLAUDE_MODEL = os.getenv("CLAUDE_MODEL", "claude-3-sonnet-20240229")
+MAX_TOKENS = 40           # 6桁の数字に十分な出力量（ひらがなの読みで返された場合は1文字が1トークン以上になる）
+REQUEST_TIMEOUT = 30      # 秒
+STREAMING = os.getenv("CLAUDE_STREAMING", "true").lower() == "true"
+
+CAPTCHA_PROMPT = ("この画像認証（CAPTCHA）には、ひらがなで6桁の数字が書かれています。"
+                  "読み取った数字を半角数字6桁のみで出力してください。説明は不要です。")
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_client(api_key=None, base_url=None):
+    """
+    プロセス内で共有する anthropic クライアントを返す（API キーと URL ごとに1つ）
+
+    同じクライアントを使い回すことで、2回目以降のリクエストは TLS 接続を再利用する。
+    """
+    import anthropic
+
+    api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+    base_url = base_url or os.getenv("ANTHROPIC_BASE_URL")
+    key = (api_key, base_url)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = anthropic.Anthropic(api_key=api_key, base_url=base_url,
+                                         timeout=REQUEST_TIMEOUT, max_retries=1)
+            _clients[key] = client
+        return client
+
+
+def read_captcha(image, api_key=None, base_url=None, model=None, max_tokens=MAX_TOKENS, stream=None):
+    """
+    画像認証の画像を Claude API に送り、応答テキストを返す
+
+    ストリーミング時は応答を受け取りながら数字を読み、6桁の回答が確定した時点で
+    残りの出力を待たずにストリームを閉じる。
+
+    Args:
+        image: BGR の NumPy 配列（またはファイルパス）
+        stream (bool): ストリーミングで受け取るか（None で CLAUDE_STREAMING）
+
+    Returns:
+        dict: text（応答テキスト。ストリーミングで回答が確定した場合はその6桁）,
+              answer（確定した6桁の回答、なければ None）, early（出力の途中で打ち切ったか）,
+              payload_bytes（送信した画像のバイト数）, elapsed（往復時間・秒）。
+              画像を用意できなかった場合は None
+    """
+    png_bytes = prepare_for_vision(image)
+    if png_bytes is None:
+        print("❌ 送信用の画像を作成できませんでした。")
+        return None
+
+    client = get_client(api_key, base_url)
+    request = dict(
+        model=model or CLAUDE_MODEL,
+        max_tokens=max_tokens,
+        messages=[{
+            "role": "user",
+            "content": [
+                {
+                    "type": "image",
+                    "source": {
+                        "type": "base64",
+                        "media_type": "image/png",
+                        "data": base64.b64encode(png_bytes).decode("ascii"),
+                    },
+                },
+                {"type": "text", "text": CAPTCHA_PROMPT},
+            ],
+        }],
+    )
+
+    started = time.perf_counter()
+    parser = DigitStream()
+    early = False
+    if STREAMING if stream is None else stream:
+        # with を抜けると応答の読み込みを打ち切って接続を閉じる
+        with client.messages.stream(**request) as response_stream:
+            for chunk in response_stream.text_stream:
+                if parser.feed(chunk):
+                    early = True
+                    break
+        text = parser.answer if early else parser.text.strip()
+    else:
+        response = client.messages.create(**request)
+        text = "".join(block.text for block in response.content
+                       if getattr(block, "type", None) == "text").strip()
+        parser.feed(text)
+    elapsed = time.perf_counter() - started
+
+    answer = parser.close()
+    print(f"📦 送信画像: {len(png_bytes)} バイト, 往復時間: {elapsed:.2f}秒"
+          + ("（6桁を受信した時点で打ち切り）" if early else ""))
+    return {"text": text, "answer": answer, "early": early,
+            "payload_bytes": len(png_bytes), "elapsed": elapsed}
@@ -0,0 +1,249 @@
+"""
+WebDriver の提供元（起動済みの Chrome の使い回し）
+
+webdriver.Chrome() による chromedriver と Chrome の起動は1回の実行の時間とメモリの大きな部分を占める。
+RenewalEngine は driver を直接起動・終了せず、このモジュールのプールから借りて返す。
+
+    接続モード  XSERVER_CHROME_DEBUGGER_ADDRESS を指定すると、常駐させた Chrome
+                （chrome --remote-debugging-port=9222 --user-data-dir=...）に接続し、Chrome を起動しない
+    プール      XSERVER_DRIVER_POOL_SIZE を 1 以上にすると、使い終わった Chrome を閉じずに待機させ、
+                次の実行（常駐モードの再試行など）でそのまま使う。常駐モードでは次の実行の少し前に
+                warm_up() で起動しておく
+
+待機させた driver は貸し出す前に応答を確認し、XSERVER_DRIVER_MAX_USES 回使ったものや
+XSERVER_DRIVER_MAX_AGE_MINUTES 分を過ぎたものは終了して新しく起動し直す。
+どちらも指定しない場合は従来どおり毎回起動して終了する。
+
+XSERVER_CHROME_PROFILE_DIR を指定した場合、同じ user-data-dir は1つの Chrome しか使えない（ロックされる）ため、
+待機させる数は1台までにする。接続モードの Chrome のタブは利用者のものでもあるため、返却時にも閉じない。
+
+環境変数:
+    XSERVER_CHROME_DEBUGGER_ADDRESS  常駐させた Chrome のリモートデバッグのアドレス（例: 127.0.0.1:9222）
+    XSERVER_DRIVER_POOL_SIZE         待機させておく driver の数（デフォルト: 0 = 毎回終了する）
+    XSERVER_DRIVER_MAX_USES          1つの driver を使い回す最大回数（デフォルト: 20）
+    XSERVER_DRIVER_MAX_AGE_MINUTES   1つの driver を使い回す最大時間（デフォルト: 60分）
+"""
+import atexit
+import os
+import threading
+import time
+
+DEBUGGER_ADDRESS = os.getenv("XSERVER_CHROME_DEBUGGER_ADDRESS")
+POOL_SIZE = int(os.getenv("XSERVER_DRIVER_POOL_SIZE", "0"))
+MAX_USES = int(os.getenv("XSERVER_DRIVER_MAX_USES", "20"))
+MAX_AGE_MINUTES = float(os.getenv("XSERVER_DRIVER_MAX_AGE_MINUTES", "60"))
+# browser_session.py と同じ設定（selenium を読み込まないよう、ここでも環境変数から読む）
+CHROME_PROFILE_DIR = os.getenv("XSERVER_CHROME_PROFILE_DIR")
+
+_lock = threading.Lock()
+_pools = {}
+
+
+class _Entry:
+    """プールが管理する driver 1つ分の状態"""
+
+    def __init__(self, driver, created):
+        self.driver = driver
+        self.created = created
+        self.uses = 0
+
+
+class DriverPool:
+    """
+    driver を貸し出し、返却されたものを待機させて使い回す
+
+    Args:
+        launch (callable): 新しい driver を返す関数
+        size (int): 待機させておく driver の数（0 なら返却時に毎回終了する）
+        max_uses (int): 1つの driver を貸し出す最大回数
+        max_age (float): 1つの driver を使い回す最大秒数
+        clock (callable): 経過時間の計測に使う時計
+        reset (callable): 返却された driver を次の貸し出しに備えて戻す関数（省略時は reset。戻せなければ False を返す）
+    """
+
+    def __init__(self, launch, size=0, max_uses=MAX_USES, max_age=MAX_AGE_MINUTES * 60, clock=time.monotonic,
+                 reset=None):
+        self.launch = launch
+        self.size = size
+        self._reset = reset
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.clock = clock
+        self._lock = threading.Condition()
+        self._idle = []
+        self._in_use = {}
+        self._launching = 0
+
+    def _expired(self, entry):
+        return entry.uses >= self.max_uses or self.clock() - entry.created >= self.max_age
+
+    def _new_entry(self):
+        return _Entry(self.launch(), self.clock())
+
+    def _retire(self, entry, reason):
+        print(f"♻️  Chrome を終了します（{reason}、{entry.uses}回使用）。")
+        try:
+            entry.driver.quit()
+        except Exception as e:
+            print(f"⚠️  Chrome の終了でエラー: {e}")
+
+    def acquire(self):
+        """使える driver を返す（待機中のものがなければ起動する）"""
+        while True:
+            with self._lock:
+                # 事前起動中のものがあれば、二重に起動せずに完了を待つ
+                while not self._idle and self._launching:
+                    self._lock.wait()
+                entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                started = time.perf_counter()
+                entry = self._new_entry()
+                print(f"🌐 Chrome を起動しました（{time.perf_counter() - started:.2f}秒）。")
+                break
+            if self._expired(entry):
+                self._retire(entry, "使用回数・時間の上限")
+                continue
+            if not is_healthy(entry.driver):
+                self._retire(entry, "応答なし")
+                continue
+            print(f"♨️  待機中の Chrome を使います（{entry.uses + 1}回目）。")
+            break
+        entry.uses += 1
+        with self._lock:
+            self._in_use[id(entry.driver)] = entry
+        return entry.driver
+
+    def release(self, driver, healthy=True):
+        """driver を返却する（待機させられなければ終了する）"""
+        with self._lock:
+            entry = self._in_use.pop(id(driver), None)
+        if entry is None:
+            return
+        with self._lock:
+            keep = healthy and len(self._idle) < self.size and not self._expired(entry)
+        if keep and (self._reset or reset)(driver):
+            with self._lock:
+                self._idle.append(entry)
+            return
+        self._retire(entry, "返却" if self.size == 0 else "待機させない")
+
+    def prefill(self):
+        """待機させる driver が size 台になるまで起動しておく"""
+        while True:
+            with self._lock:
+                if len(self._idle) + len(self._in_use) + self._launching >= self.size:
+                    return
+                self._launching += 1
+            try:
+                entry = self._new_entry()
+            except Exception as e:
+                print(f"⚠️  Chrome の事前起動に失敗しました: {e}")
+                entry = None
+            with self._lock:
+                self._launching -= 1
+                if entry is not None:
+                    self._idle.append(entry)
+                self._lock.notify_all()
+            if entry is None:
+                return
+            print("♨️  Chrome を事前に起動しました。")
+
+    def close(self):
+        """待機中の driver を全て終了する"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._retire(entry, "プールの終了")
+
+
+def is_healthy(driver):
+    """driver がまだ応答するか"""
+    try:
+        return driver.execute_script("return 1") == 1
+    except Exception:
+        return False
+
+
+def reset(driver):
+    """次の実行に備えて、追加のタブを閉じて空白ページに戻す（クッキーはセッションの再利用のため残す）"""
+    try:
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.get("about:blank")
+        return True
+    except Exception as e:
+        print(f"⚠️  Chrome の状態を戻せませんでした: {e}")
+        return False
+
+
+def keep_tabs(driver):
+    """接続モードの返却時の処理: 利用者が開いているタブは閉じず、表示中のページもそのままにする"""
+    return is_healthy(driver)
+
+
+def _launch_chrome(headless):
+    from selenium import webdriver
+    from browser_session import build_chrome_options
+
+    return webdriver.Chrome(options=build_chrome_options(headless=headless))
+
+
+def _attach_chrome():
+    """常駐している Chrome に接続する（quit() は chromedriver だけを終了し、Chrome は閉じない）"""
+    from selenium import webdriver
+    import lean_navigation
+
+    # 接続時は起動オプション（excludeSwitches など）を渡すと chromedriver が拒否するため、アドレスだけを指定する
+    options = webdriver.ChromeOptions()
+    options.debugger_address = DEBUGGER_ADDRESS
+    lean_navigation.apply_page_load_strategy(options)
+    print(f"🔌 常駐している Chrome に接続します: {DEBUGGER_ADDRESS}")
+    return webdriver.Chrome(options=options)
+
+
+def pool_size(size=None, profile_dir=None):
+    """
+    待機させる driver の数（プロファイルのディレクトリを指定した場合は1台まで）
+
+    同じ user-data-dir を使う Chrome を2つ起動すると、2つ目はロックのため起動に失敗する。
+    """
+    size = POOL_SIZE if size is None else size
+    profile_dir = CHROME_PROFILE_DIR if profile_dir is None else profile_dir
+    if size > 1 and profile_dir:
+        print(f"⚠️  XSERVER_CHROME_PROFILE_DIR を指定しているため、待機させる Chrome は1台にします"
+              f"（XSERVER_DRIVER_POOL_SIZE={size}）。")
+        return 1
+    return size
+
+
+def get_pool(headless=False):
+    """プロセスで共有するプール（接続モードでは Chrome を終了せず1つの接続を使い回す）"""
+    key = "attach" if DEBUGGER_ADDRESS else bool(headless)
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            if DEBUGGER_ADDRESS:
+                pool = DriverPool(_attach_chrome, size=max(POOL_SIZE, 1), reset=keep_tabs)
+            else:
+                pool = DriverPool(lambda: _launch_chrome(headless), size=pool_size())
+            _pools[key] = pool
+        return pool
+
+
+@atexit.register
+def close_all():
+    """待機中の driver を全て終了する（プロセスの終了時に Chrome を残さない）"""
+    with _lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+def warm_up(headless=False):
+    """プールを使う設定なら、バックグラウンドで driver を起動しておく"""
+    pool = get_pool(headless)
+    if pool.size > 0:
+        threading.Thread(target=pool.prefill, name="chrome-prefill", daemon=True).start()
@@ -0,0 +1,75 @@
+"""
+VPS詳細ページのHTMLから利用期限を読み取る
+
+ページのHTML（driver.page_source の1回の取得、または HTTP で取得した本文）を
+コンパイル済みの正規表現で1度だけ走査し、「利用期限」の見出しに続く日時を取り出す。
+年は固定せず（2025- などに依存しない）、「2025-07-14 08:20」「2025/07/14 08:20」
+「2025年7月14日 8時20分」のいずれの形式も読む。
+
+1ページに複数のサーバーの利用期限が並ぶレイアウトでは、サーバーIDが（他の数字の一部ではなく）
+現れた位置より後にある最初の利用期限をそのサーバーのものとする。サーバーIDが見つからない場合は
+他のサーバーの利用期限を誤って使わないよう None を返す（ブラウザでの確認に回る）。
+
+「利用期限」の見出しがないページ（メンテナンスのお知らせ、レイアウトの変更、途中に挟まるページなど）では
+ページ内の他の日時を利用期限とみなさず None を返す。誤った日時を状態ファイルに保存すると、
+その日時まで更新の確認が行われなくなるため。
+"""
+import re
+from datetime import datetime
+
+_DATE_TIME = (r"(?P<year>\d{4})\s*[-/年]\s*(?P<month>\d{1,2})\s*[-/月]\s*(?P<day>\d{1,2})\s*日?"
+              r"(?:\s|&nbsp;|<[^>]*>)*"
+              r"(?P<hour>\d{1,2})\s*[:時]\s*(?P<minute>\d{2})")
+
+# 「利用期限」の見出しから、タグ・空白・区切り記号（数字を含まない200文字まで）を挟んだ日時
+EXPIRY_PATTERN = re.compile(r"利用期限(?:[^0-9<]|<[^>]*>){0,200}?" + _DATE_TIME)
+
+
+def _to_datetime(match):
+    try:
+        return datetime(int(match["year"]), int(match["month"]), int(match["day"]),
+                        int(match["hour"]), int(match["minute"]))
+    except ValueError:
+        return None
+
+
+def find_expiries(source):
+    """
+    ページ内の「利用期限」の見出しに続く日時を全て返す
+
+    Returns:
+        list: (見出しの位置, datetime) のリスト（ページ内の順）
+    """
+    expiries = []
+    for match in EXPIRY_PATTERN.finditer(source):
+        expiry_date = _to_datetime(match)
+        if expiry_date is not None:
+            expiries.append((match.start(), expiry_date))
+    return expiries
+
+
+def parse_expiry(source, server_id=None):
+    """
+    ページのHTML（またはテキスト）から利用期限を1つ読み取る
+
+    Args:
+        source (str): ページのHTML
+        server_id (str): 複数のサーバーが並ぶページで、どのサーバーの利用期限かを選ぶためのID
+
+    Returns:
+        datetime: 利用期限（「利用期限」の見出しに続く日時が見つからない場合と、複数の利用期限のうち
+                  どれがこのサーバーのものか決められない場合は None）
+    """
+    expiries = find_expiries(source)
+    if len(expiries) <= 1:
+        return expiries[0][1] if expiries else None
+    if not server_id:
+        return None
+    # 「123」が「41234」の一部に一致しないよう、前後が数字でない位置だけをサーバーIDとみなす
+    match = re.search(rf"(?<!\d){re.escape(str(server_id))}(?!\d)", source)
+    if match is None:
+        return None
+    for start, expiry_date in expiries:
+        if start > match.start():
+            return expiry_date
+    return None
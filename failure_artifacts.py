@@ -0,0 +1,163 @@
+"""
+失敗時の記録（スクリーンショットと DOM）の非同期保存
+
+以前は失敗のたびに driver.save_screenshot() で固定のファイル名（login_failed_error.png など）に
+同期的に書き込んでいたため、PNG の保存が処理の途中に入り、前回の実行の記録も上書きされていた。
+
+capture() は呼び出したスレッドではスクリーンショット（base64 のまま）とページのHTMLを受け取るだけにし、
+デコード・gzip 圧縮・書き込みはバックグラウンドのワーカーに任せる。ファイルは実行ごとのディレクトリ
+（artifacts/<実行ID>/）に、ステップ名（step_timing のスパンのパス）付きで保存し、
+最新の XSERVER_ARTIFACT_RUNS 回分だけを残す（古い実行のディレクトリは削除する）。
+常駐モードでは1つのプロセスで何度も実行するため、RenewalEngine.run() の始めに start_run() で
+新しい実行IDに切り替える。
+
+環境変数:
+    XSERVER_ARTIFACT_DIR   保存先（デフォルト: artifacts）
+    XSERVER_ARTIFACT_RUNS  残す実行の数（デフォルト: 10）
+"""
+import atexit
+import base64
+import gzip
+import os
+import queue
+import re
+import shutil
+import threading
+from datetime import datetime
+
+import step_timing
+from captcha_image import RUN_ID
+
+ARTIFACT_DIR = os.getenv("XSERVER_ARTIFACT_DIR", "artifacts")
+KEEP_RUNS = int(os.getenv("XSERVER_ARTIFACT_RUNS", "10"))
+QUEUE_SIZE = 16     # 書き込み待ちの上限（超えた分は記録しない）
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_lock = threading.Lock()
+_worker = None
+_sequence = 0
+_run_id = RUN_ID    # 最初の実行はデバッグ画像と同じ実行IDを使う
+_runs = 1
+
+
+def start_run():
+    """
+    次の記録から新しい実行のディレクトリに保存するよう切り替え、古い実行のディレクトリを削除する
+
+    Returns:
+        str: 新しい実行ID
+    """
+    global _run_id, _runs, _sequence
+    with _lock:
+        _runs += 1
+        _sequence = 0
+        # 同じ秒に始まった実行とも区別し、名前順が実行順になるよう連番を付ける
+        _run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{_runs:04d}"
+        run_id = _run_id
+    prune()
+    return run_id
+
+
+def current_run_dir():
+    """今の実行の記録を保存するディレクトリ"""
+    return os.path.join(ARTIFACT_DIR, _run_id)
+
+
+def _tag(name):
+    """ファイル名の部品: 連番_ステップ_名前"""
+    global _sequence
+    with _lock:
+        _sequence += 1
+        sequence = _sequence
+    path = step_timing.current_path()
+    step = path.split("/", 1)[1] if path and "/" in path else ""
+    parts = [f"{sequence:02d}", step.replace("/", "-"), name]
+    return re.sub(r"[^\w.-]", "_", "_".join(part for part in parts if part))
+
+
+def capture(driver, name):
+    """
+    表示中のページのスクリーンショットとHTMLを受け取り、保存をワーカーに任せる
+
+    Args:
+        driver: WebDriver
+        name (str): 失敗の種類（例: update_button_not_found）
+
+    Returns:
+        str: 保存先のパス（拡張子なし。受け取れなかった場合は None）
+    """
+    try:
+        screenshot = driver.get_screenshot_as_base64()
+    except Exception as e:
+        print(f"⚠️  スクリーンショットを取得できませんでした: {e}")
+        screenshot = None
+    try:
+        html = driver.page_source
+    except Exception:
+        html = None
+    if screenshot is None and html is None:
+        return None
+
+    path = os.path.join(current_run_dir(), _tag(name))
+    try:
+        _queue.put_nowait((path, screenshot, html))
+    except queue.Full:
+        print(f"⚠️  記録の書き込みが追いつかないため、{name} は保存しません。")
+        return None
+    _ensure_worker()
+    print(f"📸 失敗時の記録を保存します: {path}.png / .html.gz")
+    return path
+
+
+def _ensure_worker():
+    global _worker
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name="failure-artifacts", daemon=True)
+            _worker.start()
+
+
+def _work():
+    while True:
+        path, screenshot, html = _queue.get()
+        try:
+            _write(path, screenshot, html)
+        except Exception as e:
+            print(f"⚠️  失敗時の記録を保存できませんでした: {path} ({e})")
+        finally:
+            _queue.task_done()
+
+
+def _write(path, screenshot, html):
+    directory = os.path.dirname(path)
+    new_run = not os.path.isdir(directory)
+    os.makedirs(directory, exist_ok=True)
+    if screenshot is not None:
+        with open(f"{path}.png", "wb") as f:
+            f.write(base64.b64decode(screenshot))
+    if html is not None:
+        with gzip.open(f"{path}.html.gz", "wt", encoding="utf-8") as f:
+            f.write(html)
+    if new_run:
+        prune()
+
+
+def prune(keep=None):
+    """最新の keep 回分（実行IDは日時で始まるため名前順）を残して古い実行のディレクトリを削除する"""
+    keep = KEEP_RUNS if keep is None else keep
+    try:
+        runs = sorted(entry for entry in os.listdir(ARTIFACT_DIR)
+                      if os.path.isdir(os.path.join(ARTIFACT_DIR, entry)))
+    except FileNotFoundError:
+        return []
+    removed = runs[:-keep] if keep > 0 else runs
+    for run in removed:
+        shutil.rmtree(os.path.join(ARTIFACT_DIR, run), ignore_errors=True)
+    return removed
+
+
+@atexit.register
+def flush():
+    """書き込み待ちの記録を全て保存し終えるまで待つ（プロセスの終了時にも呼ばれる）"""
+    if _worker is not None and _worker.is_alive():
+        _queue.join()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Claude API（/v1/messages）の代わりをするローカルHTTPサーバー
+
+ネットワークに接続せずに、送信する画像のサイズ・往復時間・接続の再利用を確認するためのもの。
+受け取ったリクエストの本文サイズと、開かれたTCP接続の数を記録する。
+"stream": true のリクエストには、回答を少しずつ Server-Sent Events で返す
+（tail を指定すると回答の後に説明文を続け、途中で打ち切られたストリームの数を記録する）。
+
+使い方:
+    python fake_claude_api.py                  # sample.png で計測（元画像と縮小画像を比較）
+    python fake_claude_api.py --image 4.png --runs 20 --latency 0.2
+    CLAUDE_STREAMING=false python fake_claude_api.py   # ストリーミングなしと比較
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeClaudeAPI:
+    """
+    /v1/messages に固定の回答を返すローカルサーバー
+
+    with FakeClaudeAPI(answer="123456") as api:
+        client = anthropic.Anthropic(api_key="test", base_url=api.base_url)
+    """
+
+    def __init__(self, answer="123456", latency=0.0, tail="", chunk_size=2, chunk_delay=0.0,
+                 host="127.0.0.1", port=0):
+        self.answer = answer
+        self.latency = latency
+        self.tail = tail                # ストリーミング時に回答の後に続ける文
+        self.chunk_size = chunk_size    # ストリーミング時の1イベントあたりの文字数
+        self.chunk_delay = chunk_delay  # ストリーミング時のイベント間隔（秒）
+        self.aborted_streams = 0        # クライアントが途中で閉じたストリームの数
+        self.requests = []      # 受け取ったリクエスト（JSON）
+        self.body_sizes = []    # リクエスト本文のバイト数
+        self.connections = 0    # 開かれたTCP接続の数（keep-alive が効いていれば1）
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-claude-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _record(self, body, payload):
+        with self._lock:
+            self.body_sizes.append(len(body))
+            self.requests.append(payload)
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive を有効にする
+
+            def setup(self):
+                super().setup()
+                with api._lock:
+                    api.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path.rstrip("/") != "/v1/messages":
+                    self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+                    return
+
+                payload = json.loads(body or b"{}")
+                api._record(body, payload)
+                if api.latency:
+                    time.sleep(api.latency)
+                if payload.get("stream"):
+                    self._send_stream(payload)
+                    return
+
+                self._send_json(200, {
+                    "id": f"msg_fake_{len(api.requests)}",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": payload.get("model", "fake"),
+                    "content": [{"type": "text", "text": api.answer}],
+                    "stop_reason": "end_turn",
+                    "stop_sequence": None,
+                    "usage": {"input_tokens": len(body) // 4, "output_tokens": len(api.answer)},
+                })
+
+            def _send_stream(self, payload):
+                text = api.answer + api.tail
+                chunks = [text[i:i + api.chunk_size] for i in range(0, len(text), api.chunk_size)]
+                events = [("message_start", {"type": "message_start", "message": {
+                    "id": f"msg_fake_{len(api.requests)}", "type": "message", "role": "assistant",
+                    "model": payload.get("model", "fake"), "content": [], "stop_reason": None,
+                    "stop_sequence": None, "usage": {"input_tokens": 1, "output_tokens": 1}}}),
+                    ("content_block_start", {"type": "content_block_start", "index": 0,
+                                             "content_block": {"type": "text", "text": ""}})]
+                events += [("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                    "delta": {"type": "text_delta", "text": chunk}})
+                           for chunk in chunks]
+                events += [("content_block_stop", {"type": "content_block_stop", "index": 0}),
+                           ("message_delta", {"type": "message_delta",
+                                              "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                              "usage": {"output_tokens": len(text)}}),
+                           ("message_stop", {"type": "message_stop"})]
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for name, data in events:
+                        encoded = f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+                        self.wfile.write(f"{len(encoded):X}\r\n".encode("ascii") + encoded + b"\r\n")
+                        self.wfile.flush()
+                        if name == "content_block_delta" and api.chunk_delay:
+                            time.sleep(api.chunk_delay)
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    with api._lock:
+                        api.aborted_streams += 1
+                    self.close_connection = True
+
+            def _send_json(self, status, data):
+                encoded = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ローカルの Claude API 代替サーバーで送信サイズと往復時間を計測する")
+    parser.add_argument("--image", default="sample.png", help="送信する画像認証の画像")
+    parser.add_argument("--runs", type=int, default=10, help="リクエスト回数")
+    parser.add_argument("--latency", type=float, default=0.0, help="サーバー側で加える遅延（秒）")
+    parser.add_argument("--tail", type=int, default=0, help="回答の後に続ける説明文の文字数（ストリーミングの打ち切り確認用）")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="ストリーミングのイベント間隔（秒）")
+    args = parser.parse_args()
+
+    import cv2
+    from captcha_image import encode_png, prepare_for_vision
+    from claude_vision import read_captcha
+
+    image = cv2.imread(args.image)
+    if image is None:
+        print(f"❌ 画像を読み込めませんでした: {args.image}")
+        return
+
+    original_bytes = len(encode_png(image))
+    prepared_bytes = len(prepare_for_vision(image))
+    print(f"🧪 送信画像のサイズ: 元画像 {original_bytes} バイト → 送信用 {prepared_bytes} バイト"
+          f"（{prepared_bytes / original_bytes:.0%}）")
+
+    with FakeClaudeAPI(latency=args.latency, tail="\n" + "説" * args.tail, chunk_delay=args.chunk_delay) as api:
+        elapsed = [read_captcha(image, api_key="fake-key", base_url=api.base_url)["elapsed"]
+                   for _ in range(args.runs)]
+        print("=" * 60)
+        print(f"リクエスト本文: 中央値 {statistics.median(api.body_sizes):.0f} バイト")
+        print(f"往復時間: 1回目 {elapsed[0] * 1000:.1f}ms, 2回目以降の中央値 "
+              f"{statistics.median(elapsed[1:] or elapsed) * 1000:.1f}ms")
+        print(f"TCP接続数: {api.connections}（{args.runs}リクエスト）")
+        print(f"max_tokens: {api.requests[-1].get('max_tokens')}, ストリーミング: {bool(api.requests[-1].get('stream'))}")
+        print(f"途中で打ち切られたストリーム: {api.aborted_streams}")
+        print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
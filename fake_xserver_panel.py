@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+XServer VPS パネルの代わりをするローカルHTTPサーバー
+
+本物のパネル（secure.xserver.ne.jp）に接続せずに、各スクリプトのログイン → 利用期限の確認 →
+更新 → 画像認証 → 完了までの流れを実行するためのもの。スクリプトが使う要素（memberid /
+user_password、利用期限の行、更新ボタン、画像認証の入力欄、OKボタン）を同じ形で返す。
+ページごとに遅延と失敗（HTTP 503）を加えられ、受け取ったリクエストを時刻付きで記録する。
+
+スクリプトを接続するには、環境変数 XSERVER_BASE_URL にこのサーバーのURLを指定する。
+各スクリプトのステップごとの時間は bench_panel.py で計測する。
+
+使い方:
+    python fake_xserver_panel.py                       # http://127.0.0.1:8765 で起動
+    python fake_xserver_panel.py --latency 0.2 --fail detail=1 --no-captcha
+"""
+
+import argparse
+import html
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SESSION_COOKIE = "XSERVER_SESSION"
+DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+
+# パス → ページ名（遅延・失敗の指定と、リクエストの記録に使う）
+PAGES = {
+    "/xapanel/login/xvps/": "login",
+    "/xapanel/xvps/": "panel",
+    "/xapanel/xvps/server/detail": "detail",
+    "/xapanel/xvps/server/freevps/extend/index": "extend",
+    "/xapanel/xvps/server/freevps/extend/conf": "conf",
+    "/xapanel/xvps/server/freevps/extend/do": "captcha",
+    "/xapanel/xvps/server/freevps/extend/complete": "complete",
+    "/xapanel/xvps/captcha.png": "captcha_image",
+}
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="ja">
+<head><meta charset="utf-8"><title>{title} | XServer VPS（ローカル）</title></head>
+<body>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+
+class FakeXServerPanel:
+    """
+    XServer VPS パネルのログイン・VPS詳細・無料VPSの更新ページを返すローカルサーバー
+
+    with FakeXServerPanel(servers={"40092988": expiry}) as panel:
+        os.environ["XSERVER_BASE_URL"] = panel.base_url
+    """
+
+    def __init__(self, servers=None, username=None, password=None, captcha=True,
+                 captcha_image="sample.png", captcha_answer="123456",
+                 latency=0.0, page_latency=None, failures=None, host="127.0.0.1", port=0):
+        # サーバーID → 利用期限（省略時は6時間後に期限が切れる1台）
+        self.servers = dict(servers or {"40092988": datetime.now() + timedelta(hours=6)})
+        self.username = username        # None ならどのログインIDでも受け付ける
+        self.password = password
+        self.captcha = captcha          # False で画像認証を出さずに完了ページへ進む
+        self.captcha_image = captcha_image
+        self.captcha_answer = captcha_answer
+        self.latency = latency          # 全ページ共通の遅延（秒）
+        self.page_latency = dict(page_latency or {})    # ページ名 → 遅延（秒）
+        self.failures = dict(failures or {})            # ページ名 → 残りの失敗回数（HTTP 503）
+        self.requests = []              # (受信時刻 perf_counter, メソッド, ページ名, ステータス)
+        self.renewals = []              # 更新したサーバーID
+        self.captcha_attempts = []      # 送信された画像認証の回答
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-xserver-panel", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_log(self):
+        """記録したリクエストを消す（計測ごとに呼ぶ）"""
+        with self._lock:
+            self.requests.clear()
+
+    def _record(self, started, method, page, status):
+        with self._lock:
+            self.requests.append((started, method, page, status))
+
+    def _take_failure(self, page):
+        with self._lock:
+            if self.failures.get(page, 0) > 0:
+                self.failures[page] -= 1
+                return True
+            return False
+
+    def _extend(self, server_id):
+        """無料VPSの更新仕様: 残り時間 + 2日間（期限切れの場合は現在から2日間）"""
+        with self._lock:
+            expiry = max(self.servers[server_id], datetime.now())
+            self.servers[server_id] = expiry + timedelta(days=2)
+            self.renewals.append(server_id)
+
+    def _handler_class(self):
+        panel = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def _dispatch(self, method):
+                started = time.perf_counter()
+                url = urlsplit(self.path)
+                page = PAGES.get(url.path, "other")
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                form = {}
+                if method == "POST":
+                    body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                    form = {key: values[-1] for key, values in parse_qs(body.decode("utf-8")).items()}
+
+                delay = panel.page_latency.get(page, panel.latency)
+                if delay:
+                    time.sleep(delay)
+
+                if panel._take_failure(page):
+                    status = self._send_page(503, "Service Unavailable", "<p>しばらく時間をおいてから再度お試しください。</p>")
+                else:
+                    handler = getattr(self, f"_page_{page}", None)
+                    status = handler(method, query, form) if handler else \
+                        self._send_page(404, "Not Found", "<p>ページが見つかりません。</p>")
+                panel._record(started, method, page, status)
+
+            # --- ページ ---
+
+            def _page_login(self, method, query, form):
+                if method == "GET":
+                    return self._send_login_form()
+                valid = (panel.username is None or form.get("memberid") == panel.username) and \
+                        (panel.password is None or form.get("user_password") == panel.password)
+                if not valid:
+                    return self._send_login_form('<div class="error-message">IDまたはパスワードが違います</div>')
+                token = secrets.token_hex(16)
+                with panel._lock:
+                    panel._sessions.add(token)
+                return self._redirect("/xapanel/xvps/", cookie=f"{SESSION_COOKIE}={token}; Path=/; HttpOnly")
+
+            def _page_panel(self, method, query, form):
+                if not self._logged_in():
+                    return self._redirect("/xapanel/login/xvps/")
+                rows = "".join(f'<li><a href="/xapanel/xvps/server/detail?id={html.escape(server_id)}">'
+                               f'{html.escape(server_id)}</a></li>' for server_id in panel.servers)
+                return self._send_page(200, "VPS一覧", f"<ul>{rows}</ul>")
+
+            def _page_detail(self, method, query, form):
+                if not self._logged_in():
+                    return self._redirect("/xapanel/login/xvps/")
+                server_id = query.get("id", "")
+                if server_id not in panel.servers:
+                    return self._send_page(404, "Not Found", "<p>サーバーが見つかりません。</p>")
+                expiry = panel.servers[server_id]
+                # 更新ボタンは期限の24時間前から表示される
+                button = ""
+                if expiry - datetime.now() <= timedelta(hours=24):
+                    button = (f'<a href="/xapanel/xvps/server/freevps/extend/index?id={html.escape(server_id)}">'
+                              f'更新する</a>')
+                return self._send_page(200, "VPS詳細", f"""
+<table>
+<tr><th>サーバーID</th><td>{html.escape(server_id)}</td></tr>
+<tr><th>プラン</th><td>無料VPS</td></tr>
+<tr><th>利用期限</th><td>{expiry.strftime(DATETIME_FORMAT)}</td></tr>
+</table>
+{button}""")
+
+            def _page_extend(self, method, query, form):
+                if not self._logged_in():
+                    return self._redirect("/xapanel/login/xvps/")
+                server_id = html.escape(query.get("id", ""))
+                return self._send_page(200, "無料VPSの利用期限延長", f"""
+<form method="post" action="/xapanel/xvps/server/freevps/extend/index">
+<input type="hidden" name="id" value="{server_id}">
+<button type="submit" formaction="/xapanel/xvps/server/freevps/extend/conf">引き続き無料VPSの利用を継続する</button>
+</form>""")
+
+            def _page_conf(self, method, query, form):
+                if not self._logged_in():
+                    return self._redirect("/xapanel/login/xvps/")
+                server_id = html.escape(form.get("id", query.get("id", "")))
+                return self._send_page(200, "確認", f"""
+<p>無料VPSの利用期限を延長します。</p>
+<form method="post" action="/xapanel/xvps/server/freevps/extend/do">
+<input type="hidden" name="id" value="{server_id}">
+<button type="submit">無料VPSの利用を継続する</button>
+</form>""")
+
+            def _page_captcha(self, method, query, form):
+                if not self._logged_in():
+                    return self._redirect("/xapanel/login/xvps/")
+                server_id = form.get("id", "")
+                if server_id not in panel.servers:
+                    return self._send_page(404, "Not Found", "<p>サーバーが見つかりません。</p>")
+
+                if panel.captcha:
+                    if "captcha" not in form:
+                        return self._send_captcha_form(server_id)
+                    answer = form["captcha"].strip()
+                    with panel._lock:
+                        panel.captcha_attempts.append(answer)
+                    if answer != panel.captcha_answer:
+                        return self._send_captcha_form(
+                            server_id, '<p class="error-message">画像認証の数字が正しくありません</p>')
+
+                panel._extend(server_id)
+                return self._redirect(f"/xapanel/xvps/server/freevps/extend/complete?id={server_id}")
+
+            def _page_complete(self, method, query, form):
+                if not self._logged_in():
+                    return self._redirect("/xapanel/login/xvps/")
+                server_id = query.get("id", "")
+                expiry = panel.servers.get(server_id)
+                expiry_text = expiry.strftime(DATETIME_FORMAT) if expiry else "-"
+                return self._send_page(200, "手続き完了", f"""
+<div id="complete-dialog">
+<p>無料VPSの利用期限を延長しました。新しい利用期限: {expiry_text}</p>
+<button type="button" onclick="document.getElementById('complete-dialog').style.display='none'">OK</button>
+</div>
+<a href="/xapanel/xvps/server/detail?id={html.escape(server_id)}">VPS詳細へ戻る</a>""")
+
+            def _page_captcha_image(self, method, query, form):
+                try:
+                    with open(panel.captcha_image, "rb") as f:
+                        data = f.read()
+                except OSError:
+                    return self._send_page(404, "Not Found", "<p>画像が見つかりません。</p>")
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(data)
+                return 200
+
+            # --- 共通 ---
+
+            def _logged_in(self):
+                for part in self.headers.get("Cookie", "").split(";"):
+                    name, _, value = part.strip().partition("=")
+                    if name == SESSION_COOKIE and value in panel._sessions:
+                        return True
+                return False
+
+            def _send_login_form(self, error=""):
+                return self._send_page(200, "ログイン", f"""
+{error}
+<form method="post" action="/xapanel/login/xvps/">
+<label>ログインID <input type="text" name="memberid"></label>
+<label>パスワード <input type="password" name="user_password"></label>
+<input type="submit" value="ログインする">
+</form>""")
+
+            def _send_captcha_form(self, server_id, message=""):
+                return self._send_page(200, "画像認証", f"""
+{message}
+<p>画像認証を行ってください</p>
+<form method="post" action="/xapanel/xvps/server/freevps/extend/do">
+<input type="hidden" name="id" value="{html.escape(server_id)}">
+<div class="form-captcha"><img src="/xapanel/xvps/captcha.png" alt="画像認証" width="300" height="80"></div>
+<input type="text" name="captcha" class="input-captcha" placeholder="画像の数字を入力">
+<button type="submit">送信する</button>
+</form>""")
+
+            def _send_page(self, status, title, body):
+                encoded = PAGE_TEMPLATE.format(title=title, body=body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+                return status
+
+            def _redirect(self, location, cookie=None):
+                self.send_response(302)
+                self.send_header("Location", location)
+                if cookie:
+                    self.send_header("Set-Cookie", cookie)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return 302
+
+        return Handler
+
+
+def parse_page_values(values, convert):
+    """["detail=0.5", "login=1"] → {"detail": 0.5, "login": 1}"""
+    parsed = {}
+    for value in values or []:
+        page, _, amount = value.partition("=")
+        if page not in PAGES.values():
+            raise argparse.ArgumentTypeError(f"不明なページ名です: {page}（{', '.join(PAGES.values())}）")
+        parsed[page] = convert(amount)
+    return parsed
+
+
+def add_panel_arguments(parser):
+    """パネルの設定用の引数を追加する（bench_panel.py と共通）"""
+    parser.add_argument("--server-ids", default="40092988", help="パネルに用意するサーバーID（カンマ区切り）")
+    parser.add_argument("--expires-in", type=float, default=6.0, help="各サーバーの利用期限までの時間（時間）")
+    parser.add_argument("--latency", type=float, default=0.0, help="全ページに加える遅延（秒）")
+    parser.add_argument("--page-latency", action="append", metavar="PAGE=SEC",
+                        help="ページごとの遅延（例: detail=0.5）。繰り返し指定可")
+    parser.add_argument("--fail", action="append", metavar="PAGE=N",
+                        help="ページごとに最初のN回を HTTP 503 にする（例: detail=1）。繰り返し指定可")
+    parser.add_argument("--no-captcha", action="store_true", help="画像認証を出さずに完了ページへ進む")
+    parser.add_argument("--captcha-image", default="sample.png", help="画像認証として表示する画像")
+    parser.add_argument("--captcha-answer", default="123456", help="画像認証の正解")
+
+
+def panel_from_arguments(args, port=0):
+    """add_panel_arguments() の引数から FakeXServerPanel を作る"""
+    expiry = datetime.now() + timedelta(hours=args.expires_in)
+    return FakeXServerPanel(
+        servers={server_id.strip(): expiry for server_id in args.server_ids.split(",") if server_id.strip()},
+        captcha=not args.no_captcha,
+        captcha_image=os.path.abspath(args.captcha_image),
+        captcha_answer=args.captcha_answer,
+        latency=args.latency,
+        page_latency=parse_page_values(args.page_latency, float),
+        failures=parse_page_values(args.fail, int),
+        port=port,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XServer VPS パネルの代わりをするローカルサーバーを起動する")
+    add_panel_arguments(parser)
+    parser.add_argument("--port", type=int, default=8765, help="待ち受けるポート")
+    args = parser.parse_args()
+
+    with panel_from_arguments(args, port=args.port) as panel:
+        print(f"🧪 ローカルの XServer パネルを起動しました: {panel.base_url}")
+        print(f"   export XSERVER_BASE_URL={panel.base_url}")
+        print(f"   サーバー: {', '.join(panel.servers)}  画像認証: {'あり（正解 ' + panel.captcha_answer + '）' if panel.captcha else 'なし'}")
+        print("   Ctrl+C で終了します。")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("\n終了します。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+ブラウザを使わない利用期限の確認（HTTP プローブ）
+
+利用期限を読むだけなら VPS 詳細ページ（xapanel/xvps/server/detail?id=）のHTMLがあればよい。
+前回のブラウザのセッションで保存したクッキー（XSERVER_COOKIE_JAR）を付けて、Keep-Alive の
+HTTP 接続1本で各サーバーの詳細ページを取得し、get_expiry_date_from_page と同じ expiry_parser で読み取る。
+セッションが拒否された（ログインページに戻された）場合と、実際に更新が必要な場合だけブラウザを起動する。
+
+標準ライブラリだけで動き、selenium も Chrome も読み込まない。
+
+環境変数:
+    XSERVER_HTTP_PROBE=false  HTTP での確認を行わず、毎回ブラウザで確認する
+    XSERVER_COOKIE_JAR        ブラウザのセッションのクッキー（browser_session.py が保存する JSON）
+    XSERVER_BASE_URL          パネルのURL（fake_xserver_panel.py のローカルサーバーで試す場合に指定）
+"""
+import http.client
+import json
+import os
+import time
+import urllib.parse
+
+from expiry_parser import parse_expiry
+
+# browser_session.py と同じ設定（selenium を読み込まないよう、ここでも環境変数から読む）
+BASE_URL = os.getenv("XSERVER_BASE_URL", "https://secure.xserver.ne.jp").rstrip("/")
+COOKIE_JAR = os.getenv("XSERVER_COOKIE_JAR")
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36'
+ENABLED = os.getenv("XSERVER_HTTP_PROBE", "true").lower() == "true"
+
+DETAIL_PATH = "/xapanel/xvps/server/detail"
+LOGIN_PATH = "/xapanel/login/"
+
+
+class SessionRejected(Exception):
+    """保存したクッキーのセッションが無効（ログインページに戻された）"""
+
+
+def available(cookie_path=None):
+    """HTTP プローブを使える設定か（有効で、保存済みのクッキーがある）"""
+    path = cookie_path or COOKIE_JAR
+    return ENABLED and bool(path) and os.path.exists(path)
+
+
+def load_cookies(path=None):
+    """browser_session.save_cookies() が保存したクッキー（driver.get_cookies() の形式）を読み込む"""
+    path = path or COOKIE_JAR
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  クッキーの読み込みに失敗しました: {e}")
+        return []
+
+
+def cookie_header(cookies, host, path, secure, now=None):
+    """リクエスト先に送るクッキーを Cookie ヘッダーの値にする（ドメイン・パス・期限・secure を確認）"""
+    now = now if now is not None else time.time()
+    pairs = []
+    for cookie in cookies:
+        domain = cookie.get("domain", host).lstrip(".")
+        if host != domain and not host.endswith("." + domain):
+            continue
+        if not path.startswith(cookie.get("path", "/")):
+            continue
+        if cookie.get("secure") and not secure:
+            continue
+        if "expiry" in cookie and cookie["expiry"] <= now:
+            continue
+        pairs.append(f"{cookie['name']}={cookie['value']}")
+    return "; ".join(pairs)
+
+
+class PanelProbe:
+    """
+    保存したクッキーで VPS 詳細ページを取得する（接続は1本を使い回す）
+
+        with PanelProbe() as probe:
+            html = probe.fetch_detail("40092988")
+    """
+
+    def __init__(self, base_url=None, cookies=None, timeout=10):
+        url = urllib.parse.urlsplit(base_url or BASE_URL)
+        self.secure = url.scheme == "https"
+        self.host = url.hostname
+        self.prefix = url.path.rstrip("/")
+        self.cookies = load_cookies() if cookies is None else cookies
+        connection_class = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+        self.connection = connection_class(url.hostname, url.port, timeout=timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def fetch_detail(self, server_id):
+        """
+        VPS詳細ページのHTMLを返す
+
+        Raises:
+            SessionRejected: ログインページに戻された場合
+            OSError, http.client.HTTPException: 通信エラーや想定外の応答
+        """
+        path = f"{self.prefix}{DETAIL_PATH}?{urllib.parse.urlencode({'id': server_id})}"
+        self.connection.request("GET", path, headers={
+            "User-Agent": USER_AGENT,
+            "Cookie": cookie_header(self.cookies, self.host, path, self.secure),
+        })
+        response = self.connection.getresponse()
+        body = response.read()      # 接続を使い回すため、本文は必ず読み切る
+        location = response.getheader("Location", "")
+        if response.status in (401, 403) or (300 <= response.status < 400 and LOGIN_PATH in location):
+            raise SessionRejected(f"HTTP {response.status} {location}")
+        if response.status != 200:
+            raise http.client.HTTPException(f"HTTP {response.status}")
+        html = body.decode(response.headers.get_content_charset() or "utf-8", errors="replace")
+        if 'name="memberid"' in html:
+            raise SessionRejected("ログインフォームが表示されました")
+        return html
+
+
+def probe_expiries(server_ids, base_url=None, cookie_path=None, timeout=10):
+    """
+    保存したクッキーで各サーバーの利用期限を HTTP で読み取る
+
+    Args:
+        server_ids (list): サーバーIDの一覧
+        base_url (str): パネルのURL（省略時は XSERVER_BASE_URL）
+        cookie_path (str): クッキーのファイル（省略時は XSERVER_COOKIE_JAR）
+
+    Returns:
+        dict: サーバーID → 利用期限（読み取れなかったサーバーは None）。
+              セッションが拒否された・接続できなかった場合は None（ブラウザで確認する）
+    """
+    cookies = load_cookies(cookie_path)
+    if not cookies:
+        return None
+
+    print(f"🌐 保存済みのクッキーで {len(server_ids)}台の利用期限を HTTP で確認します（ブラウザなし）。")
+    expiries = {}
+    try:
+        with PanelProbe(base_url, cookies, timeout) as probe:
+            for server_id in server_ids:
+                started = time.perf_counter()
+                expiries[server_id] = parse_expiry(probe.fetch_detail(server_id), server_id)
+                expiry_text = expiries[server_id].strftime("%Y-%m-%d %H:%M") if expiries[server_id] else "不明"
+                print(f"  📄 サーバー {server_id}: 利用期限 {expiry_text}（{time.perf_counter() - started:.2f}秒）")
+    except SessionRejected as e:
+        print(f"🔑 保存済みのセッションが拒否されました（{e}）。ブラウザで確認します。")
+        return None
+    except (OSError, http.client.HTTPException) as e:
+        print(f"⚠️  HTTP での確認に失敗しました（{e}）。ブラウザで確認します。")
+        return None
+    return expiries
@@ -0,0 +1,151 @@
+"""
+パネルのページ遷移を軽くするモード（オプトイン）と、ページごとの読み込み時間の計測
+
+driver.get() やボタンのクリックによる遷移は、通常は load イベント（フォント・計測用スクリプト・
+画像など、自動操作では見ないものを含む全てのリソースの読み込み）まで待つ。
+XSERVER_LEAN_NAVIGATION=true にすると次の2つを有効にする。
+
+    eager          ページ読み込み戦略を eager にし、DOMContentLoaded で次の処理へ進む
+                   （必要な要素は page_waits の待機で確認している）
+    ブロックリスト  DevTools の Network.setBlockedURLs で、フォントや外部の計測・広告スクリプトを読み込まない
+                   （画像認証の画像のURLに一致するパターンは必ず除外する）
+                   この設定は DevTools のターゲット（タブ）ごとのため、別タブで開くページには
+                   タブごとに apply_blocklist() を呼ぶ（browser_session.read_expiries の同時読み込み）
+
+report_page() はページごとの DOMContentLoaded・load までの時間と読み込んだリソースの数・転送量を表示する。
+XSERVER_PAGE_TIMINGS=true（またはこのモードの有効時）に記録されるため、有効にする前後で比べられる。
+
+環境変数:
+    XSERVER_LEAN_NAVIGATION=true  eager とブロックリストを有効にする
+    XSERVER_BLOCKED_URLS          追加でブロックするURLパターン（カンマ区切り、* でワイルドカード。例: *.jpg,*cdn.example.com*）
+    XSERVER_PAGE_TIMINGS=true     このモードを使わない場合もページごとの時間を表示する
+"""
+import fnmatch
+import os
+
+ENABLED = os.getenv("XSERVER_LEAN_NAVIGATION", "false").lower() == "true"
+PAGE_TIMINGS = ENABLED or os.getenv("XSERVER_PAGE_TIMINGS", "false").lower() == "true"
+EXTRA_BLOCKED_URLS = [pattern.strip() for pattern in os.getenv("XSERVER_BLOCKED_URLS", "").split(",") if pattern.strip()]
+
+# 自動操作では使わないリソース（パネルのページの表示とボタンの操作には影響しない）
+DEFAULT_BLOCKED_URLS = [
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*fonts.googleapis.com*", "*fonts.gstatic.com*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googleadservices.com*", "*googlesyndication.com*",
+    "*connect.facebook.net*", "*analytics.twitter.com*", "*bat.bing.com*",
+    "*clarity.ms*", "*hotjar.com*", "*yjtag.yahoo.co.jp*", "*s.yimg.jp*",
+]
+
+# 画像認証の画像として考えられるURL（これらに一致するパターンはブロックしない）
+CAPTCHA_URL_SAMPLES = [
+    "/xapanel/xvps/captcha.png",
+    "/xapanel/common/captcha/image.php?id=1",
+    "/xapanel/security/image.jpg",
+    "/captcha?t=1",
+]
+
+PAGE_TIMING_SCRIPT = """
+const nav = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+return {
+    url: location.href,
+    dom_content_loaded: nav ? nav.domContentLoadedEventEnd : null,
+    load: nav ? nav.loadEventEnd : null,
+    resources: resources.length,
+    transfer: resources.reduce((total, entry) => total + (entry.transferSize || 0), nav ? nav.transferSize || 0 : 0),
+};
+"""
+
+_timings = []   # (ページ名, 計測結果)
+
+
+def blocked_url_patterns(patterns=None, base_url="", quiet=False):
+    """
+    ブロックするURLパターン（画像認証の画像に一致しうるものは除く）
+
+    Args:
+        patterns (list): パターン（省略時は DEFAULT_BLOCKED_URLS と XSERVER_BLOCKED_URLS）
+        base_url (str): パネルのURL（画像認証の画像のURLの候補を作るため）
+        quiet (bool): 除外したパターンを表示しない
+    """
+    if patterns is None:
+        patterns = DEFAULT_BLOCKED_URLS + EXTRA_BLOCKED_URLS
+    samples = [base_url.rstrip("/") + path for path in CAPTCHA_URL_SAMPLES]
+    allowed = []
+    for pattern in patterns:
+        if "captcha" in pattern.lower() or any(fnmatch.fnmatchcase(url, pattern) for url in samples):
+            if not quiet:
+                print(f"⚠️  画像認証の画像に一致するため、ブロックしません: {pattern}")
+            continue
+        allowed.append(pattern)
+    return allowed
+
+
+def apply_page_load_strategy(options):
+    """有効な場合、Chrome の起動（接続）オプションの読み込み戦略を eager にする"""
+    if ENABLED:
+        options.page_load_strategy = "eager"
+    return options
+
+
+def apply_blocklist(driver, base_url="", quiet=False):
+    """
+    有効な場合、DevTools で表示中のタブにブロックリストを設定する
+
+    Args:
+        quiet (bool): 設定したことを表示しない（別タブごとに設定する場合）
+
+    Returns:
+        list: 設定したパターン（無効な場合や設定に失敗した場合は空）
+    """
+    if not ENABLED:
+        return []
+    patterns = blocked_url_patterns(base_url=base_url, quiet=quiet)
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        print(f"⚠️  ブロックリストを設定できませんでした: {e}")
+        return []
+    if not quiet:
+        print(f"🪶 軽量モード: 読み込み戦略 eager、{len(patterns)}件のURLパターンをブロックします。")
+    return patterns
+
+
+def report_page(driver, name):
+    """
+    表示中のページの読み込み時間を表示して記録する（XSERVER_PAGE_TIMINGS が無効なら何もしない）
+
+    Returns:
+        dict: 計測結果（dom_content_loaded / load はミリ秒、load 前なら 0）。記録しない場合は None
+    """
+    if not PAGE_TIMINGS:
+        return None
+    try:
+        timing = driver.execute_script(PAGE_TIMING_SCRIPT)
+    except Exception as e:
+        print(f"⚠️  ページ {name} の読み込み時間を取得できませんでした: {e}")
+        return None
+    _timings.append((name, timing))
+    print(f"⏱️  ページ {name}: {format_timing(timing)}")
+    return timing
+
+
+def format_timing(timing):
+    def milliseconds(value):
+        return f"{value:.0f}ms" if value else "未完了"
+
+    return (f"DOMContentLoaded {milliseconds(timing['dom_content_loaded'])}, load {milliseconds(timing['load'])}, "
+            f"リソース {timing['resources']}件 / {timing['transfer'] / 1024:.1f}KB")
+
+
+def print_summary():
+    """この実行で記録したページごとの読み込み時間を一覧表示する"""
+    if not _timings:
+        return
+    mode = "軽量モード" if ENABLED else "通常モード"
+    print(f"⏱️  ページごとの読み込み時間（{mode}）")
+    for name, timing in _timings:
+        print(f"  {name:<14}{format_timing(timing)}")
+    _timings.clear()
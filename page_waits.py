@@ -0,0 +1,71 @@
+"""
+ページの状態に応じて待機を終える待機レイヤー
+
+固定の time.sleep() の代わりに、URL の変化やエラーメッセージ・画像認証・完了ページなど
+実際のページ状態が現れた時点で次の処理へ進む。wait_for_any() は複数の結果候補を
+同時に監視し、最初に成立したものを返す。
+"""
+from selenium.common.exceptions import (NoSuchElementException, StaleElementReferenceException,
+                                        TimeoutException)
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+DEFAULT_TIMEOUT = 30      # 秒
+POLL_FREQUENCY = 0.1      # 秒（WebDriverWait のデフォルト 0.5 秒より細かく確認する）
+
+
+def text_visible(text):
+    """指定した文字列を含む要素が表示されたら成立する条件"""
+    return EC.visibility_of_element_located((By.XPATH, f"//*[contains(text(), '{text}')]"))
+
+
+def any_visible(xpath):
+    """XPath に一致する要素のうち、表示されているものが1つでもあれば成立する条件"""
+    def _condition(driver):
+        for element in driver.find_elements(By.XPATH, xpath):
+            if element.is_displayed():
+                return element
+        return False
+    return _condition
+
+
+def wait_for_any(driver, outcomes, timeout=DEFAULT_TIMEOUT, poll_frequency=POLL_FREQUENCY):
+    """
+    複数の結果候補を同時に待ち、最初に成立したものを返す
+
+    Args:
+        driver: WebDriver
+        outcomes (dict): 結果名 → 条件（driver を受け取り、成立時に真となる値を返す関数）
+                         先に書いたものほど同時成立時に優先される
+        timeout (float): 最大待機秒数
+        poll_frequency (float): 確認間隔（秒）
+
+    Returns:
+        tuple: (成立した結果名, 条件が返した値)
+
+    Raises:
+        TimeoutException: timeout 秒以内にどの条件も成立しなかった場合
+    """
+    def _first_outcome(driver):
+        for name, condition in outcomes.items():
+            try:
+                value = condition(driver)
+            except (NoSuchElementException, StaleElementReferenceException):
+                continue
+            if value:
+                return name, value
+        return False
+
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency).until(_first_outcome)
+    except TimeoutException:
+        raise TimeoutException(f"{timeout}秒以内に次のいずれの状態にもなりませんでした: {', '.join(outcomes)}")
+
+
+def wait_for(driver, condition, timeout=DEFAULT_TIMEOUT, poll_frequency=POLL_FREQUENCY):
+    """単一の条件を待つ（成立しなければ None を返し、例外は送出しない）"""
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency).until(condition)
+    except TimeoutException:
+        return None
@@ -0,0 +1,106 @@
+"""
+常駐モード: 利用期限から次の更新時刻を計算し、その時刻まで眠ってから更新する
+
+外部のスケジューラで毎回プロセスを起動する代わりに1つのプロセスを常駐させ、
+OCRモデルなどの重いリソースを更新の合間も読み込んだままにしておく。
+1回の更新処理（run_once）が終わるたびに、状態ファイルに保存された
+最新の利用期限から次の更新時刻を計画し直す。
+"""
+import time
+from datetime import datetime, timedelta
+
+import renewal_state
+
+MAX_SLEEP_CHUNK = 300                      # 秒。スリープ復帰や時刻補正に備えて定期的に残り時間を再計算する
+DEFAULT_RETRY_DELAY = timedelta(minutes=30)  # 失敗時・期限が更新されなかった時の再試行間隔
+DEFAULT_PREPARE_LEAD = timedelta(minutes=2)  # 次の実行の何分前に prepare（Chrome の事前起動など）を呼ぶか
+
+
+def sleep_until(deadline):
+    """壁時計の deadline まで待機する"""
+    while True:
+        remaining = (deadline - datetime.now()).total_seconds()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, MAX_SLEEP_CHUNK))
+
+
+def plan_next_run(server_ids, due_time_for, now=None):
+    """
+    状態ファイルの利用期限から次に更新処理を実行する日時を計算する
+
+    Args:
+        server_ids (str | list): サーバーID（複数の場合は最も早く更新時期が来るサーバーに合わせる）
+        due_time_for (callable): 利用期限 → 更新を実行すべき最も早い日時 を返す関数
+
+    Returns:
+        datetime: 次回の実行日時（利用期限が不明なサーバーがあれば現在日時）
+    """
+    now = now or datetime.now()
+    if isinstance(server_ids, str):
+        server_ids = [server_ids]
+
+    next_run = None
+    for server_id in server_ids:
+        expiry_date = renewal_state.get_expiry(server_id)
+        if expiry_date is None:
+            return now
+        due_time = due_time_for(expiry_date)
+        if next_run is None or due_time < next_run:
+            next_run = due_time
+    return max(next_run, now) if next_run else now
+
+
+def run_daemon(run_once, server_ids, due_time_for, keep_warm=None, prepare=None,
+               retry_delay=DEFAULT_RETRY_DELAY, prepare_lead=DEFAULT_PREPARE_LEAD, max_cycles=None):
+    """
+    常駐して更新処理を繰り返す
+
+    Args:
+        run_once (callable): 1回分の更新処理（成功時 True を返し、確認した利用期限を状態ファイルに保存する）
+        server_ids (str | list): サーバーID
+        due_time_for (callable): 利用期限 → 更新を実行すべき最も早い日時 を返す関数
+        keep_warm (callable): 常駐開始時に1度だけ呼ぶ準備処理（OCRモデルの読み込みなど）
+        prepare (callable): 毎回の実行の prepare_lead 前に呼ぶ準備処理（Chrome の事前起動など、
+                            待機中に古くなるため常駐開始時には行わないもの）
+        retry_delay (timedelta): 失敗した場合や、実行後も更新時期のままだった場合の再試行間隔
+        prepare_lead (timedelta): prepare を呼んでから実行するまでの時間
+        max_cycles (int): 実行回数の上限（None で無制限、テスト用）
+    """
+    print("🛌 常駐モードで起動しました。Ctrl+C で終了します。")
+    if keep_warm:
+        keep_warm()
+
+    cycles = 0
+    retry_at = None
+    try:
+        while max_cycles is None or cycles < max_cycles:
+            next_run = plan_next_run(server_ids, due_time_for)
+            if retry_at and next_run < retry_at:
+                next_run = retry_at
+
+            print(f"⏰ 次回の更新処理: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
+            # 実行までの間がある場合だけ、少し前に準備を始めて実行と重ねずに済ませる
+            if prepare and next_run - datetime.now() > prepare_lead:
+                sleep_until(next_run - prepare_lead)
+                prepare()
+            sleep_until(next_run)
+
+            cycles += 1
+            print(f"🔄 更新処理を実行します（{cycles}回目）")
+            try:
+                success = run_once()
+            except Exception as e:
+                # Chrome の起動失敗などで1回の処理が例外で終わっても常駐は続け、再試行間隔を空けて再実行する
+                print(f"❌ 更新処理でエラーが発生しました: {e!r}")
+                success = False
+
+            # 実行後も更新時期のまま（失敗・期限を取得できなかった等）なら間隔を空けて再試行する
+            replanned = plan_next_run(server_ids, due_time_for)
+            if not success or replanned <= datetime.now():
+                retry_at = datetime.now() + retry_delay
+                print(f"⚠️  更新が完了しなかったため {retry_at.strftime('%Y-%m-%d %H:%M')} に再試行します。")
+            else:
+                retry_at = None
+    except KeyboardInterrupt:
+        print("\n👋 常駐モードを終了します。")
@@ -0,0 +1,1190 @@
+"""
+更新処理の共通エンジン（xserver.py / xserver2.py / xserver_improved.py の共通部分）
+
+更新処理を次のステージに分け、各スクリプトは Preset でその組み合わせを指定するだけにする。
+    セッション      ブラウザの起動、保存済みセッションの再利用またはログイン、利用期限の読み取り
+    画像の取得      画像認証の画像要素をメモリ上に切り出す（extract_captcha_image）
+    前処理          二値化のバリエーションを作る（PREPROCESSORS から選ぶ）
+    解析            OCR / Claude API / Claude Code CLI / Gemini連携モード を順に、またはレースで試す（SOLVERS）
+    送信            回答を入力して送信し、完了ページかエラー表示を待つ
+
+ブラウザ（driver / wait）、EasyOCR のリーダー、Claude API のクライアントは RenewalEngine が持ち、
+ステージ間（常駐モードでは実行をまたいで）使い回す。ステージの関数はモジュールから名前で引くため、
+--profile（stage_profiler.enable()）やベンチマークでの置き換えがそのまま反映される。
+
+    engine = RenewalEngine(Preset("xserver2", USERNAME, PASSWORD, SERVER_IDS, solvers=("ocr", "handoff")))
+    engine.run()
+"""
+from datetime import datetime, timedelta
+import importlib.util
+import os
+import re
+import threading
+
+import captcha_dom
+import driver_pool
+import failure_artifacts
+import lean_navigation
+import renewal_state
+import stage_profiler
+import step_timing
+from captcha_answer import best_decode, decode_digits
+from captcha_handoff import SolutionWaiter
+from captcha_image import decode_png, crop_image, load_image, save_debug_image, write_image_file
+from captcha_ocr import preload_reader, get_reader, evaluate_variants
+from expiry_parser import parse_expiry
+
+# 重いパッケージ（cv2, numpy, easyocr/torch, anthropic, selenium）は実際に使う処理の中で import する。
+# ここでは import せずに存在だけを確認し、更新不要で終了する場合の起動時間を短くする。
+OCR_AVAILABLE = importlib.util.find_spec("easyocr") is not None
+CLAUDE_AVAILABLE = importlib.util.find_spec("anthropic") is not None
+CLAUDE_CODE_AVAILABLE = importlib.util.find_spec("claude_code_integration") is not None
+
+# Claude API設定
+CLAUDE_API_KEY = os.getenv("ANTHROPIC_API_KEY")  # 環境変数から取得
+if CLAUDE_AVAILABLE and not CLAUDE_API_KEY:
+    CLAUDE_AVAILABLE = False
+    CLAUDE_API_KEY_MISSING = True
+else:
+    CLAUDE_API_KEY_MISSING = False
+
+EXTEND_CONF_PATH = "/xapanel/xvps/server/freevps/extend/conf"
+EXTEND_COMPLETE_PATH = "/xapanel/xvps/server/freevps/extend/complete"
+DETAIL_PATH = "/xapanel/xvps/server/detail"
+CAPTCHA_MESSAGE = '画像認証を行ってください'
+CAPTCHA_ERROR_XPATH = "//*[contains(text(), 'エラー') or contains(text(), '正しく') or contains(text(), '間違')]"
+CAPTCHA_INPUT_XPATH = " | ".join(captcha_dom.INPUT_SELECTORS)
+
+# 前処理ステージ: 名前 → 関数名
+PREPROCESSORS = {
+    "masked": "preprocess_masked_variants",     # 背景の線をマスクで除去し、反転二値化して太らせる（4種類）
+    "blurred": "preprocess_blurred_variants",   # ぼかしてからコントラストを上げて二値化する（5種類）
+}
+
+# 解析ステージ: 名前 → (表示名, 関数名)。solve(captcha_image, engine, cancel_event=None) は回答か None を返す
+SOLVERS = {
+    "ocr": ("OCR", "solve_with_ocr"),
+    "claude_api": ("Claude API", "solve_with_claude_api"),
+    "claude_code": ("Claude Code CLI", "solve_with_claude_code"),
+    "handoff": ("Gemini連携モード", "solve_with_handoff"),
+}
+RACE_SOLVERS = ("ocr", "claude_api", "claude_code")   # レースモードで同時に実行できる（対話しない）ソルバー
+
+
+def _stage(function_name):
+    # 置き換え（--profile・ベンチマーク）後の関数を使うため、呼び出しのたびにモジュールから引く
+    return globals()[function_name]
+
+
+def solver_available(name):
+    """解析ステージが使える状態か（パッケージ・API キーの有無）"""
+    return {
+        "ocr": OCR_AVAILABLE,
+        "claude_api": CLAUDE_AVAILABLE,
+        "claude_code": CLAUDE_CODE_AVAILABLE,
+        "handoff": True,
+    }[name]
+
+
+class Preset:
+    """
+    エントリーポイントごとのステージの組み合わせと設定
+
+    Args:
+        name (str): スクリプト名（計測・ログ用）
+        username, password (str): ログイン情報
+        server_ids (list): 処理するサーバーID
+        headless (bool): ヘッドレスモードでブラウザを起動するか
+        threshold_hours (int): 期限の何時間前から更新を実行するか
+        renewable_hours (int): 期限までこの時間を切っていれば閾値に関わらず更新する（0 で無効）
+        check_expiry (bool): 詳細ページの利用期限を読んで更新が必要なサーバーだけを更新するか
+                             （False の場合は呼び出し側で更新時期を判定済みとして全て更新する）
+        ocr_languages (list): EasyOCR の認識言語
+        preprocess (str): 前処理ステージの名前（PREPROCESSORS のキー）
+        segment_confidence (float): OCR で採用する文字列の信頼度の下限
+        solvers (tuple): 解析ステージの名前を試す順に並べたもの（SOLVERS のキー、空なら画像認証に対応しない）
+        race (bool): RACE_SOLVERS に含まれる解析ステージを同時に実行し、最初の回答を採用する
+        min_answer_length (int): 回答として採用する最短の長さ
+        digits_only (bool): 数字だけの回答のみ採用するか
+        manual_fallback (bool): 自動で解けなかった場合にブラウザでの手動入力を待つか
+    """
+
+    def __init__(self, name, username, password, server_ids, headless=False, threshold_hours=12,
+                 renewable_hours=0, check_expiry=True, ocr_languages=("ja",), preprocess="masked",
+                 segment_confidence=0.2, solvers=("ocr",), race=False, min_answer_length=6,
+                 digits_only=True, manual_fallback=False):
+        self.name = name
+        self.username = username
+        self.password = password
+        self.server_ids = list(server_ids)
+        self.headless = headless
+        self.threshold_hours = threshold_hours
+        self.renewable_hours = renewable_hours
+        self.check_expiry = check_expiry
+        self.ocr_languages = list(ocr_languages)
+        self.preprocess = preprocess
+        self.segment_confidence = segment_confidence
+        self.solvers = tuple(solvers)
+        self.race = race
+        self.min_answer_length = min_answer_length
+        self.digits_only = digits_only
+        self.manual_fallback = manual_fallback
+
+    def accepts(self, answer):
+        """解析結果を回答として採用してよいか"""
+        if not answer or len(answer) < self.min_answer_length:
+            return False
+        return answer.isdigit() or not self.digits_only
+
+    def due_time(self, expiry_date):
+        """利用期限 → 更新を実行すべき最も早い日時"""
+        return renewal_due_time(expiry_date, self.threshold_hours, self.renewable_hours)
+
+
+def print_feature_status(preset):
+    """
+    画像認証解析に使える機能の一覧を表示（プリセットで使う解析ステージのみ）
+    """
+    # OCR関連（オプション）
+    if "ocr" in preset.solvers:
+        if OCR_AVAILABLE:
+            print("✅ EasyOCR が利用可能です。画像認証の自動化を試行します。")
+        else:
+            print("⚠️  EasyOCR がインストールされていません。")
+            print("💡 自動化するには: pip install easyocr opencv-python pillow")
+            print("📝 手動入力モードで動作します。")
+
+    # Claude API関連
+    if "claude_api" in preset.solvers:
+        if CLAUDE_AVAILABLE:
+            print("✅ Claude API が利用可能です。OCR失敗時にClaude解析を試行します。")
+        elif CLAUDE_API_KEY_MISSING:
+            print("⚠️  ANTHROPIC_API_KEY 環境変数が設定されていません。")
+            print("💡 Claude解析機能を使用するには環境変数を設定してください。")
+        else:
+            print("⚠️  anthropic パッケージがインストールされていません。")
+            print("💡 Claude解析機能を使用するには: pip install anthropic")
+
+    # Claude Code CLI統合
+    if "claude_code" in preset.solvers:
+        if CLAUDE_CODE_AVAILABLE:
+            print("✅ Claude Code CLI 統合が利用可能です。")
+        else:
+            print("⚠️  claude_code_integration.py が見つかりません。")
+            print("💡 Claude Code CLI機能を使用するには claude_code_integration.py を同じフォルダに配置してください。")
+
+
+# ▼ 前処理ステージ
+
+@stage_profiler.profiled("preprocess")
+def preprocess_masked_variants(image):
+    """
+    背景の線をマスクで除去してから二値化する前処理（xserver2.py）
+
+    Args:
+        image: 画像の配列（BGR）またはファイルパス
+
+    Returns:
+        list: (手法名, 処理済み画像) のリスト
+    """
+    import cv2
+    import numpy as np
+
+    try:
+        img = load_image(image)
+        if img is None:
+            print("❌ 画像が読み込めませんでした。")
+            return []
+
+        print(f"📊 元画像サイズ: {img.shape}")
+
+        # 拡大
+        height, width = img.shape[:2]
+        scale_factor = 3
+        resized = cv2.resize(img, (int(width * scale_factor), int(height * scale_factor)), interpolation=cv2.INTER_CUBIC)
+
+        # グレースケール
+        gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
+
+        # 背景の線やノイズを除去するためのマスクを作成
+        # この閾値は画像に合わせて調整が必要
+        lower_bound = np.array([150])
+        upper_bound = np.array([250])
+        mask = cv2.inRange(gray, lower_bound, upper_bound)
+
+        # マスクを反転し、文字部分だけを残す
+        cleaned_gray = cv2.bitwise_and(gray, gray, mask=cv2.bitwise_not(mask))
+        # 背景を白にする
+        cleaned_gray[mask != 0] = 255
+
+        # コントラスト向上
+        enhanced = cv2.convertScaleAbs(cleaned_gray, alpha=2.5, beta=0)
+
+        # 複数の二値化手法を試す
+        processed_images = []
+        binary_methods = [
+            ("OTSU", cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]),
+            ("ADAPTIVE_MEAN", cv2.adaptiveThreshold(enhanced, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 4)),
+            ("ADAPTIVE_GAUSSIAN", cv2.adaptiveThreshold(enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 15, 4)),
+            ("FIXED_140", cv2.threshold(enhanced, 140, 255, cv2.THRESH_BINARY_INV)[1])
+        ]
+
+        kernel = np.ones((2, 2), np.uint8)
+        for name, binary_img in binary_methods:
+            # 細かいノイズを除去
+            morphed = cv2.morphologyEx(binary_img, cv2.MORPH_CLOSE, kernel)
+            morphed = cv2.morphologyEx(morphed, cv2.MORPH_OPEN, kernel)
+
+            # 輪郭を少し太らせて文字の途切れをなくす
+            dilated = cv2.dilate(morphed, kernel, iterations=1)
+
+            # 白黒反転（easyocrは黒背景に白文字を期待することがある）
+            final_image = cv2.bitwise_not(dilated)
+
+            save_debug_image(f"processed_{name.lower()}", final_image)
+            processed_images.append((name, final_image))
+
+        return processed_images
+
+    except Exception as e:
+        print(f"❌ 画像前処理でエラー: {e}")
+        return []
+
+
+@stage_profiler.profiled("preprocess")
+def preprocess_blurred_variants(image):
+    """
+    ぼかしとコントラスト強調のあとに二値化する前処理（xserver_improved.py）
+
+    Args:
+        image: 画像の配列（BGR）またはファイルパス
+
+    Returns:
+        list: (手法名, 処理済み画像) のリスト（先頭がデフォルトの手法）
+    """
+    import cv2
+    import numpy as np
+
+    try:
+        # 画像を読み込み（配列ならそのまま使用）
+        img = load_image(image)
+        if img is None:
+            print("❌ 画像が読み込めませんでした。")
+            return []
+
+        print(f"📊 元画像サイズ: {img.shape}")
+
+        # 画像のリサイズ（OCR精度向上のため）
+        height, width = img.shape[:2]
+        scale_factor = 3  # 3倍に拡大
+        resized = cv2.resize(img, (int(width * scale_factor), int(height * scale_factor)), interpolation=cv2.INTER_CUBIC)
+        print(f"📊 リサイズ後: {resized.shape}")
+
+        # グレースケール変換
+        gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
+
+        # ガウシアンブラーでノイズ除去
+        blurred = cv2.GaussianBlur(gray, (3, 3), 0)
+
+        # コントラストの向上（より強めに）
+        enhanced = cv2.convertScaleAbs(blurred, alpha=2.0, beta=20)
+
+        # 複数の閾値で二値化（最初の方法をデフォルトとする）
+        binary_methods = [
+            ("OTSU", cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]),
+            ("ADAPTIVE_MEAN", cv2.adaptiveThreshold(enhanced, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 11, 2)),
+            ("ADAPTIVE_GAUSSIAN", cv2.adaptiveThreshold(enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)),
+            ("FIXED_120", cv2.threshold(enhanced, 120, 255, cv2.THRESH_BINARY)[1]),
+            ("FIXED_150", cv2.threshold(enhanced, 150, 255, cv2.THRESH_BINARY)[1])
+        ]
+
+        # モルフォロジー演算でノイズ除去
+        kernel = np.ones((2, 2), np.uint8)
+        variants = []
+        for method_name, binary in binary_methods:
+            # 各方法で処理した画像を保存（CAPTCHA_DEBUG_IMAGES=true の場合のみ）
+            save_debug_image(method_name.lower(), binary)
+
+            cleaned = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+            cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_OPEN, kernel)
+            variants.append((method_name, cleaned))
+
+        return variants
+
+    except Exception as e:
+        print(f"❌ 画像前処理でエラー: {e}")
+        return []
+
+
+# ▼ 画像の取得ステージ
+
+@stage_profiler.profiled("extract")
+def extract_captcha_image(driver, captcha_element=None, rect=None):
+    """
+    画像認証の画像部分を抽出
+
+    Args:
+        driver: WebDriver
+        captcha_element: 画像要素（省略時は captcha_dom.probe() で探す）
+        rect (dict): 探索で得た要素の位置とサイズ（x, y, width, height）。あれば要素に問い合わせない
+
+    Returns:
+        numpy.ndarray: 切り取った画像（BGR）、失敗時は None
+    """
+    try:
+        # 画像認証の画像要素を検索（1回の execute_script で候補を集めて選ぶ）
+        if not captcha_element:
+            candidate = captcha_dom.pick(captcha_dom.probe(driver, CAPTCHA_MESSAGE), "image",
+                                         renewal_state.get_selectors().get("image"))
+            if candidate:
+                captcha_element, rect = candidate["element"], candidate["rect"]
+
+        captcha_image = captcha_element
+        if not captcha_image:
+            print("❌ 画像認証の画像要素が見つかりませんでした。")
+            return None
+
+        # 要素のスクリーンショットをPNGバイト列で取得（ファイルを介さない）
+        try:
+            captcha_crop = decode_png(captcha_image.screenshot_as_png)
+            if captcha_crop is not None and captcha_crop.size > 0:
+                print(f"📸 画像認証部分をメモリ上に取得しました: {captcha_crop.shape}")
+                save_debug_image("cropped", captcha_crop)
+                return captcha_crop
+        except Exception as e:
+            print(f"⚠️  要素のスクリーンショット取得に失敗: {e}。ページ全体から切り取ります。")
+
+        # 画像要素の位置とサイズを取得
+        if rect is not None:
+            location = {"x": rect["x"], "y": rect["y"]}
+            size = {"width": rect["width"], "height": rect["height"]}
+        else:
+            location = captcha_image.location
+            size = captcha_image.size
+
+        # ページ全体のスクリーンショットを1度だけデコード
+        screenshot = decode_png(driver.get_screenshot_as_png())
+        if screenshot is None:
+            print("❌ スクリーンショットをデコードできませんでした。")
+            return None
+
+        # 画像認証部分を切り取り（座標の境界チェックを追加）
+        screenshot_height, screenshot_width = screenshot.shape[:2]
+
+        left = max(0, int(location['x']))
+        top = max(0, int(location['y']))
+        right = min(screenshot_width, int(location['x'] + size['width']))
+        bottom = min(screenshot_height, int(location['y'] + size['height']))
+
+        # 座標の妥当性を確認
+        if left >= right or top >= bottom or size['width'] <= 0 or size['height'] <= 0:
+            print(f"❌ 無効な切り取り座標: left={left}, top={top}, right={right}, bottom={bottom}")
+            print(f"📊 スクリーンショットサイズ: {screenshot_width}x{screenshot_height}")
+            print(f"📊 要素位置: x={location['x']}, y={location['y']}, width={size['width']}, height={size['height']}")
+
+            # フォールバック：画面中央付近からCAPTCHA領域を推定
+            print("🔄 座標が無効なため、画面中央付近からCAPTCHA領域を推定します...")
+            center_x = screenshot_width // 2
+            center_y = screenshot_height // 2
+
+            # 一般的なCAPTCHA画像のサイズを想定（幅300px、高さ80px）
+            estimated_width = 300
+            estimated_height = 80
+
+            left = max(0, center_x - estimated_width // 2)
+            top = max(0, center_y - estimated_height // 2)
+            right = min(screenshot_width, left + estimated_width)
+            bottom = min(screenshot_height, top + estimated_height)
+
+            print(f"📊 推定座標: left={left}, top={top}, right={right}, bottom={bottom}")
+
+            if left >= right or top >= bottom:
+                print("❌ 推定座標も無効です。スクリーンショット全体を使用します。")
+                return screenshot
+
+        print(f"📊 切り取り座標: left={left}, top={top}, right={right}, bottom={bottom}")
+        captcha_crop = crop_image(screenshot, left, top, right, bottom)
+        save_debug_image("cropped", captcha_crop)
+
+        print("📸 画像認証部分をメモリ上で切り取りました。")
+        return captcha_crop
+
+    except Exception as e:
+        print(f"❌ 画像認証画像の抽出でエラー: {e}")
+        return None
+
+
+# ▼ 解析ステージ
+
+def convert_hiragana_to_numbers(text):
+    """
+    ひらがなの数字を数字に変換（文字列全体で最も確からしい区切り方を選ぶ。captcha_answer.decode_digits）
+    """
+    return decode_digits(text)[0]
+
+
+def clean_ocr_text(text):
+    """
+    日本語文字・英数字のみを抽出（特殊文字を除去）
+    """
+    import string
+    # ひらがな、カタカナ、漢字、英数字を許可
+    return re.sub(r'[^\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF' + string.ascii_letters + string.digits + ']', '', text)
+
+
+@stage_profiler.profiled("ocr")
+@step_timing.timed("solver.ocr")
+def solve_with_ocr(captcha_image, engine, cancel_event=None):
+    """
+    OCRを使用して画像認証を解く（前処理の全バリエーションを並列に評価）
+
+    Args:
+        captcha_image: extract_captcha_image() が返した画像配列（またはファイルパス）
+        engine (RenewalEngine): 共有のリーダーとプリセット
+        cancel_event (threading.Event): レースモードで他のソルバーが先に解いた時にセットされる
+    """
+    if not OCR_AVAILABLE:
+        print("⚠️  OCR機能が利用できません。")
+        return None
+
+    preset = engine.preset
+    try:
+        print("🔍 OCRで画像認証を解析中...")
+
+        # 複数の前処理画像を生成
+        processed_images = _stage(PREPROCESSORS[preset.preprocess])(captcha_image)
+        if not processed_images:
+            print("❌ 画像の前処理に失敗しました。")
+            return None
+
+        # 共有のEasyOCRリーダーを取得（実行開始時に読み込みを開始済み）
+        reader = engine.ocr_reader()
+
+        # 全ての前処理画像を並列にOCRし、十分な結果が出た時点で打ち切る
+        print(f"--- OCR試行: {len(processed_images)}種類の前処理を並列に評価 --- ")
+        result = evaluate_variants(reader, processed_images, convert_hiragana_to_numbers,
+                                   segment_confidence=preset.segment_confidence,
+                                   cancel_event=cancel_event)
+        best_text = result["text"]
+
+        if preset.accepts(best_text):
+            print(f"✅ 最も確からしいOCR結果: '{best_text}' (前処理: {result['variant']})")
+            return best_text
+        print(f"❌ OCRで十分な桁数の数字を認識できませんでした。最終候補: '{best_text}'")
+        return None
+
+    except Exception as e:
+        print(f"❌ OCR処理でエラー: {e}")
+        return None
+
+
+@step_timing.timed("solver.claude_api")
+def solve_with_claude_api(captcha_image, engine, cancel_event=None):
+    """
+    Claude APIを使用して画像認証を解く（API呼び出しは途中で止められないため cancel_event は使わない）
+    """
+    if not CLAUDE_AVAILABLE or not CLAUDE_API_KEY:
+        print("⚠️  Claude API機能が利用できません。")
+        return None
+
+    try:
+        from claude_vision import read_captcha
+        print("🤖 Claude APIで画像認証を解析中...")
+
+        # 共有クライアントで、グレースケール・切り詰め済みの小さな画像を送信
+        response = read_captcha(captcha_image, api_key=CLAUDE_API_KEY)
+        if response is None:
+            return None
+
+        # ストリーミング中に6桁の数字が確定していればそのまま使う
+        if response["answer"]:
+            print(f"🤖 Claude解析結果: '{response['answer']}'")
+            return response["answer"]
+
+        claude_result = response["text"]
+        print(f"🤖 Claude解析結果: '{claude_result}'")
+
+        # 応答そのものと、特殊文字を除いたもののうち6桁に近い方の変換結果を使う
+        decoded = best_decode([claude_result, clean_ocr_text(claude_result)])
+        print(f"🔢 ひらがな→数字変換結果: '{decoded['text']}'")
+        return decoded["text"] or None
+
+    except Exception as e:
+        print(f"❌ Claude API処理でエラー: {e}")
+        return None
+
+
+def solve_with_claude_code(captcha_image, engine, cancel_event=None):
+    """
+    Claude Code CLI を使用して画像認証を解く
+
+    順に試す場合は自動解析に失敗すると対話モードに切り替える。レースモードでは対話せず、
+    負けた場合は CLI のプロセスを終了させる。
+    """
+    if not CLAUDE_CODE_AVAILABLE:
+        print("⚠️  Claude Code CLI 統合が利用できません。")
+        return None
+
+    from claude_code_integration import get_integration, enhanced_solve_captcha_with_claude_code
+
+    image_file = engine.image_file(captcha_image)
+    if cancel_event is None:
+        return enhanced_solve_captcha_with_claude_code(image_file)
+    return get_integration().solve_captcha_with_claude_code(image_file, cancel_event=cancel_event)
+
+
+def solve_with_handoff(captcha_image, engine, cancel_event=None):
+    """
+    Gemini連携モード: 別のターミナルの solve_captcha.py から解答を受け取る（最大5分）
+    """
+    # solve_captcha.py に渡す切り取り画像をここで初めてファイルに書き出す
+    image_path = engine.image_file(captcha_image, "captcha_cropped.png")
+    print("----------------------------------------------------------------")
+    print("🤖 自動解決に失敗しました。Gemini連携モードに移行します。")
+    print("1. 新しいターミナルを開いてください。")
+    print("2. `python solve_captcha.py` を実行し、Geminiと連携してCAPTCHAを解決してください。")
+    print("   （先に起動しておくと、画像のパスがすぐに表示されます）")
+    print("3. このスクリプトは解答が届くまで待機します...")
+    print("----------------------------------------------------------------")
+
+    # ソケットで届いた解答は受信した瞬間に処理を再開する
+    with step_timing.span("solver.handoff"), \
+            SolutionWaiter(image_path or "captcha_cropped.png") as waiter:
+        answer = waiter.wait(timeout=300)
+    if answer is None:
+        print("❌ 5分以内に解答が届きませんでした。")
+    return answer
+
+
+# ▼ 利用期限と更新時期
+
+def get_expiry_date_from_page(driver, wait=None, server_id=None):
+    """
+    VPS詳細ページから実際の利用期限を取得
+
+    page_source を1度だけ取得し（WebDriver への往復は1回）、expiry_parser で読み取る。
+
+    Args:
+        driver: WebDriver
+        wait: 互換用（使用しない）
+        server_id (str): 複数のサーバーが並ぶページで、どのサーバーの利用期限かを選ぶためのID
+    """
+    try:
+        print("📅 ページから利用期限を取得しています...")
+        expiry_date = parse_expiry(driver.page_source, server_id)
+        if expiry_date is None:
+            print("⚠️  利用期限が見つかりませんでした。ページ全体をスクリーンショット保存します。")
+            failure_artifacts.capture(driver, "expiry_date_not_found")
+            return None
+        print(f"✅ 利用期限を正常に取得: {expiry_date.strftime('%Y-%m-%d %H:%M')}")
+        return expiry_date
+
+    except Exception as e:
+        print(f"❌ 利用期限の取得でエラー: {e}")
+        failure_artifacts.capture(driver, "expiry_date_error")
+        return None
+
+
+def should_update(expiry_date, threshold_hours=12, renewable_hours=0):
+    """
+    更新を実行すべきかを判定
+
+    Xserver VPSの仕様:
+    - 2日間の利用期限
+    - 更新時は「残り時間 + 2日間」で期限が延長される
+    - 24時間前には更新できるようになる（renewable_hours=24 で、閾値に関わらずその時点で更新する）
+    """
+    if not expiry_date:
+        print("⚠️  利用期限が不明のため、安全のため更新を実行します。")
+        return True
+
+    now = datetime.now()
+    time_until_expiry = expiry_date - now
+    threshold = timedelta(hours=threshold_hours)
+
+    print(f"📅 現在日時: {now.strftime('%Y-%m-%d %H:%M')}")
+    print(f"📅 利用期限: {expiry_date.strftime('%Y-%m-%d %H:%M')}")
+    print(f"⏰ 期限まで: {time_until_expiry}")
+    print(f"🎯 更新閾値: {threshold_hours}時間前")
+
+    # 期限が切れている場合は即座に更新
+    if time_until_expiry <= timedelta(0):
+        print("❌ 期限が切れています！即座に更新を実行します。")
+        return True
+
+    if renewable_hours and time_until_expiry <= timedelta(hours=renewable_hours):
+        print(f"✅ {renewable_hours}時間以内です。更新を実行します。")
+        print(f"💡 更新後の予想期限: {(expiry_date + timedelta(days=2)).strftime('%Y-%m-%d %H:%M')}")
+        return True
+
+    if time_until_expiry <= threshold:
+        print("✅ 更新時期に達しました。更新を実行します。")
+        return True
+
+    next_check = renewal_due_time(expiry_date, threshold_hours, renewable_hours)
+    print(f"⏳ まだ更新時期ではありません。次回実行予定: {next_check.strftime('%Y-%m-%d %H:%M')} 以降")
+    return False
+
+
+def renewal_due_time(expiry_date, threshold_hours=12, renewable_hours=0):
+    """
+    should_update() が更新を実行すると判定する最も早い日時
+    """
+    return expiry_date - timedelta(hours=max(threshold_hours, renewable_hours))
+
+
+# ▼ エンジン
+
+class RenewalEngine:
+    """
+    プリセットのステージを順に実行し、ブラウザ・OCRリーダー・APIクライアントを共有する
+
+    常駐モードでは同じエンジンで run() を繰り返し、読み込み済みのモデルやクライアントを使い回す。
+    """
+
+    def __init__(self, preset):
+        self.preset = preset
+        self.driver = None
+        self.wait = None
+        self._image_file = None     # (画像, 指定したパス, 書き出したファイル)。同じ画像を何度も書き出さない
+
+    # ▼ 共有リソース
+
+    def warm_up(self):
+        """使う解析ステージのリソース（OCRモデル・APIクライアント）の準備をバックグラウンドで始める"""
+        if "ocr" in self.preset.solvers and OCR_AVAILABLE:
+            preload_reader(self.preset.ocr_languages)
+        if "claude_api" in self.preset.solvers and CLAUDE_AVAILABLE:
+            from claude_vision import get_client
+            # anthropic の import とクライアントの作成をブラウザの起動・ログインと重ねる
+            threading.Thread(target=get_client, args=(CLAUDE_API_KEY,), name="claude-client-preload",
+                             daemon=True).start()
+
+    def warm_browser(self):
+        """
+        次の実行に備えて Chrome をバックグラウンドで起動しておく（プールを使う設定の場合のみ）
+
+        借りる直前に呼んでも起動を待つだけになり、早すぎると待機中に使い回しの上限の時間を過ぎるため、
+        常駐モードで次の実行の少し前に呼ぶ。
+        """
+        driver_pool.warm_up(self.preset.headless)
+
+    def ocr_reader(self):
+        """共有の EasyOCR リーダー（読み込み中なら完了を待つ）"""
+        return get_reader(self.preset.ocr_languages)
+
+    def image_file(self, image, path=None):
+        """ファイルを必要とするステージ用に、切り取った画像を1度だけ書き出してパスを返す"""
+        cached = self._image_file
+        if cached is None or cached[0] is not image or cached[1] != path:
+            self._discard_image_file()
+            self._image_file = (image, path, write_image_file(image, path))
+        return self._image_file[2]
+
+    def _discard_image_file(self):
+        """image_file() が一時ファイルに書き出した画像を削除する（パスを指定して保存したものは残す）"""
+        cached, self._image_file = self._image_file, None
+        if cached is not None and cached[1] is None and cached[2]:
+            try:
+                os.remove(cached[2])
+            except OSError:
+                pass
+
+    def start_browser(self):
+        """driver_pool から driver を借りる（待機中の Chrome や常駐している Chrome があれば起動しない）"""
+        from selenium.webdriver.support.ui import WebDriverWait
+        from browser_session import BASE_URL
+
+        self.driver = driver_pool.get_pool(self.preset.headless).acquire()
+        lean_navigation.apply_blocklist(self.driver, BASE_URL)
+        self.wait = WebDriverWait(self.driver, 30)  # タイムアウトを30秒に設定
+        return self.driver
+
+    def quit(self):
+        """driver をプールに返す（プールを使わない設定なら終了する）"""
+        if self.driver is not None:
+            driver_pool.get_pool(self.preset.headless).release(self.driver)
+        self.driver = None
+        self.wait = None
+        self._discard_image_file()
+
+    # ▼ セッションステージ
+
+    def open_session(self, first_server_id):
+        """保存済みのセッションが有効なら再利用し、無効ならログインする"""
+        from browser_session import resume_session, login
+
+        # 保存済みのセッションが有効なら、ログインせずにVPS詳細ページを開く
+        if resume_session(self.driver, first_server_id):
+            return True
+        return login(self.driver, self.wait, self.preset.username, self.preset.password)
+
+    def probe_expiries(self, server_ids, results):
+        """
+        ブラウザを起動せずに HTTP で利用期限を確認する（http_probe）
+
+        更新が不要と分かったサーバーは results を "not_due" にする。
+
+        Returns:
+            list: ブラウザで確認・更新する必要があるサーバーID（セッションが拒否された場合は全て）
+        """
+        import http_probe
+
+        if not http_probe.available():
+            return server_ids
+        step_timing.step("http_probe")
+        expiries = http_probe.probe_expiries(server_ids)
+        if expiries is None:
+            return server_ids
+
+        remaining = []
+        for server_id in server_ids:
+            expiry_date = expiries.get(server_id)
+            if expiry_date is None:
+                # 利用期限の行が読めないページは保存も判定もせず、ブラウザで確認する
+                print(f"⚠️  サーバー {server_id}: HTTP で利用期限を読み取れなかったため、ブラウザで確認します。")
+                remaining.append(server_id)
+                continue
+            renewal_state.record_expiry(server_id, expiry_date)
+            if should_update(expiry_date, self.preset.threshold_hours, self.preset.renewable_hours):
+                remaining.append(server_id)
+            else:
+                results[server_id] = "not_due"
+        return remaining
+
+    def read_expiries(self, server_ids):
+        from browser_session import read_expiries
+
+        return read_expiries(self.driver, server_ids,
+                             lambda driver, server_id: get_expiry_date_from_page(driver, server_id=server_id))
+
+    # ▼ 解析ステージ
+
+    def solve(self, captcha_image):
+        """
+        プリセットの解析ステージを順に（またはレースで）試し、採用できる回答を返す
+
+        Returns:
+            str: 回答（どのステージでも解けなかった場合は None）
+        """
+        preset = self.preset
+        names = [name for name in preset.solvers if solver_available(name)]
+        if preset.race:
+            racers = [name for name in names if name in RACE_SOLVERS]
+            if racers:
+                print("🏁 レースモードが有効です。全ての解析方法を同時に実行します...")
+                answer = self._race(captcha_image, racers)
+                if preset.accepts(answer):
+                    return answer
+            names = [name for name in names if name not in RACE_SOLVERS]
+
+        for name in names:
+            label, function_name = SOLVERS[name]
+            print(f"🤖 {label}による解析を試行します...")
+            answer = _stage(function_name)(captcha_image, self)
+            if preset.accepts(answer):
+                print(f"🎯 {label}で認識したテキスト: '{answer}'")
+                return answer
+            print(f"⚠️  {label}での認識に失敗しました。")
+        return None
+
+    def _race(self, captcha_image, names):
+        from captcha_race import race_solvers
+
+        def solver(function_name):
+            return lambda cancel: _stage(function_name)(captcha_image, self, cancel_event=cancel)
+
+        result = race_solvers([(SOLVERS[name][0], solver(SOLVERS[name][1])) for name in names])
+        if result["solver"]:
+            print(f"📊 レース結果: 勝者 {result['solver']}（{result['elapsed']:.2f}秒）")
+        for name, latency in result["latencies"].items():
+            print(f"   - {name}: {latency:.2f}秒")
+        return result["text"]
+
+    # ▼ 送信ステージ
+
+    def find_captcha_input(self):
+        """画像認証の入力欄（見つからなければ None）"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException
+        from page_waits import wait_for
+
+        try:
+            return wait_for(self.driver, EC.presence_of_element_located((By.XPATH, CAPTCHA_INPUT_XPATH)),
+                            timeout=10)
+        except TimeoutException:
+            # より汎用的な検索
+            inputs = self.driver.find_elements(By.XPATH, "//input[@type='text']")
+            if inputs:
+                print("✅ 汎用テキスト入力フィールドを画像認証用として使用")
+                return inputs[0]
+            return None
+
+    def submit_answer(self, captcha_input, answer, submit_button=None):
+        """
+        回答を入力して送信し、完了ページへの遷移かエラーメッセージの表示を待つ
+
+        送信ボタン（captcha_dom の submit）が見つかっていればクリックし、なければ入力欄で Enter を押す
+        （Enter で送信できるのは入力欄がフォームの中にある場合だけのため）。
+
+        Returns:
+            bool: 画像認証を通過した（とみなせる）場合 True
+        """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.keys import Keys
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support import expected_conditions as EC
+        from page_waits import wait_for_any, any_visible
+
+        driver = self.driver
+        print(f"⌨️ 取得したコード '{answer}' を入力します。")
+        captcha_input.clear()
+        captcha_input.send_keys(answer)
+
+        print("🚀 コードを送信します...")
+        step_timing.step("captcha_submit")
+        if submit_button is not None:
+            submit_button.click()
+        else:
+            print("⚠️  送信ボタンが見つからないため、入力欄で Enter を押して送信します。")
+            captcha_input.send_keys(Keys.RETURN)
+
+        # 完了ページへの遷移かエラーメッセージの表示のどちらか早い方を待つ
+        try:
+            wait_for_any(driver, {
+                "complete": EC.url_contains(EXTEND_COMPLETE_PATH),
+                "error": any_visible(CAPTCHA_ERROR_XPATH),
+            }, timeout=15)
+        except TimeoutException:
+            print("⚠️  送信後のページ状態を検出できませんでした。")
+
+        if EXTEND_COMPLETE_PATH in driver.current_url:
+            print("✅ 画像認証成功！完了ページに遷移しました。")
+            return True
+        try:
+            error_messages = driver.find_elements(By.XPATH, CAPTCHA_ERROR_XPATH)
+            if any(msg.is_displayed() for msg in error_messages):
+                print("❌ 画像認証に失敗しました。エラーメッセージが表示されています。")
+                failure_artifacts.capture(driver, "captcha_submit_failed")
+                return False
+        except Exception:
+            pass
+        print("✅ 画像認証は成功したようです（エラーメッセージなし）。")
+        return True
+
+    def wait_for_manual_input(self, captcha_image):
+        """自動解決に失敗した場合、ブラウザでの手動入力が終わるまで待つ"""
+        print("🔄 自動解決に失敗しました。手動入力に切り替えます。")
+
+        # 手動確認用に画面のスクリーンショットと切り取り画像をファイルへ書き出す
+        self.driver.save_screenshot("captcha_screen.png")
+        print("📸 画像認証のスクリーンショットを captcha_screen.png に保存しました。")
+        if captcha_image is not None:
+            self.image_file(captcha_image, "captcha_cropped.png")
+
+        if self.preset.headless:
+            print("⚠️  ヘッドレスモードでは画像認証を確認できません。")
+            print("💡 次回実行時は HEADLESS = False にしてください。")
+
+        print("👆 Claude Code ユーザーの場合:")
+        print("   1. 新しいターミナルを開いて 'claude' コマンドを実行")
+        print("   2. 以下のメッセージをコピーして Claude に送信:")
+        print("   " + "="*50)
+        print("   XServerの画像認証を解析してください。")
+        print("   captcha_screen.png と captcha_cropped.png を確認し、")
+        print("   画像に表示されている文字を教えてください。")
+        print("   " + "="*50)
+        print("   3. Claudeが教えてくれた文字をブラウザの入力欄に入力")
+        print("   4. 送信ボタンをクリック")
+        print("   5. 処理が完了したらここでEnterキーを押してください")
+        print()
+        print("📝 その他の方法:")
+        print("   - captcha_screen.png を確認して画像認証の文字を読み取る")
+        print("   - ブラウザ画面で画像認証コードを手動入力")
+        print("   - 送信ボタンをクリック")
+        print()
+
+        # ユーザーの入力を待機
+        input("処理完了後にEnterキーを押してください: ")
+        print("✅ 手動処理が完了しました。続行します。")
+
+    def handle_captcha(self):
+        """
+        画像認証が表示されていれば、取得 → 解析 → 送信 の各ステージで解く
+
+        Returns:
+            bool: 画像認証がないか、通過した場合 True
+        """
+        driver = self.driver
+        # 案内文・画像・入力欄を1回の往復でまとめて探す
+        probed = captcha_dom.probe(driver, CAPTCHA_MESSAGE)
+        if probed["message"] is None:
+            print("✅ 画像認証は要求されませんでした。処理を続行します。")
+            return True
+        if not probed["message"]:
+            print("✅ 画像認証は不要でした。")
+            return True
+
+        print("🔍 画像認証が検出されました。")
+        remembered = renewal_state.get_selectors()
+        input_candidate = captcha_dom.pick(probed, "input", remembered.get("input"))
+        if input_candidate:
+            captcha_input = input_candidate["element"]
+        else:
+            # まだ描画されていない場合は現れるまで待つ
+            captcha_input = self.find_captcha_input()
+        if captcha_input is None:
+            print("❌ 画像認証の入力フィールドが見つかりませんでした。")
+            failure_artifacts.capture(driver, "captcha_input_not_found")
+            return False
+
+        image_candidate = captcha_dom.pick(probed, "image", remembered.get("image"))
+        captcha_image = None
+        if image_candidate:
+            if image_candidate["selector"]:
+                print(f"✅ 画像認証画像を発見: {image_candidate['selector']}")
+            captcha_image = extract_captcha_image(driver, image_candidate["element"], image_candidate["rect"])
+        answer = None
+        if captcha_image is None:
+            print("❌ 画像認証の画像を抽出できませんでした。")
+            failure_artifacts.capture(driver, "captcha_image_extract_failed")
+        else:
+            answer = self.solve(captcha_image)
+
+        submit_candidate = captcha_dom.pick(probed, "submit", remembered.get("submit"))
+        if submit_candidate and submit_candidate["selector"]:
+            print(f"✅ 送信ボタンを発見: {submit_candidate['selector']}")
+        submit_button = submit_candidate["element"] if submit_candidate else None
+
+        if answer and self.submit_answer(captcha_input, answer, submit_button):
+            # 通過したセレクタを次回最初に試す
+            renewal_state.record_selectors({
+                "image": image_candidate["selector"],
+                "input": input_candidate["selector"] if input_candidate else None,
+                "submit": submit_candidate["selector"] if submit_candidate else None,
+            })
+            return True
+        if not answer:
+            print(f"❌ 有効な回答('{answer}')が取得できませんでした。")
+        if self.preset.manual_fallback:
+            self.wait_for_manual_input(captcha_image)
+            return True
+        failure_artifacts.capture(driver, "captcha_code_invalid")
+        return False
+
+    # ▼ 更新の流れ
+
+    @step_timing.timed("renew")
+    def renew_server(self, server_id):
+        """
+        VPS詳細ページが表示された状態から、1台分の更新処理（画像認証を含む）を行う
+
+        Returns:
+            bool: 更新が完了した場合 True
+        """
+        from selenium.webdriver.common.by import By
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support import expected_conditions as EC
+        from page_waits import wait_for_any, wait_for, text_visible
+        from browser_session import detail_url
+
+        driver, wait = self.driver, self.wait
+        try:
+            # 5. 更新処理を実行
+            step_timing.step("update_button")
+            print("🔄 更新処理を開始します...")
+
+            # 更新ボタンがクリック可能になるまで待機
+            print("9. 「更新する」ボタンを待機します。")
+            try:
+                update_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//a[contains(text(), '更新する')]")))
+            except TimeoutException:
+                print("⚠️  「更新する」ボタンが見つかりません。まだ更新可能時期ではない可能性があります。")
+                failure_artifacts.capture(driver, "update_button_not_found")
+                return False
+
+            print("10. 「更新する」ボタンをクリックします。")
+            update_button.click()
+            print("✅ 更新ボタンをクリックしました。")
+
+            # 6. 「引き続き無料VPSの利用を継続する」ボタンがクリック可能になるまで待機して押す
+            step_timing.step("continue_button")
+            print("11. 「引き続き無料VPSの利用を継続する」ボタンを待機します。")
+            continue_button = wait.until(EC.element_to_be_clickable((By.XPATH, f"//button[@formaction='{EXTEND_CONF_PATH}']")))
+            print("12. 「引き続き無料VPSの利用を継続する」ボタンをクリックします。")
+            driver.execute_script("arguments[0].click();", continue_button)
+            print("12. 「引き続き無料VPSの利用を継続する」ボタンをJavaScriptでクリックしました。")
+
+            # 7. 最終確認ページへの遷移を待機
+            step_timing.step("confirm_page")
+            print("13. 最終確認ページへの遷移を待ちます。")
+            wait.until(EC.url_contains(EXTEND_CONF_PATH))
+            lean_navigation.report_page(driver, "extend/conf")
+
+            # 8. 最終確認ページの「無料VPSの利用を継続する」ボタンをクリック
+            step_timing.step("final_confirm")
+            print("14. 最終確認ページの「無料VPSの利用を継続する」ボタンを待機します。")
+            final_confirm_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), '無料VPSの利用を継続する')]")))
+            print("15. 最終確認ページの「無料VPSの利用を継続する」ボタンをJavaScriptでクリックします。")
+            driver.execute_script("arguments[0].click();", final_confirm_button)
+
+            # 9. 画像認証の処理
+            step_timing.step("captcha")
+            print("16. 画像認証が表示されているかを確認します。")
+            # 画像認証の表示か完了ページへの遷移のどちらか早い方を待つ
+            try:
+                page_state, _ = wait_for_any(driver, {
+                    "captcha": text_visible(CAPTCHA_MESSAGE),
+                    "complete": EC.url_contains(EXTEND_COMPLETE_PATH),
+                }, timeout=10)
+                print(f"📄 検出したページ状態: {page_state}")
+                if page_state == "captcha":
+                    lean_navigation.report_page(driver, "captcha")
+            except TimeoutException:
+                print("⚠️  画像認証・完了ページのどちらも検出されませんでした。")
+
+            if not self.handle_captcha():
+                print("❌ 画像認証を通過できなかったため、処理を中断します。")
+                return False
+
+            # 10. 更新完了後のページ遷移を待機
+            step_timing.step("complete_page")
+            print("17. 更新完了後のページ遷移を待ちます。")
+            wait_for_any(driver, {
+                "complete": EC.url_contains(EXTEND_COMPLETE_PATH),
+                "detail": EC.url_contains(DETAIL_PATH),
+            })
+            print("🎉 更新が完了しました！")
+            lean_navigation.report_page(driver, "complete")
+            renewal_state.record_renewal(server_id)
+
+            # 11. 完了メッセージのOKボタンをクリック
+            step_timing.step("ok_button")
+            try:
+                print("18. 完了メッセージのOKボタンを待機します。")
+                ok_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//button[text()='OK']")))
+                print("19. OKボタンをクリックします。")
+                ok_button.click()
+                wait_for(driver, EC.invisibility_of_element(ok_button), timeout=5)  # ダイアログが閉じるのを待つ
+            except TimeoutException:
+                print("⚠️  OKボタンが見つかりませんでした（完了ページの構造が変わった可能性）")
+
+            # 12. 更新後の新しい期限を確認（オプション）
+            step_timing.step("new_expiry")
+            try:
+                print("20. 更新後の新しい利用期限を確認します。")
+                driver.get(detail_url(server_id))  # 詳細ページを再読み込み
+                wait_for(driver, text_visible('利用期限'), timeout=10)
+                new_expiry_date = get_expiry_date_from_page(driver, server_id=server_id)
+                if new_expiry_date:
+                    print(f"✅ 更新後の新しい利用期限: {new_expiry_date.strftime('%Y-%m-%d %H:%M')}")
+                    renewal_state.record_expiry(server_id, new_expiry_date)
+                    next_check = self.preset.due_time(new_expiry_date)
+                    print(f"📅 次回チェック推奨時刻: {next_check.strftime('%Y-%m-%d %H:%M')} 以降")
+            except Exception as e:
+                print(f"⚠️  更新後の期限確認でエラー: {e}")
+
+            return True
+
+        except TimeoutException:
+            print(f"❌ サーバー {server_id} の処理がタイムアウトしました。ページの要素が見つからないか、クリックできない状態です。")
+            print("ページの構造が変更されたか、読み込みに時間がかかりすぎている可能性があります。")
+            failure_artifacts.capture(driver, "update_timeout_error")
+            return False
+        except Exception as e:
+            print(f"❌ サーバー {server_id} の処理で不明なエラーが発生しました:", e)
+            failure_artifacts.capture(driver, "update_unknown_error")
+            return False
+
+    def run(self, server_ids=None):
+        """
+        1回のログインで複数のサーバーの利用期限を確認し、更新が必要なサーバーだけを更新する
+
+        Args:
+            server_ids (list): 処理するサーバーID（省略時はプリセットのサーバーID）
+
+        Returns:
+            bool: 失敗したサーバーがなければ True
+        """
+        preset = self.preset
+        server_ids = server_ids or preset.server_ids
+        if preset.check_expiry:
+            # 保存済みの利用期限だけで判断できるサーバーはブラウザで確認しない
+            check_ids = [server_id for server_id in server_ids
+                         if renewal_state.needs_browser_session(server_id, preset.due_time)]
+        else:
+            check_ids = list(server_ids)
+        results = {server_id: "skipped" if server_id not in check_ids else "not_checked"
+                   for server_id in server_ids}
+        if not check_ids:
+            print("⏳ 更新の必要がないため、処理を終了します。")
+            return True
+
+        if preset.check_expiry:
+            # 保存済みのクッキーで利用期限を HTTP で確認し、更新が必要なサーバーだけをブラウザで処理する
+            check_ids = self.probe_expiries(check_ids, results)
+            if not check_ids:
+                print("⏳ 更新の必要がないため、ブラウザを起動せずに終了します。")
+                renewal_state.print_summary(results)
+                return True
+
+        # ログインと並行してOCRモデルの読み込みなどを始めておく
+        self.warm_up()
+        # 失敗時の記録はこの実行のディレクトリに保存する（常駐モードでも実行ごとに分け、古いものは削除する）
+        failure_artifacts.start_run()
+
+        # ▼ Selenium操作開始（更新不要で終了する場合は読み込まない）
+        from selenium.common.exceptions import TimeoutException
+        from browser_session import open_detail_page
+
+        step_timing.step("chrome_start")
+        driver = self.start_browser()
+
+        try:
+            # 1. 保存済みのセッションが有効なら、ログインせずにVPS詳細ページを開く
+            step_timing.step("login")
+            if not self.open_session(check_ids[0]):
+                return False
+
+            # 2-3. 各サーバーの実際の利用期限を取得（読み取りのみ）
+            expiries = {}
+            if preset.check_expiry:
+                step_timing.step("read_expiries")
+                expiries = self.read_expiries(check_ids)
+
+            # 4. 更新が必要なサーバーだけを1台ずつ更新
+            for server_id in check_ids:
+                print(f"\n🖥️  サーバー {server_id}")
+                if preset.check_expiry:
+                    expiry_date = expiries.get(server_id)
+                    if expiry_date:
+                        renewal_state.record_expiry(server_id, expiry_date)
+
+                    if not should_update(expiry_date, preset.threshold_hours, preset.renewable_hours):
+                        print("⏳ このサーバーは更新の必要がありません。")
+                        results[server_id] = "not_due"
+                        continue
+
+                step_timing.step("server", server_id=server_id)
+                open_detail_page(driver, server_id)
+                results[server_id] = "renewed" if self.renew_server(server_id) else "failed"
+
+            return all(result != "failed" for result in results.values())
+
+        except TimeoutException:
+            print("❌ 処理がタイムアウトしました。ページの要素が見つからないか、クリックできない状態です。")
+            print("ページの構造が変更されたか、読み込みに時間がかかりすぎている可能性があります。")
+            failure_artifacts.capture(driver, "update_timeout_error")
+            return False
+        except Exception as e:
+            print("❌ 不明なエラーが発生しました:", e)
+            failure_artifacts.capture(driver, "update_unknown_error")
+            return False
+
+        finally:
+            step_timing.step("quit")
+            self.quit()
+            renewal_state.print_summary(results)
+            lean_navigation.print_summary()
+            print("✅ 処理を終了しました。")
@@ -0,0 +1,167 @@
+"""
+更新状態の保存と読み込み
+
+最後に確認した利用期限と最後に更新に成功した日時をサーバーIDごとにJSONファイルへ保存し、
+次回の実行ではこのファイルだけを見てブラウザを起動する必要があるかを判定する。
+画像認証の画像・入力欄を見つけたセレクタも保存し、次回の DOM 探索で最初に試す。
+書き込みは一時ファイルに書いてから置き換えるため、途中で中断されても壊れたファイルは残らない。
+
+環境変数:
+    XSERVER_STATE_FILE   状態ファイルのパス（デフォルト: xserver_state.json）
+    XSERVER_IGNORE_STATE=true  状態ファイルを無視して毎回ブラウザで確認する
+"""
+import json
+import os
+import tempfile
+from datetime import datetime
+
+STATE_FILE = os.getenv("XSERVER_STATE_FILE", "xserver_state.json")
+IGNORE_STATE = os.getenv("XSERVER_IGNORE_STATE", "false").lower() == "true"
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+
+# print_summary() で表示するサーバーごとの結果
+RESULT_LABELS = {
+    "skipped": "⏭️  確認不要（保存済みの利用期限）",
+    "not_due": "⏳ 更新不要",
+    "renewed": "✅ 更新完了",
+    "failed": "❌ 更新失敗",
+    "not_checked": "⚠️  未確認",
+}
+
+
+def load_state(path=None):
+    """状態ファイルを読み込む（存在しない・壊れている場合は空の状態を返す）"""
+    path = path or STATE_FILE
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return {"servers": {}}
+    except (OSError, ValueError) as e:
+        print(f"⚠️  状態ファイルを読み込めませんでした: {path} ({e})")
+        return {"servers": {}}
+    state.setdefault("servers", {})
+    return state
+
+
+def save_state(state, path=None):
+    """状態ファイルをアトミックに書き込む（同じディレクトリの一時ファイル → os.replace）"""
+    path = path or STATE_FILE
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".xserver_state_", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _server_entry(state, server_id):
+    return state["servers"].setdefault(str(server_id), {})
+
+
+def _parse(value):
+    return datetime.strptime(value, DATETIME_FORMAT) if value else None
+
+
+def record_expiry(server_id, expiry_date, path=None):
+    """ページで確認した利用期限を保存する"""
+    state = load_state(path)
+    entry = _server_entry(state, server_id)
+    entry["expiry"] = expiry_date.strftime(DATETIME_FORMAT)
+    entry["observed_at"] = datetime.now().strftime(DATETIME_FORMAT)
+    save_state(state, path)
+
+
+def record_renewal(server_id, renewed_at=None, path=None):
+    """
+    更新に成功した日時を保存する
+
+    更新後の利用期限はまだ確認していないため、古い利用期限は削除しておく
+    （次回はブラウザで新しい期限を確認する）。
+    """
+    state = load_state(path)
+    entry = _server_entry(state, server_id)
+    entry["last_renewal"] = (renewed_at or datetime.now()).strftime(DATETIME_FORMAT)
+    entry.pop("expiry", None)
+    save_state(state, path)
+
+
+def get_expiry(server_id, path=None):
+    """保存済みの利用期限を返す（未保存なら None）"""
+    return _parse(load_state(path)["servers"].get(str(server_id), {}).get("expiry"))
+
+
+def get_last_renewal(server_id, path=None):
+    """保存済みの最終更新日時を返す（未保存なら None）"""
+    return _parse(load_state(path)["servers"].get(str(server_id), {}).get("last_renewal"))
+
+
+def get_selectors(path=None):
+    """前回画像認証を通過したときのセレクタ（役割 → XPath）を返す"""
+    return dict(load_state(path).get("selectors", {}))
+
+
+def record_selectors(selectors, path=None):
+    """画像認証を通過したときのセレクタを保存する（変わっていなければ書き込まない）"""
+    state = load_state(path)
+    saved = state.setdefault("selectors", {})
+    selectors = {role: selector for role, selector in selectors.items() if selector}
+    if all(saved.get(role) == selector for role, selector in selectors.items()):
+        return
+    saved.update(selectors)
+    save_state(state, path)
+
+
+def needs_browser_session(server_id, due_time_for, now=None, path=None):
+    """
+    状態ファイルだけでブラウザを起動する必要があるかを判定する
+
+    Args:
+        server_id (str): サーバーID
+        due_time_for (callable): 利用期限 → 更新を実行すべき最も早い日時 を返す関数
+        now (datetime): 現在日時（省略時は datetime.now()）
+
+    Returns:
+        bool: ブラウザで確認・更新する必要があれば True
+    """
+    if IGNORE_STATE:
+        print("💡 XSERVER_IGNORE_STATE=true のため状態ファイルを使用しません。")
+        return True
+
+    expiry_date = get_expiry(server_id, path)
+    if expiry_date is None:
+        print(f"📂 サーバー {server_id}: 保存済みの利用期限がないため、ブラウザで確認します。")
+        return True
+
+    now = now or datetime.now()
+    due_time = due_time_for(expiry_date)
+    print(f"📂 サーバー {server_id}: 保存済みの利用期限 {expiry_date.strftime(DATETIME_FORMAT)}")
+    if now >= due_time:
+        print("✅ 更新時期に達しています。ブラウザを起動します。")
+        return True
+
+    print(f"⏳ まだ更新時期ではありません。次に実行する価値がある時刻: {due_time.strftime(DATETIME_FORMAT)}")
+    return False
+
+
+def print_summary(results, path=None):
+    """
+    サーバーごとの結果と、状態ファイルに保存されている利用期限を一覧表示する
+
+    Args:
+        results (dict): サーバーID → RESULT_LABELS のキー
+    """
+    print("=" * 60)
+    print("📋 サーバーごとの結果")
+    for server_id, result in results.items():
+        expiry_date = get_expiry(server_id, path)
+        expiry_text = expiry_date.strftime(DATETIME_FORMAT) if expiry_date else "不明"
+        print(f"  {server_id}: {RESULT_LABELS.get(result, result)}（利用期限: {expiry_text}）")
+    print("=" * 60)
@@ -80,8 +80,7 @@ echo.
 echo 📸 生成されたファイル:
 if exist "captcha_screen.png" echo    - captcha_screen.png (画像認証のスクリーンショット)
 if exist "captcha_cropped.png" echo    - captcha_cropped.png (切り取り済み画像認証)
-if exist "captcha_processed.png" echo    - captcha_processed.png (OCR前処理済み画像)
-if exist "captcha_debug_*.png" echo    - captcha_debug_*.png (デバッグ用画像)
+if exist "captcha_debug" echo    - captcha_debug\ (デバッグ用画像、CAPTCHA_DEBUG_IMAGES=true の場合)
 
 echo.
 pause
\ No newline at end of file
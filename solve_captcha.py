@@ -1,36 +1,53 @@
 # solve_captcha.py (Gemini連携用スクリプト)
 import os
 
-CAPTCHA_IMAGE_PATH = os.path.abspath("captcha_cropped.png")
+from captcha_handoff import SolutionClient, write_solution_file
+
 SOLUTION_FILE_PATH = os.path.abspath("captcha_solution.txt")
 
 def main():
     """
-    Geminiと連携してCAPTCHAを解決し、結果をファイルに保存する
+    Geminiと連携してCAPTCHAを解決し、結果をメインスクリプトに渡す
+
+    メインスクリプト(xserver2.py)より先に起動しても構わない。画像認証が表示されると
+    切り取った画像のパスが送られてくるので、ファイルの作成を待って再実行する必要はない。
     """
     print("----------------------------------------------------------------")
     print("🤖 Gemini連携モードへようこそ")
     print("----------------------------------------------------------------")
-    
-    if not os.path.exists(CAPTCHA_IMAGE_PATH):
-        print(f"❌ CAPTCHA画像が見つかりません: {CAPTCHA_IMAGE_PATH}")
-        print("メインのスクリプト(xserver2.py)が画像を生成するまで待ってください。")
+
+    client = SolutionClient()
+    print("⏳ メインスクリプト(xserver2.py)の画像認証を待っています...（Ctrl+C で中止）")
+    try:
+        image_path = client.wait_for_captcha()
+    except KeyboardInterrupt:
+        print("\n中止しました。")
+        return
+    if image_path is None:
+        # 前回の実行で残った画像を今回の画像認証と取り違えないよう、画像のパスを受け取れなければ続けない
+        print("❌ メインスクリプト(xserver2.py)から画像認証の画像を受け取れませんでした。")
+        print("メインスクリプトが画像認証で待っていることを確認してから、もう一度実行してください。")
         return
 
     print("🤝 Geminiとの連携を開始します:")
     print(f"1. Geminiのチャット画面で、この画像ファイルを送信してください:")
-    print(f"   ==> {CAPTCHA_IMAGE_PATH}")
+    print(f"   ==> {image_path}")
     print("2. Geminiが読み取った6桁の数字を教えてもらってください。")
-    
+
     solution = ""
     while not (solution.isdigit() and len(solution) == 6):
-        solution = input("3. ここにGeminiが読み取った6桁の数字を入力してください: ")
+        solution = input("3. ここにGeminiが読み取った6桁の数字を入力してください: ").strip()
         if not (solution.isdigit() and len(solution) == 6):
             print("⚠️  6桁の半角数字を入力してください。")
 
+    if client.submit(solution):
+        print(f"✅ 解答 '{solution}' をメインスクリプトに送信しました。")
+        print("メインスクリプトが自動的に処理を再開します。")
+        return
+
+    # 接続が切れていた場合は解答ファイルで渡す（書きかけを読まれないよう置き換えで書き出す）
     try:
-        with open(SOLUTION_FILE_PATH, "w") as f:
-            f.write(solution)
+        write_solution_file(solution, SOLUTION_FILE_PATH)
         print(f"✅ 解答 '{solution}' を {SOLUTION_FILE_PATH} に保存しました。")
         print("メインスクリプトが自動的に処理を再開します。")
 
@@ -0,0 +1,225 @@
+"""
+画像認証の処理（画像の抽出・前処理・OCR）のプロファイル（任意）
+
+有効にすると、profiled() を付けた関数を呼ぶたびに cProfile の統計と tracemalloc の
+ピークメモリ・メモリ確保の多い行を、実行ごとのディレクトリ（profiles/<実行ID>/）に保存する。
+
+無効の場合、profiled() は関数をそのまま返すため実行時のコストはない。--profile などで
+実行中に enable() を呼ぶと、登録済みの関数をモジュール上でプロファイル付きのものに置き換える。
+
+cProfile は（Python 3.11 以前では）呼び出したスレッドしか計測しないため、ステージが別のスレッドで
+実行させる処理（OCR の前処理バリエーションごとの readtext など）は in_worker() で包み、
+ワーカーのスレッドで計測した統計をステージの統計に合算する。
+
+環境変数:
+    XSERVER_PROFILE=true   プロファイルを有効にする
+    XSERVER_PROFILE_DIR    保存先（デフォルト: profiles）
+"""
+import functools
+import io
+import os
+import sys
+import threading
+import time
+
+from captcha_image import RUN_ID
+
+ENABLED = os.getenv("XSERVER_PROFILE", "false").lower() == "true"
+PROFILE_DIR = os.getenv("XSERVER_PROFILE_DIR", "profiles")
+TOP_FUNCTIONS = 30        # 保存する関数の数（累積時間順）
+TOP_ALLOCATIONS = 15      # 保存するメモリ確保の多い行の数
+TRACEMALLOC_FRAMES = 5    # メモリ確保元として記録する呼び出し階層の深さ
+
+_registry = []            # 無効の間に登録された (モジュール名, 関数名, ステージ名, 関数)
+_calls = {}               # ステージ名 → 呼び出し回数（ファイル名の連番）
+_tracing_users = 0        # tracemalloc を使っている計測中のステージの数（自分で開始した場合のみ）
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def run_dir():
+    """この実行のプロファイルの保存先"""
+    return os.path.join(PROFILE_DIR, RUN_ID)
+
+
+def profiled(stage):
+    """
+    関数をプロファイルの対象として登録するデコレーター
+
+    有効な場合はプロファイル付きの関数を返し、無効な場合は関数をそのまま返す。
+    """
+    def decorator(func):
+        if ENABLED:
+            return _wrap(func, stage)
+        _registry.append((func.__module__, func.__name__, stage, func))
+        return func
+    return decorator
+
+
+def enable(directory=None):
+    """
+    実行中にプロファイルを有効にする（登録済みの関数をモジュール上で置き換える）
+
+    モジュール内の呼び出しはモジュールの名前空間から関数を探すため、置き換え後の呼び出しから対象になる。
+    """
+    global ENABLED, PROFILE_DIR
+    if directory:
+        PROFILE_DIR = directory
+    if ENABLED:
+        return
+    ENABLED = True
+    for module_name, name, stage, func in _registry:
+        module = sys.modules.get(module_name)
+        if module is not None and getattr(module, name, None) is func:
+            setattr(module, name, _wrap(func, stage))
+    print(f"🔬 プロファイルを有効にしました（保存先: {run_dir()}）")
+
+
+def _wrap(func, stage):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # 入れ子のステージ（OCR の中の前処理など）は外側のプロファイルに含める
+        if getattr(_local, "active", False):
+            return func(*args, **kwargs)
+        _local.active = True
+        try:
+            return _profile_call(func, stage, args, kwargs)
+        finally:
+            _local.active = False
+    return wrapper
+
+
+def in_worker(func):
+    """
+    計測中のステージから別のスレッド（ThreadPoolExecutor など）で実行させる関数を、そのステージの統計に含める
+
+    ステージのスレッドで呼び、返した関数をワーカーで実行する。計測中でなければ関数をそのまま返す。
+    """
+    collected = getattr(_local, "worker_profiles", None)
+    if collected is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        import cProfile
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12 以降はステージの計測が全てのスレッドを対象にしている
+            return func(*args, **kwargs)
+        _local.active = True     # ワーカー内で呼ばれたステージも、このステージの統計に含める
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.active = False
+            profile.disable()
+            with _lock:
+                collected.append(profile)
+    return wrapper
+
+
+def _start_tracing():
+    import tracemalloc
+
+    global _tracing_users
+    with _lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            _tracing_users = 1
+        elif _tracing_users:
+            _tracing_users += 1
+
+
+def _stop_tracing():
+    import tracemalloc
+
+    global _tracing_users
+    with _lock:
+        if _tracing_users:
+            _tracing_users -= 1
+            if _tracing_users == 0:
+                tracemalloc.stop()
+
+
+def _snapshot():
+    import tracemalloc
+
+    return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+def _profile_call(func, stage, args, kwargs):
+    import cProfile
+    import tracemalloc
+
+    # 同時に計測している他のステージ（レースモードの別スレッドなど）がある間は tracemalloc を止めない
+    _start_tracing()
+    tracemalloc.reset_peak()
+    before = _snapshot()
+    baseline, _ = tracemalloc.get_traced_memory()
+
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # 別のスレッドで他のステージを計測中（Python 3.12 以降は同時に1つだけ）
+        profile = None
+    _local.worker_profiles = workers = []
+    started = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - started
+        _local.worker_profiles = None
+        if profile is not None:
+            profile.disable()
+        _, peak = tracemalloc.get_traced_memory()
+        after = _snapshot()
+        _stop_tracing()
+        with _lock:
+            workers = list(workers)     # 打ち切り後に終わったワーカーの分は含めない
+        _save(stage, _merge(profile, workers), elapsed, peak - baseline, after.compare_to(before, "lineno"))
+
+
+def _merge(profile, workers):
+    """ステージのスレッドとワーカーのスレッドの統計を1つの pstats.Stats にまとめる（なければ None）"""
+    import pstats
+
+    profiles = ([profile] if profile is not None else []) + workers
+    if not profiles:
+        return None
+    stats = pstats.Stats(profiles[0])
+    if len(profiles) > 1:
+        stats.add(*profiles[1:])
+    return stats
+
+
+def _save(stage, stats, elapsed, peak_bytes, allocations):
+
+    with _lock:
+        _calls[stage] = _calls.get(stage, 0) + 1
+        number = _calls[stage]
+    directory = run_dir()
+    base = os.path.join(directory, f"{stage}_{number}")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        report = io.StringIO()
+        report.write(f"stage: {stage}\n")
+        report.write(f"elapsed: {elapsed:.3f}s\n")
+        report.write(f"tracemalloc peak: {peak_bytes / 1024 / 1024:.2f} MiB\n\n")
+        report.write(f"top {TOP_ALLOCATIONS} allocations (lineno, size diff):\n")
+        for stat in allocations[:TOP_ALLOCATIONS]:
+            report.write(f"  {stat}\n")
+        report.write("\n")
+        if stats is not None:
+            stats.dump_stats(f"{base}.prof")
+            stats.stream = report
+            stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        else:
+            report.write("cProfile: 他のステージを計測中のため取得できませんでした\n")
+        with open(f"{base}.txt", "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+        print(f"🔬 {stage}: {elapsed:.2f}秒, ピークメモリ {peak_bytes / 1024 / 1024:.1f}MiB → {base}.txt")
+    except OSError as e:
+        print(f"⚠️  プロファイルの保存に失敗しました: {e}")
@@ -0,0 +1,328 @@
+"""
+更新処理のステップごとの時間計測（入れ子のスパン）
+
+main() を run() で囲むと、その実行の間だけ span() / step() / timed() の時間を記録し、
+実行の終わりに JSON のトレース（Chrome の Trace Event 形式。chrome://tracing や
+Perfetto で表示できる）と、必要なら node_exporter の textfile collector 用のメトリクスを書き出す。
+時間は time.perf_counter()（単調増加する時計）で測る。run() の外では何も記録しない。
+
+    @step_timing.run("xserver2")
+    def main():
+        step_timing.step("chrome_start")     # 次の step() かスパンの終わりまでを1つのステップとする
+        ...
+        with step_timing.span("renew", server_id=server_id):
+            ...
+
+環境変数:
+    XSERVER_TRACE_FILE           JSON トレースの保存先（デフォルト: xserver_trace.json、空にすると保存しない）
+    XSERVER_PROMETHEUS_TEXTFILE  メトリクスの保存先（例: /var/lib/node_exporter/textfile_collector/xserver.prom）
+"""
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+TRACE_FILE = os.getenv("XSERVER_TRACE_FILE", "xserver_trace.json")
+PROMETHEUS_TEXTFILE = os.getenv("XSERVER_PROMETHEUS_TEXTFILE")
+
+_run = None                 # 実行中の計測（run() の外では None）
+_run_lock = threading.Lock()
+_local = threading.local()  # スレッドごとの開いているスパンの積み重ね
+
+
+class Span:
+    """1つのステップの時間"""
+
+    def __init__(self, name, parent=None, attrs=None):
+        self.name = name
+        self.parent = parent
+        self.path = f"{parent.path}/{name}" if parent else name
+        self.attrs = dict(attrs or {})
+        self.thread = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.end = None
+        self.error = None
+        self.current_step = None    # step() で開いている子スパン
+        self.is_step = False
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+class _Run:
+    def __init__(self, script):
+        self.script = script
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.root = None
+        self.ok = None
+        self.lock = threading.Lock()
+
+    def add(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _open(name, attrs):
+    run = _run
+    if run is None:
+        return None
+    stack = _stack()
+    item = Span(name, stack[-1] if stack else None, attrs)
+    run.add(item)
+    stack.append(item)
+    return item
+
+
+def _close(item, error=None):
+    if item.end is not None:
+        return
+    _end_step(item)
+    item.end = time.perf_counter()
+    if error is not None:
+        item.error = f"{type(error).__name__}: {error}"
+    stack = _stack()
+    if item in stack:
+        # 閉じ忘れた子スパンもまとめて閉じる
+        while stack:
+            if stack.pop() is item:
+                break
+
+
+def _end_step(item):
+    if item.current_step is not None:
+        _close(item.current_step)
+        item.current_step = None
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    with ブロックの時間を1つのスパンとして記録する（開いているスパンの子になる）
+
+    Yields:
+        Span: 記録中のスパン（run() の外では None）
+    """
+    item = _open(name, attrs)
+    if item is None:
+        yield None
+        return
+    try:
+        yield item
+    except BaseException as e:
+        _close(item, e)
+        raise
+    _close(item)
+
+
+def step(name, **attrs):
+    """
+    現在のスパンの中で、前のステップを閉じて次のステップを開始する
+
+    番号付きの手順のように順に進む処理を、ブロックで囲まずに区切るためのもの。
+    ステップの中で step() を呼ぶと、そのステップを閉じて同じ親の次のステップになる。
+    開いたステップは次の step() か、親のスパンが閉じた時に閉じる。
+    """
+    if _run is None:
+        return None
+    stack = _stack()
+    # ステップではない一番内側のスパンを親にする
+    parent = next((item for item in reversed(stack) if not item.is_step), None)
+    if parent is None:
+        return None
+    # 前のステップ（とその中で開いたままのスパン）を閉じる
+    while stack[-1] is not parent:
+        _close(stack[-1])
+    _end_step(parent)
+    item = _open(name, attrs)
+    item.is_step = True
+    parent.current_step = item
+    return item
+
+
+def current_path():
+    """このスレッドで開いている一番内側のスパンのパス（例: xserver2/server/renew/captcha）。記録中でなければ None"""
+    if _run is None:
+        return None
+    stack = _stack()
+    return stack[-1].path if stack else None
+
+
+def timed(name):
+    """関数の実行時間をスパンとして記録するデコレーター"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _run is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def run(script):
+    """
+    関数（main）の1回の実行を計測し、終わったらトレースとメトリクスを書き出すデコレーター
+
+    関数が False を返すか例外を送出した場合は失敗として記録する。
+    既に計測中の場合（常駐モードから呼ばれた場合など）は、ただのスパンとして記録する。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            global _run
+            with _run_lock:
+                nested = _run is not None
+                if not nested:
+                    _run = _Run(script)
+            if nested:
+                with span(script):
+                    return func(*args, **kwargs)
+
+            current = _run
+            _local.stack = []
+            result = None
+            try:
+                with span(script) as root:
+                    current.root = root
+                    result = func(*args, **kwargs)
+                return result
+            finally:
+                current.ok = result is not False and current.root.error is None
+                with _run_lock:
+                    _run = None
+                _local.stack = []
+                write_reports(current)
+        return wrapper
+    return decorator
+
+
+def trace_events(run_data):
+    """計測結果を Chrome の Trace Event 形式（ph="X" の完了イベント）に変換する"""
+    threads = {}
+    events = []
+    for item in run_data.spans:
+        tid = threads.setdefault(item.thread, len(threads) + 1)
+        args = dict(item.attrs, path=item.path)
+        if item.error:
+            args["error"] = item.error
+        events.append({
+            "name": item.name, "cat": "step", "ph": "X", "pid": os.getpid(), "tid": tid,
+            "ts": round((item.start - run_data.origin) * 1e6, 1),
+            "dur": round(item.duration * 1e6, 1),
+            "args": args,
+        })
+    events += [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+               for name, tid in threads.items()]
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "metadata": {
+            "script": run_data.script,
+            "started_at": datetime.fromtimestamp(run_data.started_at).isoformat(timespec="seconds"),
+            "ok": run_data.ok,
+        },
+    }
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + "}"
+
+
+def _inherited(item, key):
+    """スパンか、その親のいずれかに付けた属性の値"""
+    while item is not None:
+        if key in item.attrs:
+            return item.attrs[key]
+        item = item.parent
+    return None
+
+
+def prometheus_text(run_data):
+    """
+    node_exporter の textfile collector 用のメトリクスを作る
+
+    同じ経路（と server_id）のスパンが複数回ある場合は合計する。server_id は親のスパンから引き継ぐ。
+    """
+    durations = {}
+    counts = {}
+    for item in run_data.spans:
+        key = (item.path, str(_inherited(item, "server_id") or ""))
+        durations[key] = durations.get(key, 0.0) + item.duration
+        counts[key] = counts.get(key, 0) + 1
+    total = run_data.root.duration if run_data.root else 0.0
+
+    lines = [
+        "# HELP xserver_step_duration_seconds Duration of each step in the last run.",
+        "# TYPE xserver_step_duration_seconds gauge",
+    ]
+    for (path, server_id), duration in durations.items():
+        labels = _labels(script=run_data.script, step=path, **({"server_id": server_id} if server_id else {}))
+        lines.append(f"xserver_step_duration_seconds{labels} {duration:.6f}")
+    lines += [
+        "# HELP xserver_step_count Number of times each step ran in the last run.",
+        "# TYPE xserver_step_count gauge",
+    ]
+    for (path, server_id), count in counts.items():
+        labels = _labels(script=run_data.script, step=path, **({"server_id": server_id} if server_id else {}))
+        lines.append(f"xserver_step_count{labels} {count}")
+    script = _labels(script=run_data.script)
+    lines += [
+        "# HELP xserver_run_duration_seconds Duration of the last run.",
+        "# TYPE xserver_run_duration_seconds gauge",
+        f"xserver_run_duration_seconds{script} {total:.6f}",
+        "# HELP xserver_run_success Whether the last run succeeded (1) or failed (0).",
+        "# TYPE xserver_run_success gauge",
+        f"xserver_run_success{script} {1 if run_data.ok else 0}",
+        "# HELP xserver_run_timestamp_seconds Unix time when the last run started.",
+        "# TYPE xserver_run_timestamp_seconds gauge",
+        f"xserver_run_timestamp_seconds{script} {run_data.started_at:.3f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, text):
+    # textfile collector が書きかけのファイルを読まないよう、同じディレクトリの一時ファイルから置き換える
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".xserver_timing_", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_reports(run_data, trace_file=None, textfile=None):
+    """JSON トレースとメトリクスを書き出す（失敗しても更新処理には影響させない）"""
+    trace_file = TRACE_FILE if trace_file is None else trace_file
+    textfile = PROMETHEUS_TEXTFILE if textfile is None else textfile
+    if not run_data.spans:
+        return
+    try:
+        if trace_file:
+            _write_atomic(trace_file, json.dumps(trace_events(run_data), ensure_ascii=False, indent=1))
+            print(f"⏱️  ステップごとの時間を保存しました: {trace_file}")
+        if textfile:
+            _write_atomic(textfile, prometheus_text(run_data))
+    except OSError as e:
+        print(f"⚠️  計測結果の保存に失敗しました: {e}")
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+browser_session（クッキーの保存・読み込みとセッションの再利用）のテスト
+
+Chrome は起動せず、必要な操作だけを持つ偽の driver で確かめる。
+"""
+
+import json
+import os
+import stat
+import time
+
+import pytest
+
+pytest.importorskip("selenium")
+
+from selenium.common.exceptions import NoSuchElementException  # noqa: E402
+from selenium.webdriver.common.by import By  # noqa: E402
+
+import browser_session  # noqa: E402
+import lean_navigation  # noqa: E402
+
+LOGIN_FORM = (By.NAME, "memberid")
+EXPIRY_ROW = (By.XPATH, "//*[contains(text(), '利用期限')]")
+
+
+class _FakeElement:
+    text = ""
+
+    def is_displayed(self):
+        return True
+
+
+class _FakeDriver:
+    """URL ごとに表示される要素（ロケーター）を決めておく driver"""
+
+    def __init__(self, pages=None, cookies=None, popups=True):
+        self.pages = pages or {}
+        self.cookies = cookies or []
+        self.popups = popups
+        self.commands = []
+        self.targets = []      # (タブ, そのタブのURL, DevTools のコマンド)
+        self.windows = {"main": ""}
+        self.current_window_handle = "main"
+        self.switch_to = self
+
+    @property
+    def current_url(self):
+        return self.windows[self.current_window_handle]
+
+    @property
+    def window_handles(self):
+        return list(self.windows)
+
+    def window(self, handle):
+        self.current_window_handle = handle
+
+    def close(self):
+        del self.windows[self.current_window_handle]
+
+    def get(self, url):
+        self.windows[self.current_window_handle] = url
+
+    def execute_script(self, script, *args):
+        if "window.open" in script and self.popups:
+            self.windows[f"tab{len(self.windows)}"] = args[0]
+        elif "location.href" in script:
+            self.windows[self.current_window_handle] = args[0]
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append((command, params))
+        self.targets.append((self.current_window_handle, self.current_url, command))
+        return {}
+
+    def get_cookies(self):
+        return self.cookies
+
+    def find_element(self, by, value):
+        if (by, value) in self.pages.get(self.current_url, ()):
+            return _FakeElement()
+        raise NoSuchElementException(value)
+
+    def find_elements(self, by, value):
+        return [_FakeElement()] if (by, value) in self.pages.get(self.current_url, ()) else []
+
+
+@pytest.fixture
+def cookie_jar(tmp_path, monkeypatch):
+    path = tmp_path / "cookies.json"
+    monkeypatch.setattr(browser_session, "COOKIE_JAR", str(path))
+    monkeypatch.setattr(browser_session, "CHROME_PROFILE_DIR", None)
+    return path
+
+
+def test_cookies_are_saved_privately_and_atomically(cookie_jar):
+    """本人だけが読めるファイルに保存し、一時ファイルを残さない"""
+    cookies = [{"name": "session", "value": "abc", "domain": "secure.xserver.ne.jp", "path": "/"}]
+
+    browser_session.save_cookies(_FakeDriver(cookies=cookies))
+
+    assert json.loads(cookie_jar.read_text(encoding="utf-8")) == cookies
+    assert stat.S_IMODE(os.stat(cookie_jar).st_mode) == 0o600
+    assert os.listdir(cookie_jar.parent) == [cookie_jar.name]
+
+
+def test_failed_save_keeps_the_old_jar_and_removes_the_temporary_file(cookie_jar):
+    """書き込みに失敗しても、前回のクッキーはそのままで一時ファイルも残らない"""
+    cookie_jar.write_text("[]", encoding="utf-8")
+
+    browser_session.save_cookies(_FakeDriver(cookies=[{"name": "session", "value": object()}]))
+
+    assert cookie_jar.read_text(encoding="utf-8") == "[]"
+    assert os.listdir(cookie_jar.parent) == [cookie_jar.name]
+
+
+def test_saved_cookies_are_loaded_through_devtools(cookie_jar):
+    """保存したクッキーをページ遷移なしで DevTools から設定する（expiry は expires として渡す）"""
+    cookie_jar.write_text(json.dumps([{"name": "session", "value": "abc", "domain": "secure.xserver.ne.jp",
+                                       "path": "/", "expiry": 1893456000, "size": 10}]), encoding="utf-8")
+    driver = _FakeDriver()
+
+    assert browser_session.load_cookies(driver)
+    assert driver.commands == [("Network.setCookie", {"name": "session", "value": "abc",
+                                                      "domain": "secure.xserver.ne.jp", "path": "/",
+                                                      "expires": 1893456000})]
+    assert not browser_session.load_cookies(driver, str(cookie_jar.parent / "missing.json"))
+
+
+@pytest.mark.parametrize("shown, resumed", [
+    ({EXPIRY_ROW}, True),
+    ({LOGIN_FORM}, False),
+    ({LOGIN_FORM, EXPIRY_ROW}, False),     # 同時に成立した場合はログインフォームを優先する
+])
+def test_resume_session_returns_as_soon_as_either_page_appears(cookie_jar, shown, resumed):
+    """詳細ページ（利用期限）とログインフォームのどちらかが表示された時点で判定する"""
+    driver = _FakeDriver({browser_session.detail_url("1"): shown})
+
+    started = time.perf_counter()
+    assert browser_session.resume_session(driver, "1", timeout=5) is resumed
+    assert time.perf_counter() - started < 1.0
+
+
+def test_resume_session_times_out_to_login(cookie_jar):
+    """どちらも表示されなければ、タイムアウト後にログインへ進む"""
+    assert browser_session.resume_session(_FakeDriver(), "1", timeout=0.3) is False
+
+
+def test_blocked_tabs_are_read_in_the_main_tab():
+    """別タブを開けなかったサーバーは、メインのタブで読み取る"""
+    pages = {browser_session.detail_url(server_id): {EXPIRY_ROW} for server_id in ("1", "2")}
+    driver = _FakeDriver(pages, popups=False)
+
+    expiries = browser_session.read_expiries(driver, ["1", "2"], lambda driver, server_id: driver.current_url,
+                                             concurrent=True, timeout=1)
+
+    assert expiries == {server_id: browser_session.detail_url(server_id) for server_id in ("1", "2")}
+    assert driver.window_handles == ["main"]
+
+
+def test_lean_mode_blocks_urls_in_every_tab_before_it_loads(monkeypatch):
+    """ブロックリストはタブごとの設定のため、同時読み込みの各タブにも読み込み前に設定する"""
+    monkeypatch.setattr(lean_navigation, "ENABLED", True)
+    pages = {browser_session.detail_url(server_id): {EXPIRY_ROW} for server_id in ("1", "2")}
+    driver = _FakeDriver(pages)
+
+    expiries = browser_session.read_expiries(driver, ["1", "2"], lambda driver, server_id: driver.current_url,
+                                             concurrent=True, timeout=1)
+
+    assert expiries == {server_id: browser_session.detail_url(server_id) for server_id in ("1", "2")}
+    blocked = [(window, url) for window, url, command in driver.targets if command == "Network.setBlockedURLs"]
+    assert blocked == [("tab1", "about:blank"), ("tab2", "about:blank")]
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+captcha_answer（回答の検証とストリーミング応答からの検出）のテスト
+"""
+
+import sys
+import time
+
+from captcha_answer import DigitStream, best_decode, decode_digits, is_valid_code
+from claude_code_integration import _stream_cancellable
+
+
+def _feed_all(chunks):
+    parser = DigitStream()
+    for chunk in chunks:
+        if parser.feed(chunk):
+            return parser.answer, True
+    return parser.close(), False
+
+
+def test_answer_is_confirmed_once_the_digits_are_delimited():
+    """6桁の後に区切りが届いた時点で確定し、以降の出力は不要になる"""
+    answer, early = _feed_all(["12", "34", "56", "\n", "以上です"])
+
+    assert answer == "123456"
+    assert early
+
+
+def test_hiragana_readings_are_converted_across_chunks():
+    """ひらがなの読みがチャンクの境目で分かれても数字として読む"""
+    answer, _ = _feed_all(["さんろくき", "ゅうにいち", "はち"])
+
+    assert answer == "369218"
+
+
+def test_trailing_digits_wait_for_the_end_of_the_stream():
+    """末尾の数字は続きがあるかもしれないため、ストリームの終わりまで確定しない"""
+    parser = DigitStream()
+
+    assert parser.feed("123456") is None
+    assert parser.close() == "123456"
+
+
+def test_seven_digits_are_rejected():
+    """6桁でない数字の並びは回答にしない"""
+    answer, _ = _feed_all(["1234567", "\n"])
+
+    assert answer is None
+    assert not is_valid_code("12345a")
+
+
+def test_decode_digits_reads_hiragana_and_fullwidth_digits():
+    """ひらがなの読み・全角数字・区切り記号が混ざっていても数字に変換する"""
+    assert decode_digits("しち よん ご-ろく に いち") == ("745621", 0)
+    assert decode_digits("れいいち２３よんご") == ("012345", 0)
+    assert decode_digits("さん・ろく・きゅう・に・いち・はち") == ("369218", 0)
+
+
+def test_decode_digits_counts_skipped_characters():
+    """読みにならない文字は読み飛ばし、その数を返す"""
+    assert decode_digits("「さん」ろくきゅう?にいち。はち") == ("369218", 4)
+
+
+def test_best_decode_prefers_six_digits():
+    """候補の中から6桁になるものを選ぶ"""
+    best = best_decode(["さんろく", "", "さんろくきゅうにいちはち"])
+
+    assert best["text"] == "369218"
+    assert best["index"] == 2
+    assert best_decode([])["text"] == ""
+
+
+def test_stream_stops_cli_once_the_answer_arrives():
+    """CLI の出力で6桁が揃ったら、終了を待たずに子プロセスを終了させる"""
+    parser = DigitStream()
+    child = "import sys, time; print('654321', flush=True); time.sleep(30)"
+    started = time.perf_counter()
+
+    returncode, stdout, _ = _stream_cancellable([sys.executable, "-c", child], parser.feed, timeout=30)
+
+    assert returncode is None
+    assert parser.answer == "654321"
+    assert time.perf_counter() - started < 5.0
+
+
+def test_answer_followed_by_japanese_prose():
+    """回答の後に続く文のひらがな（「になります」の「に」など）を7桁目として読まない"""
+    assert _feed_all(["369218 になります"]) == ("369218", True)
+    assert _feed_all(["答えは", "369218", "になります"]) == ("369218", True)
+    assert _feed_all(["369218です"]) == ("369218", True)
+
+
+def test_digits_split_by_spaces_are_joined_at_the_end():
+    """空白で分かれた半角数字は、ストリームの終わりでつなげて6桁なら回答にする（文中の読みはつなげない）"""
+    assert _feed_all(["369 218"]) == ("369218", False)
+    assert _feed_all(["12345 になります"]) == (None, False)
+
+
+def test_decode_digits_prefers_six_digits_over_fewer_skips():
+    """最長一致で7桁になる場合は、1文字読み飛ばしてでも6桁になる区切り方を選ぶ"""
+    assert decode_digits("369218 になります") == ("369218", 5)
+    assert decode_digits("さんろくきゅうにいちはちご") == ("369218", 1)
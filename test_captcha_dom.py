@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+captcha_dom（1回の execute_script による画像認証の要素の探索）のテスト
+"""
+
+import os
+
+import captcha_dom
+import renewal_state
+
+
+def _candidate(name, selectors=(), visible=True, width=300, height=80, src=""):
+    return {"element": name, "selectors": list(selectors), "visible": visible,
+            "rect": {"x": 10, "y": 20, "width": width, "height": height},
+            "tag": "img", "src": src, "alt": "", "name": "", "id": ""}
+
+
+class _FakeDriver:
+    """execute_script の呼び出しを記録し、用意した探索結果を返す"""
+
+    def __init__(self, result):
+        self.result = result
+        self.scripts = []
+
+    def execute_script(self, script, *args):
+        self.scripts.append((script, args))
+        return self.result
+
+
+def test_probe_is_a_single_round_trip():
+    """案内文・画像・入力欄を1回の execute_script で集める"""
+    driver = _FakeDriver({"message": True, "candidates": {"image": [], "input": []}})
+
+    probed = captcha_dom.probe(driver, "画像認証を行ってください")
+
+    assert probed["message"] is True
+    assert len(driver.scripts) == 1
+    roles, message_xpath = driver.scripts[0][1]
+    assert roles["image"][0] == captcha_dom.IMAGE_SELECTORS
+    assert "画像認証を行ってください" in message_xpath
+
+
+def test_pick_follows_selector_order_and_skips_hidden():
+    """表示されている候補のうち、優先順の高いセレクタに一致したものを選ぶ"""
+    image, canvas, hidden = captcha_dom.IMAGE_SELECTORS[5], captcha_dom.IMAGE_SELECTORS[3], captcha_dom.IMAGE_SELECTORS[0]
+    probed = {"candidates": {"image": [
+        _candidate("logo", [image]),
+        _candidate("canvas", [canvas]),
+        _candidate("hidden", [hidden], visible=False),
+    ]}}
+
+    picked = captcha_dom.pick(probed, "image")
+
+    assert picked["element"] == "canvas"
+    assert picked["selector"] == canvas
+
+
+def test_pick_prefers_the_remembered_selector():
+    """前回通過したセレクタに一致する候補があれば最初に採用する"""
+    first, remembered = captcha_dom.INPUT_SELECTORS[0], captcha_dom.INPUT_SELECTORS[1]
+    probed = {"candidates": {"input": [
+        _candidate("search", [first]),
+        _candidate("captcha", [first, remembered]),
+    ]}}
+
+    assert captcha_dom.pick(probed, "input")["element"] == "search"
+    picked = captcha_dom.pick(probed, "input", remembered)
+    assert picked["element"] == "captcha"
+    assert picked["selector"] == remembered
+
+
+def test_pick_falls_back_to_unmatched_images():
+    """どのセレクタにも一致しなければ、src のキーワード → 最大の画像 の順で推定する"""
+    probed = {"candidates": {"image": [
+        _candidate("icon", height=16, width=16),
+        _candidate("banner", width=600, height=120, src="/banner.png"),
+        _candidate("small", width=200, height=60, src="/img/security.png"),
+    ]}}
+    assert captcha_dom.pick(probed, "image")["element"] == "small"
+
+    probed["candidates"]["image"].pop()
+    picked = captcha_dom.pick(probed, "image")
+    assert picked["element"] == "banner"
+    assert picked["selector"] is None
+
+    assert captcha_dom.pick({"candidates": {"image": []}}, "image") is None
+
+
+def test_selectors_are_remembered_in_the_state_file(tmp_path):
+    """通過したセレクタを保存し、変わっていなければ書き込まない"""
+    path = str(tmp_path / "state.json")
+    selector = captcha_dom.IMAGE_SELECTORS[6]
+
+    renewal_state.record_selectors({"image": selector, "input": None}, path)
+    assert renewal_state.get_selectors(path) == {"image": selector}
+
+    modified = os.path.getmtime(path)
+    os.utime(path, (modified - 10, modified - 10))
+    renewal_state.record_selectors({"image": selector}, path)
+    assert os.path.getmtime(path) == modified - 10
+
+
+def test_submit_button_is_probed_in_the_same_round_trip():
+    """送信ボタンも同じ1回の探索で集め、セレクタに一致したものだけを選ぶ（推定はしない）"""
+    driver = _FakeDriver({"message": True, "candidates": {"image": [], "input": [], "submit": []}})
+
+    probed = captcha_dom.probe(driver, "画像認証を行ってください")
+
+    roles, _ = driver.scripts[0][1]
+    assert roles["submit"] == [captcha_dom.SUBMIT_SELECTORS, None]
+    assert captcha_dom.pick(probed, "submit") is None
+
+    send = captcha_dom.SUBMIT_SELECTORS[0]
+    probed = {"candidates": {"submit": [_candidate("hidden", [send], visible=False), _candidate("send", [send])]}}
+    picked = captcha_dom.pick(probed, "submit")
+    assert picked["element"] == "send" and picked["selector"] == send
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+xserver2.py と solve_captcha.py の間の解答受け渡しのテスト
+"""
+
+import socket
+import threading
+import time
+
+import captcha_handoff
+import solve_captcha
+from captcha_handoff import SolutionClient, SolutionWaiter, write_solution_file
+
+
+def _waiter(tmp_path):
+    # ポート0で空いているポートを使う
+    return SolutionWaiter(tmp_path / "captcha_cropped.png", solution_file=tmp_path / "captcha_solution.txt", port=0)
+
+
+def test_socket_pushes_image_and_wakes_immediately(tmp_path):
+    """先に起動した解答側に画像のパスが送られ、解答は受信した瞬間に返る"""
+    with _waiter(tmp_path) as waiter:
+        received = {}
+
+        def solver():
+            client = SolutionClient(*waiter.address)
+            received["image"] = client.wait_for_captcha(timeout=5)
+            received["sent_at"] = time.monotonic()
+            received["accepted"] = client.submit("123456")
+
+        thread = threading.Thread(target=solver)
+        thread.start()
+        solution = waiter.wait(timeout=5)
+        woke_at = time.monotonic()
+        thread.join(timeout=5)
+
+    assert solution == "123456"
+    assert received["image"] == str(tmp_path / "captcha_cropped.png")
+    assert received["accepted"] is True
+    assert woke_at - received["sent_at"] < captcha_handoff.FILE_POLL
+
+
+def test_invalid_answer_is_rejected_and_can_be_retried(tmp_path):
+    with _waiter(tmp_path) as waiter:
+        results = []
+
+        def solver():
+            client = SolutionClient(*waiter.address)
+            client.wait_for_captcha(timeout=5)
+            results.append(client.submit("12345"))
+            results.append(client.submit("654321"))
+
+        thread = threading.Thread(target=solver)
+        thread.start()
+        solution = waiter.wait(timeout=5)
+        thread.join(timeout=5)
+
+    assert solution == "654321"
+    assert results == [False, True]
+
+
+def test_solution_file_fallback(tmp_path):
+    """ソケットを使わない場合も、原子的に書き出された解答ファイルを受け取る"""
+    (tmp_path / "captcha_solution.txt").write_text("999999")   # 前回の残り
+    with _waiter(tmp_path) as waiter:
+        assert not (tmp_path / "captcha_solution.txt").exists()
+        timer = threading.Timer(0.1, write_solution_file, args=("314159", tmp_path / "captcha_solution.txt"))
+        timer.start()
+        solution = waiter.wait(timeout=5)
+        timer.join()
+
+    assert solution == "314159"
+    assert not (tmp_path / "captcha_solution.txt").exists()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_wait_times_out(tmp_path):
+    with _waiter(tmp_path) as waiter:
+        assert waiter.wait(timeout=0.3) is None
+
+
+def test_silent_port_owner_does_not_hang(monkeypatch):
+    """接続できても何も送られてこない（別のプロセスがポートを使っている）場合は、止まらずに None を返す"""
+    monkeypatch.setattr(captcha_handoff, "REPLY_TIMEOUT", 0.2)
+    with socket.socket() as squatter:
+        squatter.bind(("127.0.0.1", 0))
+        squatter.listen()
+        client = SolutionClient(*squatter.getsockname())
+
+        started = time.monotonic()
+        assert client.wait_for_captcha() is None
+        assert time.monotonic() - started < 2.0
+        assert client.submit("123456") is False
+
+
+def test_solve_captcha_stops_without_an_image(monkeypatch, capsys):
+    """画像のパスを受け取れなければ、前回の画像を案内して回答を求めずに終了する"""
+    class _NoCaptchaClient:
+        def wait_for_captcha(self):
+            return None
+
+    def _unexpected_input(prompt=""):
+        raise AssertionError("回答を求めてはいけません")
+
+    monkeypatch.setattr(solve_captcha, "SolutionClient", _NoCaptchaClient)
+    monkeypatch.setattr("builtins.input", _unexpected_input)
+
+    solve_captcha.main()
+
+    output = capsys.readouterr().out
+    assert "受け取れませんでした" in output
+    assert "captcha_cropped.png" not in output
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+captcha_image（画像認証の画像のメモリ上での受け渡し）のテスト
+"""
+
+import os
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+import captcha_image  # noqa: E402
+
+
+def _captcha(width=400, height=120):
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+    cv2.putText(image, "123456", (60, 80), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
+    return image
+
+
+def test_png_round_trip_keeps_pixels():
+    """encode_png → decode_png で同じ配列に戻る（PNG は可逆）"""
+    image = _captcha()
+
+    decoded = captcha_image.decode_png(captcha_image.encode_png(image))
+
+    assert decoded.shape == image.shape
+    assert np.array_equal(decoded, image)
+
+
+def test_decode_png_returns_none_for_broken_bytes():
+    """PNG でないバイト列は None"""
+    assert captcha_image.decode_png(b"not a png") is None
+
+
+def test_crop_is_a_view_within_the_bounds():
+    """切り取りは配列のスライス（コピーしない）で、範囲外は画像の端で止まる"""
+    image = _captcha()
+
+    cropped = captcha_image.crop_image(image, 10, 20, 110, 70)
+    assert cropped.shape == (50, 100, 3)
+    assert np.shares_memory(cropped, image)
+
+    clipped = captcha_image.crop_image(image, 350, 100, 1000, 1000)
+    assert clipped.shape == (20, 50, 3)
+
+
+def test_prepare_for_vision_trims_and_shrinks():
+    """グレースケールにし、文字の周りの余白を切り詰めて max_height 以下に縮小する"""
+    image = _captcha(width=800, height=300)
+
+    png = captcha_image.prepare_for_vision(image, max_height=40)
+    prepared = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_UNCHANGED)
+
+    assert prepared.ndim == 2
+    assert prepared.shape[0] <= 40
+    assert prepared.shape[1] < image.shape[1]
+
+
+def test_write_image_file_uses_a_unique_temporary_file():
+    """パスを省略すると実行ごとに一意な一時ファイルに書き出す（削除は呼び出し側）"""
+    image = _captcha()
+    first = captcha_image.write_image_file(image)
+    second = captcha_image.write_image_file(image)
+    try:
+        assert first != second
+        assert captcha_image.RUN_ID in os.path.basename(first)
+        assert np.array_equal(cv2.imread(first), image)
+    finally:
+        os.remove(first)
+        os.remove(second)
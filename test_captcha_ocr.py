@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+captcha_ocr の共有リーダーレジストリとバリエーション評価のテスト（easyocr はダミーに差し替え）
+"""
+
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import captcha_ocr
+
+
+class _FakeReader:
+    created = 0
+
+    def __init__(self, languages, gpu=False):
+        _FakeReader.created += 1
+        self.languages = languages
+        self.gpu = gpu
+
+
+def _install_fake_easyocr(monkeypatch, reader_cls=_FakeReader):
+    fake = types.ModuleType("easyocr")
+    fake.Reader = reader_cls
+    monkeypatch.setitem(sys.modules, "easyocr", fake)
+    monkeypatch.setattr(captcha_ocr, "_entries", {})
+    _FakeReader.created = 0
+
+
+def test_reader_is_built_once_and_shared(monkeypatch):
+    """プリロード後の get_reader は同じインスタンスを返す"""
+    _install_fake_easyocr(monkeypatch)
+
+    captcha_ocr.preload_reader(['ja', 'en'])
+    first = captcha_ocr.get_reader(['ja', 'en'], timeout=5)
+    second = captcha_ocr.get_reader(['ja', 'en'], timeout=5)
+
+    assert first is second
+    assert first.languages == ['ja', 'en']
+    assert _FakeReader.created == 1
+
+
+def test_get_reader_waits_for_background_load(monkeypatch):
+    """読み込み中に get_reader を呼ぶと完了まで待機する"""
+    release = threading.Event()
+
+    class _SlowReader(_FakeReader):
+        def __init__(self, languages, gpu=False):
+            release.wait(5)
+            super().__init__(languages, gpu)
+
+    _install_fake_easyocr(monkeypatch, _SlowReader)
+
+    captcha_ocr.preload_reader(['ja'])
+    with pytest.raises(TimeoutError):
+        captcha_ocr.get_reader(['ja'], timeout=0.05)
+
+    release.set()
+    reader = captcha_ocr.get_reader(['ja'], timeout=5)
+    assert reader.languages == ['ja']
+    assert _FakeReader.created == 1
+
+
+def test_load_error_is_raised_to_caller(monkeypatch):
+    """モデルの読み込み失敗は get_reader の呼び出し元に伝わる"""
+    def _broken_reader(languages, gpu=False):
+        raise RuntimeError("weights not found")
+
+    _install_fake_easyocr(monkeypatch, _broken_reader)
+
+    with pytest.raises(RuntimeError, match="weights not found"):
+        captcha_ocr.get_reader(['ja'], timeout=5)
+
+
+class _ScriptedReader:
+    """画像（ここでは名前文字列）ごとに決まった readtext 結果を返すダミー"""
+
+    def __init__(self, outputs, delays=None):
+        self.outputs = outputs
+        self.delays = delays or {}
+        self.calls = []
+
+    def readtext(self, image, detail=1, paragraph=False):
+        self.calls.append(image)
+        time.sleep(self.delays.get(image, 0))
+        return self.outputs[image]
+
+
+def test_evaluate_variants_picks_six_digit_result():
+    """6桁に最も近く信頼度の高いバリエーションが選ばれる"""
+    reader = _ScriptedReader({
+        "otsu": [(None, "12", 0.9)],
+        "mean": [(None, "123456", 0.4)],
+        "fixed": [(None, "1234567", 0.95)],
+    })
+    variants = [("OTSU", "otsu"), ("MEAN", "mean"), ("FIXED", "fixed")]
+
+    result = captcha_ocr.evaluate_variants(reader, variants, lambda text: text,
+                                           confidence_floor=0.9)
+
+    assert result["text"] == "123456"
+    assert result["variant"] == "MEAN"
+    assert set(result["latencies"]) == {"OTSU", "MEAN", "FIXED"}
+
+
+def test_evaluate_variants_stops_after_confident_result():
+    """信頼度の高い6桁の結果が出たら、未開始のバリエーションは評価しない"""
+    reader = _ScriptedReader({
+        "fast": [(None, "654321", 0.9)],
+        "slow": [(None, "000000", 0.9)],
+        "queued": [(None, "111111", 0.9)],
+    }, delays={"slow": 0.3})
+    variants = [("FAST", "fast"), ("SLOW", "slow"), ("QUEUED", "queued")]
+
+    started = time.perf_counter()
+    result = captcha_ocr.evaluate_variants(reader, variants, lambda text: text, max_workers=2)
+
+    assert result["text"] == "654321"
+    assert time.perf_counter() - started < 0.3
+    assert "QUEUED" not in result["latencies"]
+
+
+def test_evaluate_variants_runs_all_variants_at_once_up_to_the_cpu_count(monkeypatch):
+    """並列数を指定しなければ全てのバリエーションを同時にOCRする（CPU 数を超える分だけ後から始める）"""
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    class _CountingReader(_ScriptedReader):
+        def readtext(self, image, detail=1, paragraph=False):
+            with lock:
+                active.append(image)
+                peak.append(len(active))
+            try:
+                return super().readtext(image, detail, paragraph)
+            finally:
+                with lock:
+                    active.remove(image)
+
+    names = ["a", "b", "c", "d", "e"]
+    variants = [(name.upper(), name) for name in names]
+    outputs = {name: [(None, "12", 0.9)] for name in names}
+
+    for cpus, expected in ((8, 5), (2, 2)):
+        monkeypatch.setattr(captcha_ocr.os, "cpu_count", lambda: cpus)
+        peak.clear()
+        reader = _CountingReader(outputs, delays={name: 0.1 for name in names})
+
+        result = captcha_ocr.evaluate_variants(reader, variants, lambda text: text)
+
+        assert result["text"] == "12"
+        assert max(peak) == expected
+
+
+def test_evaluate_variants_filters_low_confidence_segments():
+    """segment_confidence 以下のOCR断片は結合しない"""
+    reader = _ScriptedReader({"img": [(None, "123", 0.8), (None, "x", 0.1), (None, "456", 0.6)]})
+
+    result = captcha_ocr.evaluate_variants(reader, [("IMG", "img")], lambda text: text,
+                                           segment_confidence=0.2)
+
+    assert result["raw_text"] == "123456"
+    assert abs(result["confidence"] - 0.7) < 1e-9
+
+
+def test_evaluate_variants_falls_back_to_all_segments():
+    """信頼度の低い断片を除くと6桁にならない場合は、全ての断片をつなげた読みを使う"""
+    reader = _ScriptedReader({"img": [(None, "123", 0.8), (None, "4", 0.1), (None, "56", 0.6)]})
+
+    result = captcha_ocr.evaluate_variants(reader, [("IMG", "img")], lambda text: text,
+                                           segment_confidence=0.2)
+
+    assert result["text"] == "123456"
+    assert abs(result["confidence"] - 0.5) < 1e-9
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+captcha_race（ソルバーのレースモード）のテスト
+"""
+
+import sys
+import threading
+import time
+
+import captcha_race
+from claude_code_integration import _run_cancellable
+
+
+def _solver(answer, delay):
+    def solve(cancel_event):
+        cancel_event.wait(delay)
+        return None if cancel_event.is_set() else answer
+    return solve
+
+
+def test_fastest_valid_answer_wins():
+    """最初に返った有効な回答を採用し、合計ではなく最速のソルバーの時間で戻る"""
+    started = time.perf_counter()
+    result = captcha_race.race_solvers([
+        ("slow", _solver("111111", 5.0)),
+        ("fast", _solver("222222", 0.05)),
+    ])
+
+    assert result["text"] == "222222"
+    assert result["solver"] == "fast"
+    assert time.perf_counter() - started < 2.0
+
+
+def test_invalid_answers_are_skipped():
+    """6桁の数字でない回答は採用せず、次に返った有効な回答を待つ"""
+    result = captcha_race.race_solvers([
+        ("short", _solver("123", 0.01)),
+        ("valid", _solver("654321", 0.1)),
+    ])
+
+    assert result["text"] == "654321"
+    assert result["solver"] == "valid"
+    assert set(result["latencies"]) == {"short", "valid"}
+
+
+def test_losers_are_cancelled():
+    """勝者が決まったら残りのソルバーにキャンセルが通知される"""
+    cancelled = threading.Event()
+
+    def loser(cancel_event):
+        cancel_event.wait(5.0)
+        if cancel_event.is_set():
+            cancelled.set()
+        return None
+
+    captcha_race.race_solvers([("loser", loser), ("winner", _solver("000000", 0.01))])
+
+    assert cancelled.wait(1.0)
+
+
+def test_no_valid_answer_returns_none():
+    """どのソルバーも解けなければ text は None"""
+    result = captcha_race.race_solvers([("ocr", _solver("", 0.01))], timeout=1)
+
+    assert result["text"] is None
+    assert result["solver"] is None
+
+
+def test_run_cancellable_kills_child_process():
+    """キャンセルされたら子プロセスを終了させて None を返す"""
+    cancel_event = threading.Event()
+    threading.Timer(0.3, cancel_event.set).start()
+    started = time.perf_counter()
+
+    result = _run_cancellable([sys.executable, "-c", "import time; time.sleep(30)"],
+                              timeout=30, cancel_event=cancel_event)
+
+    assert result is None
+    assert time.perf_counter() - started < 5.0
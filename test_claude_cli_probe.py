@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Claude Code CLI の利用可否確認（キャッシュ）のテスト
+"""
+
+import os
+import stat
+
+import claude_code_integration as integration
+
+
+def _install_fake_claude(tmp_path, monkeypatch):
+    """呼ばれた回数を記録する偽の claude コマンドを PATH の先頭に置く"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    calls = tmp_path / "calls.txt"
+    claude = bin_dir / "claude"
+    claude.write_text(f"#!/bin/sh\necho probe >> '{calls}'\necho '1.0.0 (Claude Code)'\n")
+    claude.chmod(claude.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+    monkeypatch.setattr(integration, "PROBE_CACHE_FILE", str(tmp_path / "probe.json"))
+    monkeypatch.setattr(integration, "_probe_results", {})
+    monkeypatch.setattr(integration, "_integration", None)
+    return claude, calls
+
+
+def _probe_count(calls):
+    return len(calls.read_text().splitlines()) if calls.exists() else 0
+
+
+def test_probe_runs_once_per_process(tmp_path, monkeypatch):
+    """同じプロセスでは何度インスタンスを作っても `claude --version` は1回だけ"""
+    _, calls = _install_fake_claude(tmp_path, monkeypatch)
+
+    assert integration.ClaudeCodeIntegration().claude_available
+    assert integration.ClaudeCodeIntegration().claude_available
+    assert integration.get_integration() is integration.get_integration()
+    assert _probe_count(calls) == 1
+
+
+def test_disk_cache_is_reused_until_the_binary_changes(tmp_path, monkeypatch):
+    """別プロセスではディスクのキャッシュを使い、CLI が更新されたら確認し直す"""
+    claude, calls = _install_fake_claude(tmp_path, monkeypatch)
+    assert integration.check_claude_availability()
+
+    monkeypatch.setattr(integration, "_probe_results", {})   # 新しいプロセスを想定
+    assert integration.check_claude_availability()
+    assert _probe_count(calls) == 1
+
+    monkeypatch.setattr(integration, "_probe_results", {})
+    mtime = claude.stat().st_mtime + 10
+    os.utime(claude, (mtime, mtime))                           # CLI の更新を想定
+    assert integration.check_claude_availability()
+    assert _probe_count(calls) == 2
+
+
+def test_expired_cache_is_ignored(tmp_path, monkeypatch):
+    """有効期限が切れたキャッシュは使わない"""
+    _, calls = _install_fake_claude(tmp_path, monkeypatch)
+    assert integration.check_claude_availability()
+
+    monkeypatch.setattr(integration, "_probe_results", {})
+    monkeypatch.setattr(integration, "PROBE_TTL", -1)
+    assert integration.check_claude_availability()
+    assert _probe_count(calls) == 2
+
+
+def test_missing_cli_is_unavailable_without_spawning(tmp_path, monkeypatch):
+    """PATH に claude がなければプロセスを起動せずに利用不可とする"""
+    monkeypatch.setenv("PATH", str(tmp_path))
+    monkeypatch.setattr(integration, "_probe_results", {})
+
+    assert not integration.check_claude_availability()
+
+
+def test_cache_is_saved_outside_the_working_directory(tmp_path, monkeypatch):
+    """キャッシュは作業ディレクトリではなくキャッシュディレクトリに保存し、なければ作る"""
+    assert os.path.dirname(os.path.abspath(integration.PROBE_CACHE_FILE)) != os.getcwd()
+
+    path = tmp_path / "cache" / "xservervps" / "probe.json"
+    integration._save_probe_cache(("/usr/bin/claude", 1.0), True, str(path))
+
+    assert integration._load_probe_cache(("/usr/bin/claude", 1.0), str(path)) is True
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+claude_vision（Claude API クライアント）と fake_claude_api（ローカル代替サーバー）のテスト
+"""
+
+import base64
+import http.client
+import json
+
+import pytest
+
+import claude_vision
+from fake_claude_api import FakeClaudeAPI
+
+
+def _post(connection, body):
+    connection.request("POST", "/v1/messages", body=json.dumps(body),
+                       headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_fake_api_answers_and_counts_connections():
+    """代替サーバーは messages 形式で回答し、同じ接続での複数リクエストを1接続として数える"""
+    with FakeClaudeAPI(answer="654321") as api:
+        host, port = api.base_url.rsplit("/", 1)[-1].split(":")
+        connection = http.client.HTTPConnection(host, int(port))
+        for _ in range(3):
+            status, data = _post(connection, {"model": "fake", "max_tokens": 16, "messages": []})
+            assert status == 200
+            assert data["content"][0]["text"] == "654321"
+        connection.close()
+
+        assert api.connections == 1
+        assert len(api.requests) == 3
+        assert api.requests[0]["max_tokens"] == 16
+
+
+def test_read_captcha_reuses_one_connection(monkeypatch):
+    """共有クライアントで接続を使い回し、小さなグレースケール画像と少ない max_tokens を送る"""
+    pytest.importorskip("anthropic")
+    cv2 = pytest.importorskip("cv2")
+    np = pytest.importorskip("numpy")
+    monkeypatch.setattr(claude_vision, "_clients", {})
+
+    image = np.full((120, 400, 3), 255, dtype=np.uint8)
+    cv2.putText(image, "123456", (60, 80), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
+
+    with FakeClaudeAPI(answer="123456") as api:
+        results = [claude_vision.read_captcha(image, api_key="test", base_url=api.base_url) for _ in range(3)]
+
+        assert [result["text"] for result in results] == ["123456"] * 3
+        assert api.connections == 1
+        assert api.requests[0]["max_tokens"] <= claude_vision.MAX_TOKENS
+
+    source = api.requests[0]["messages"][0]["content"][0]["source"]
+    sent = cv2.imdecode(np.frombuffer(base64.b64decode(source["data"]), np.uint8), cv2.IMREAD_UNCHANGED)
+    assert sent.ndim == 2                      # グレースケール
+    assert sent.shape[0] <= 80                 # 縮小済み
+    assert sent.shape[1] < image.shape[1]      # 余白を切り詰め済み
+
+
+def test_streaming_closes_once_six_digits_arrive(monkeypatch):
+    """ストリーミングでは6桁が揃った時点で読み込みを打ち切り、残りの出力を待たない"""
+    pytest.importorskip("anthropic")
+    np = pytest.importorskip("numpy")
+    monkeypatch.setattr(claude_vision, "_clients", {})
+    image = np.full((60, 200, 3), 255, dtype=np.uint8)
+    image[20:40, 50:150] = 0
+
+    with FakeClaudeAPI(answer="123456", tail="\n" + "説明" * 50, chunk_delay=0.05) as api:
+        result = claude_vision.read_captcha(image, api_key="test", base_url=api.base_url, stream=True)
+
+    assert result["answer"] == "123456"
+    assert result["early"]
+    assert result["elapsed"] < 2.0   # 説明文を全部受け取ると 0.05秒 × 50イベント以上かかる
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+driver_pool（起動済みの Chrome の使い回し）のテスト
+"""
+
+import threading
+
+import driver_pool
+
+
+class _FakeDriver:
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.quit_count = 0
+        self.window_handles = ["main"]
+        self.visited = []
+        self.switch_to = self
+
+    def window(self, handle):
+        pass
+
+    def close(self):
+        self.window_handles.pop()
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise ConnectionError("chromedriver が応答しません")
+        return 1
+
+    def quit(self):
+        self.quit_count += 1
+
+
+class _Launcher:
+    def __init__(self):
+        self.launched = []
+
+    def __call__(self):
+        driver = _FakeDriver(len(self.launched))
+        self.launched.append(driver)
+        return driver
+
+
+def test_without_pool_every_driver_is_quit():
+    """プールの大きさが0なら、従来どおり毎回起動して終了する"""
+    launcher = _Launcher()
+    pool = driver_pool.DriverPool(launcher, size=0)
+
+    for _ in range(2):
+        pool.release(pool.acquire())
+
+    assert len(launcher.launched) == 2
+    assert all(driver.quit_count == 1 for driver in launcher.launched)
+
+
+def test_pooled_driver_is_reset_and_reused():
+    """返却した driver は追加のタブを閉じて空白ページに戻し、次の貸し出しで使う"""
+    launcher = _Launcher()
+    pool = driver_pool.DriverPool(launcher, size=1)
+
+    driver = pool.acquire()
+    driver.window_handles.append("tab")
+    pool.release(driver)
+
+    assert driver.window_handles == ["main"] and driver.visited == ["about:blank"]
+    assert pool.acquire() is driver
+    assert len(launcher.launched) == 1 and driver.quit_count == 0
+
+
+def test_drivers_are_recycled_after_max_uses_age_or_failure():
+    """使用回数・経過時間の上限を超えたものと、応答しないものは終了して起動し直す"""
+    now = [0.0]
+    launcher = _Launcher()
+    pool = driver_pool.DriverPool(launcher, size=1, max_uses=2, max_age=60, clock=lambda: now[0])
+
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+    pool.release(first)                     # 2回使ったので待機させない
+    assert first.quit_count == 1
+
+    second = pool.acquire()
+    pool.release(second)
+    now[0] = 61.0                           # 待機中に上限の時間を過ぎた
+    third = pool.acquire()
+    assert third is not second and second.quit_count == 1
+    pool.release(third)
+
+    third.alive = False                     # 待機中に応答しなくなった
+    fourth = pool.acquire()
+    assert fourth is not third and third.quit_count == 1
+    assert len(launcher.launched) == 4
+
+
+def test_acquire_waits_for_a_prefill_in_progress():
+    """事前起動中なら二重に起動せず、その driver を使う"""
+    started, finish = threading.Event(), threading.Event()
+    launcher = _Launcher()
+
+    def slow_launch():
+        started.set()
+        finish.wait(5)
+        return launcher()
+
+    pool = driver_pool.DriverPool(slow_launch, size=1)
+    thread = threading.Thread(target=pool.prefill)
+    thread.start()
+    started.wait(5)
+    threading.Timer(0.05, finish.set).start()
+
+    driver = pool.acquire()
+    thread.join(5)
+
+    assert launcher.launched == [driver]
+    pool.release(driver)
+    pool.close()
+    assert driver.quit_count == 1
+
+
+def test_attached_chrome_keeps_the_users_tabs():
+    """接続モードの Chrome は返却時にタブを閉じず、表示中のページも変えない"""
+    launcher = _Launcher()
+    pool = driver_pool.DriverPool(launcher, size=1, reset=driver_pool.keep_tabs)
+
+    driver = pool.acquire()
+    driver.window_handles.append("user-tab")
+    pool.release(driver)
+
+    assert driver.window_handles == ["main", "user-tab"] and driver.visited == []
+    assert pool.acquire() is driver
+
+
+def test_profile_dir_limits_the_pool_to_one_chrome():
+    """同じプロファイルのディレクトリは1つの Chrome しか使えないため、待機させるのは1台まで"""
+    assert driver_pool.pool_size(3, profile_dir="/tmp/xserver-profile") == 1
+    assert driver_pool.pool_size(3, profile_dir="") == 3
+    assert driver_pool.pool_size(0, profile_dir="/tmp/xserver-profile") == 0
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+expiry_parser（ページのHTMLからの利用期限の読み取り）のテスト
+"""
+
+import http.cookiejar
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+from expiry_parser import parse_expiry
+from fake_xserver_panel import FakeXServerPanel
+
+
+def test_reads_the_expiry_row_in_any_year():
+    """年を固定せず、見出しに続く日時を読む（年をまたいでも読める）"""
+    html = "<table><tr><th>利用期限</th>\n  <td>2027-01-01 08:20</td></tr></table>"
+
+    assert parse_expiry(html) == datetime(2027, 1, 1, 8, 20)
+    assert parse_expiry("<dt>利用期限：</dt><dd>2026/12/31&nbsp;23:59</dd>") == datetime(2026, 12, 31, 23, 59)
+    assert parse_expiry("利用期限 2026年1月2日 8時05分") == datetime(2026, 1, 2, 8, 5)
+
+
+def test_prefers_the_labelled_row_over_other_dates():
+    """他の日時が先にあっても、「利用期限」の見出しに続く日時を選ぶ"""
+    html = ("<p>最終ログイン 2026-01-01 09:00</p>"
+            "<tr><th>利用期限</th><td>2026-01-03 12:00</td></tr>")
+
+    assert parse_expiry(html) == datetime(2026, 1, 3, 12, 0)
+    assert parse_expiry("<p>利用期限 -</p>") is None
+
+
+def test_page_without_the_heading_has_no_expiry():
+    """見出しのないページ（メンテナンスのお知らせなど）の日時は利用期限として扱わない"""
+    html = "<h1>メンテナンスのお知らせ</h1><p>2027-01-10 09:00 まで管理パネルを停止します。</p>"
+
+    assert parse_expiry(html) is None
+    assert parse_expiry(html, "40092988") is None
+
+
+def test_multi_server_layout_picks_the_row_after_the_server_id():
+    """複数のサーバーが並ぶページでは、サーバーIDの後にある利用期限を選ぶ"""
+    html = ("<tr><td>40092988</td><td>利用期限</td><td>2026-01-03 12:00</td></tr>"
+            "<tr><td>40090849</td><td>利用期限</td><td>2026-01-05 06:30</td></tr>")
+
+    assert parse_expiry(html, "40092988") == datetime(2026, 1, 3, 12, 0)
+    assert parse_expiry(html, "40090849") == datetime(2026, 1, 5, 6, 30)
+
+
+def test_multi_server_layout_without_the_server_has_no_expiry():
+    """複数の利用期限が並ぶページでサーバーIDが見つからなければ、他のサーバーの利用期限を使わない"""
+    html = ("<tr><td>41234</td><td>利用期限</td><td>2026-01-03 12:00</td></tr>"
+            "<tr><td>40090849</td><td>利用期限</td><td>2026-01-05 06:30</td></tr>")
+
+    assert parse_expiry(html) is None
+    assert parse_expiry(html, "40092988") is None
+    assert parse_expiry(html, "123") is None          # 「41234」の一部には一致しない
+    assert parse_expiry(html, "1234") is None
+    assert parse_expiry(html, "41234") == datetime(2026, 1, 3, 12, 0)
+
+    # サーバーIDの後に利用期限がない
+    html = ("<tr><td>利用期限</td><td>2026-01-03 12:00</td></tr>"
+            "<tr><td>利用期限</td><td>2026-01-05 06:30</td></tr><p>40092988</p>")
+    assert parse_expiry(html, "40092988") is None
+
+
+def test_reads_the_fake_panel_detail_page():
+    """ローカルパネルの詳細ページの利用期限を読める"""
+    expiry = datetime(2027, 1, 1, 0, 15)
+    with FakeXServerPanel(servers={"40092988": expiry}) as panel:
+        browser = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        browser.open(f"{panel.base_url}/xapanel/login/xvps/",
+                     data=urllib.parse.urlencode({"memberid": "user", "user_password": "pass"}).encode("utf-8"))
+        detail = browser.open(f"{panel.base_url}/xapanel/xvps/server/detail?id=40092988").read().decode("utf-8")
+
+    assert parse_expiry(detail, "40092988") == expiry
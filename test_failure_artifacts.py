@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+failure_artifacts（失敗時の記録の非同期保存）のテスト
+"""
+
+import base64
+import gzip
+import os
+
+import failure_artifacts
+import step_timing
+
+
+class _FakeDriver:
+    page_source = "<html><body>利用期限</body></html>"
+
+    def get_screenshot_as_base64(self):
+        return base64.b64encode(b"\x89PNG fixture").decode("ascii")
+
+
+def test_capture_writes_screenshot_and_dom_in_the_background(tmp_path, monkeypatch):
+    """スクリーンショットとHTMLを、実行ごとのディレクトリにステップ名付きで保存する"""
+    monkeypatch.setattr(failure_artifacts, "ARTIFACT_DIR", str(tmp_path))
+    monkeypatch.setattr(step_timing, "current_path", lambda: "xserver2/server/renew/update_button")
+
+    path = failure_artifacts.capture(_FakeDriver(), "update_button_not_found")
+    failure_artifacts.flush()
+
+    assert os.path.dirname(path) == failure_artifacts.current_run_dir()
+    assert os.path.dirname(os.path.dirname(path)) == str(tmp_path)
+    assert os.path.basename(path).endswith("_server-renew-update_button_update_button_not_found")
+    with open(f"{path}.png", "rb") as f:
+        assert f.read() == b"\x89PNG fixture"
+    with gzip.open(f"{path}.html.gz", "rt", encoding="utf-8") as f:
+        assert f.read() == _FakeDriver.page_source
+
+
+def test_only_the_latest_runs_are_kept(tmp_path, monkeypatch):
+    """古い実行のディレクトリから削除し、最新の keep 回分だけを残す"""
+    monkeypatch.setattr(failure_artifacts, "ARTIFACT_DIR", str(tmp_path))
+    runs = ["20260101_000000_1", "20260102_000000_2", "20260103_000000_3"]
+    for run in runs:
+        (tmp_path / run).mkdir()
+
+    assert failure_artifacts.prune(keep=2) == runs[:1]
+    assert sorted(os.listdir(tmp_path)) == runs[1:]
+
+
+def test_capture_survives_a_dead_driver(tmp_path, monkeypatch):
+    """ブラウザが応答しない場合は記録せずに続行する"""
+    monkeypatch.setattr(failure_artifacts, "ARTIFACT_DIR", str(tmp_path))
+
+    class _DeadDriver:
+        def get_screenshot_as_base64(self):
+            raise ConnectionError("chromedriver が応答しません")
+
+        @property
+        def page_source(self):
+            raise ConnectionError("chromedriver が応答しません")
+
+    assert failure_artifacts.capture(_DeadDriver(), "update_unknown_error") is None
+
+
+def test_each_run_gets_its_own_directory(tmp_path, monkeypatch):
+    """常駐モードで実行を繰り返しても、実行ごとに別のディレクトリに保存し、古いものから削除する"""
+    monkeypatch.setattr(failure_artifacts, "ARTIFACT_DIR", str(tmp_path))
+    monkeypatch.setattr(failure_artifacts, "KEEP_RUNS", 2)
+
+    directories = []
+    for _ in range(4):
+        failure_artifacts.start_run()
+        directories.append(os.path.dirname(failure_artifacts.capture(_FakeDriver(), "update_unknown_error")))
+        failure_artifacts.flush()
+
+    assert len(set(directories)) == 4
+    assert directories == sorted(directories)
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(directory) for directory in directories[-2:]]
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+ローカルの XServer パネル（fake_xserver_panel.py）と bench_panel.py の集計のテスト
+"""
+
+import http.cookiejar
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+import bench_panel
+from fake_xserver_panel import FakeXServerPanel
+
+
+def _browser():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+
+def _post(opener, url, **form):
+    return opener.open(url, data=urllib.parse.urlencode(form).encode("utf-8"))
+
+
+def test_renewal_flow_with_captcha(tmp_path):
+    """ログイン → 詳細 → 確認 → 画像認証 → 完了で、利用期限が2日延びる"""
+    image = tmp_path / "captcha.png"
+    image.write_bytes(b"\x89PNG fixture")
+    expiry = datetime.now().replace(second=0, microsecond=0) + timedelta(hours=6)
+    with FakeXServerPanel(servers={"40092988": expiry}, username="user", password="pass",
+                          captcha_image=str(image), captcha_answer="369218") as panel:
+        browser = _browser()
+        base = panel.base_url
+
+        # 未ログインではログインページに戻される
+        response = browser.open(f"{base}/xapanel/xvps/server/detail?id=40092988")
+        assert response.url.endswith("/xapanel/login/xvps/")
+        assert 'name="memberid"' in response.read().decode("utf-8")
+
+        failed = _post(browser, f"{base}/xapanel/login/xvps/", memberid="user", user_password="wrong")
+        assert "IDまたはパスワードが違います" in failed.read().decode("utf-8")
+
+        response = _post(browser, f"{base}/xapanel/login/xvps/", memberid="user", user_password="pass")
+        assert response.url == f"{base}/xapanel/xvps/"
+
+        detail = browser.open(f"{base}/xapanel/xvps/server/detail?id=40092988").read().decode("utf-8")
+        assert f"<th>利用期限</th><td>{expiry.strftime('%Y-%m-%d %H:%M')}</td>" in detail
+        assert "更新する</a>" in detail
+
+        conf = _post(browser, f"{base}/xapanel/xvps/server/freevps/extend/conf", id="40092988")
+        assert "無料VPSの利用を継続する</button>" in conf.read().decode("utf-8")
+
+        captcha = _post(browser, f"{base}/xapanel/xvps/server/freevps/extend/do", id="40092988")
+        assert "画像認証を行ってください" in captcha.read().decode("utf-8")
+        assert browser.open(f"{base}/xapanel/xvps/captcha.png").read() == image.read_bytes()
+
+        wrong = _post(browser, f"{base}/xapanel/xvps/server/freevps/extend/do", id="40092988", captcha="000000")
+        assert "正しくありません" in wrong.read().decode("utf-8")
+
+        complete = _post(browser, f"{base}/xapanel/xvps/server/freevps/extend/do", id="40092988", captcha="369218")
+        assert "/xapanel/xvps/server/freevps/extend/complete" in complete.url
+        assert ">OK</button>" in complete.read().decode("utf-8")
+
+    assert panel.renewals == ["40092988"]
+    assert panel.captcha_attempts == ["000000", "369218"]
+    assert panel.servers["40092988"] == expiry + timedelta(days=2)
+
+
+def test_detail_hides_update_button_until_24_hours_before():
+    with FakeXServerPanel(servers={"1": datetime.now() + timedelta(days=2)}) as panel:
+        browser = _browser()
+        _post(browser, f"{panel.base_url}/xapanel/login/xvps/", memberid="a", user_password="b")
+        detail = browser.open(f"{panel.base_url}/xapanel/xvps/server/detail?id=1").read().decode("utf-8")
+    assert "利用期限" in detail
+    assert "更新する" not in detail
+
+
+def test_latency_and_failure_injection():
+    with FakeXServerPanel(page_latency={"login": 0.2}, failures={"login": 1}) as panel:
+        browser = _browser()
+        started = time.perf_counter()
+        try:
+            browser.open(f"{panel.base_url}/xapanel/login/xvps/")
+            raise AssertionError("1回目は 503 になるはず")
+        except urllib.error.HTTPError as e:
+            assert e.code == 503
+        assert browser.open(f"{panel.base_url}/xapanel/login/xvps/").status == 200
+        elapsed = time.perf_counter() - started
+
+    assert elapsed >= 0.4
+    assert [(page, status) for _, _, page, status in panel.requests] == [("login", 503), ("login", 200)]
+
+
+def test_step_times_follow_request_timeline():
+    requests = [(10.5, "GET", "detail", 200), (10.1, "GET", "login", 200), (10.3, "POST", "login", 302),
+                (10.35, "GET", "panel", 200), (10.4, "GET", "other", 404), (10.8, "GET", "detail", 200)]
+    steps = bench_panel.step_times(requests, started=10.0, finished=11.0)
+
+    assert list(steps) == ["起動〜最初のリクエスト", "GET login", "POST login", "GET panel", "GET detail"]
+    assert abs(steps["起動〜最初のリクエスト"] - 0.1) < 1e-9
+    assert abs(steps["GET panel"] - 0.15) < 1e-9
+    assert abs(steps["GET detail"] - 0.5) < 1e-9     # 2回分の合計（0.3 + 0.2）
+    assert abs(sum(steps.values()) - 1.0) < 1e-9
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+http_probe（ブラウザを使わない利用期限の確認）のテスト
+"""
+
+import http.cookiejar
+import json
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+import http_probe
+import renewal_engine
+import renewal_state
+from fake_xserver_panel import FakeXServerPanel
+
+
+def _export_cookies(panel, path):
+    """ローカルパネルにログインし、クッキーを driver.get_cookies() の形式で保存する"""
+    jar = http.cookiejar.CookieJar()
+    browser = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    browser.open(f"{panel.base_url}/xapanel/login/xvps/",
+                 data=urllib.parse.urlencode({"memberid": "user", "user_password": "pass"}).encode("utf-8"))
+    cookies = [{"name": cookie.name, "value": cookie.value, "domain": cookie.domain, "path": cookie.path,
+                "secure": cookie.secure, "httpOnly": True} for cookie in jar]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cookies, f)
+    return str(path)
+
+
+def test_probe_reads_expiries_with_saved_cookies(tmp_path):
+    """保存したクッキーで、詳細ページだけを取得して利用期限を読む"""
+    expiries = {"40092988": datetime(2027, 1, 1, 8, 20), "40090849": datetime(2027, 1, 3, 6, 0)}
+    with FakeXServerPanel(servers=expiries) as panel:
+        cookie_path = _export_cookies(panel, tmp_path / "cookies.json")
+        panel.reset_log()
+
+        probed = http_probe.probe_expiries(list(expiries), base_url=panel.base_url, cookie_path=cookie_path)
+
+        assert probed == expiries
+        # ログイン後のリダイレクト先（panel）は応答の後に記録されるため、reset_log() の後に届くことがある
+        pages = [(method, page) for _, method, page, _ in panel.requests if page != "panel"]
+        assert pages == [("GET", "detail")] * 2
+
+
+def test_rejected_session_falls_back_to_the_browser(tmp_path):
+    """セッションが無効でログインページに戻された場合は None（ブラウザで確認する）"""
+    cookie_path = tmp_path / "cookies.json"
+    cookie_path.write_text(json.dumps([{"name": "XSERVER_SESSION", "value": "expired", "path": "/"}]))
+    with FakeXServerPanel() as panel:
+        assert http_probe.probe_expiries(["40092988"], base_url=panel.base_url,
+                                         cookie_path=str(cookie_path)) is None
+
+
+def test_cookie_header_matches_domain_path_and_expiry():
+    cookies = [
+        {"name": "a", "value": "1", "domain": ".xserver.ne.jp", "path": "/"},
+        {"name": "b", "value": "2", "domain": "other.example", "path": "/"},
+        {"name": "c", "value": "3", "domain": "secure.xserver.ne.jp", "path": "/xapanel/", "secure": True},
+        {"name": "d", "value": "4", "domain": "secure.xserver.ne.jp", "path": "/", "expiry": 100},
+    ]
+
+    assert http_probe.cookie_header(cookies, "secure.xserver.ne.jp", "/xapanel/xvps/", True, now=200) == "a=1; c=3"
+    assert http_probe.cookie_header(cookies, "secure.xserver.ne.jp", "/", False, now=50) == "a=1; d=4"
+
+
+def test_engine_skips_the_browser_when_no_renewal_is_due(tmp_path, monkeypatch):
+    """HTTP で確認して更新時期でなければ、ブラウザを起動せずに終了する"""
+    expiry = datetime.now().replace(second=0, microsecond=0) + timedelta(days=2)
+    monkeypatch.setattr(renewal_state, "STATE_FILE", str(tmp_path / "state.json"))
+    monkeypatch.setattr(renewal_state, "IGNORE_STATE", False)
+    with FakeXServerPanel(servers={"40092988": expiry}) as panel:
+        monkeypatch.setattr(http_probe, "BASE_URL", panel.base_url)
+        monkeypatch.setattr(http_probe, "COOKIE_JAR", _export_cookies(panel, tmp_path / "cookies.json"))
+        engine = renewal_engine.RenewalEngine(renewal_engine.Preset("test", "user", "pass", ["40092988"]))
+
+        def start_browser():
+            raise AssertionError("ブラウザを起動しない")
+        monkeypatch.setattr(engine, "start_browser", start_browser)
+
+        assert engine.run() is True
+
+    assert renewal_state.get_expiry("40092988") == expiry
+
+
+def test_unreadable_expiry_goes_to_the_browser_without_saving(tmp_path, monkeypatch):
+    """利用期限の行が読めなかったサーバーは状態ファイルに保存せず、ブラウザで確認する"""
+    monkeypatch.setattr(renewal_state, "STATE_FILE", str(tmp_path / "state.json"))
+    monkeypatch.setattr(http_probe, "available", lambda: True)
+    monkeypatch.setattr(http_probe, "probe_expiries",
+                        lambda server_ids: {"1": None, "2": datetime.now() + timedelta(days=2)})
+    engine = renewal_engine.RenewalEngine(renewal_engine.Preset("test", "user", "pass", ["1", "2"]))
+    results = {"1": "not_checked", "2": "not_checked"}
+
+    assert engine.probe_expiries(["1", "2"], results) == ["1"]
+    assert results == {"1": "not_checked", "2": "not_due"}
+    assert renewal_state.get_expiry("1") is None
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+lean_navigation（ブロックリストと eager による軽量なページ遷移、ページごとの読み込み時間）のテスト
+"""
+
+import lean_navigation
+
+
+class _FakeDriver:
+    def __init__(self, timing=None):
+        self.timing = timing
+        self.commands = []
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append((command, params))
+
+    def execute_script(self, script):
+        return self.timing
+
+
+class _Options:
+    page_load_strategy = "normal"
+
+
+def test_patterns_matching_the_captcha_image_are_never_blocked():
+    """画像認証の画像に一致しうるパターンは、指定してもブロックしない"""
+    patterns = ["*.woff2", "*.png", "*captcha*", "*google-analytics.com*", "*.jpg", "*.gif"]
+
+    allowed = lean_navigation.blocked_url_patterns(patterns, base_url="https://secure.xserver.ne.jp/")
+
+    assert allowed == ["*.woff2", "*google-analytics.com*", "*.gif"]
+    assert lean_navigation.blocked_url_patterns(lean_navigation.DEFAULT_BLOCKED_URLS) == \
+        lean_navigation.DEFAULT_BLOCKED_URLS
+
+
+def test_disabled_by_default(monkeypatch):
+    """オプトインのため、無効な場合は読み込み戦略もブロックリストも変えない"""
+    monkeypatch.setattr(lean_navigation, "ENABLED", False)
+    driver = _FakeDriver()
+
+    assert lean_navigation.apply_page_load_strategy(_Options()).page_load_strategy == "normal"
+    assert lean_navigation.apply_blocklist(driver) == []
+    assert driver.commands == []
+
+
+def test_enabled_sets_eager_and_the_blocklist(monkeypatch):
+    monkeypatch.setattr(lean_navigation, "ENABLED", True)
+    monkeypatch.setattr(lean_navigation, "EXTRA_BLOCKED_URLS", ["*.jpg", "*cdn.example.com*"])
+    driver = _FakeDriver()
+
+    assert lean_navigation.apply_page_load_strategy(_Options()).page_load_strategy == "eager"
+    patterns = lean_navigation.apply_blocklist(driver, "https://secure.xserver.ne.jp")
+
+    assert "*cdn.example.com*" in patterns and "*.jpg" not in patterns
+    assert driver.commands == [("Network.enable", {}), ("Network.setBlockedURLs", {"urls": patterns})]
+
+
+def test_page_timings_are_reported_and_summarised(monkeypatch, capsys):
+    """ページごとの DOMContentLoaded・load・転送量を表示し、実行の終わりに一覧にする"""
+    monkeypatch.setattr(lean_navigation, "PAGE_TIMINGS", True)
+    driver = _FakeDriver({"url": "https://example/", "dom_content_loaded": 180.4, "load": 0,
+                          "resources": 3, "transfer": 2048})
+
+    lean_navigation.report_page(driver, "login")
+    lean_navigation.print_summary()
+
+    output = capsys.readouterr().out
+    assert "ページ login: DOMContentLoaded 180ms, load 未完了, リソース 3件 / 2.0KB" in output
+    assert "ページごとの読み込み時間" in output
+    lean_navigation.print_summary()
+    assert capsys.readouterr().out == ""
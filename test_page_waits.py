@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+page_waits（ページの状態に応じた待機）のテスト
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("selenium")
+
+from selenium.common.exceptions import NoSuchElementException, TimeoutException  # noqa: E402
+
+from page_waits import wait_for, wait_for_any  # noqa: E402
+
+
+class _FakeDriver:
+    """指定した秒数が経つと条件が成立する driver の代わり"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def _after(seconds, value):
+    def _condition(driver):
+        return value if driver.elapsed() >= seconds else False
+    return _condition
+
+
+def _missing_element(driver):
+    raise NoSuchElementException("まだ表示されていません")
+
+
+def test_first_outcome_to_hold_wins():
+    """先に成立した結果を、残りの条件の成立を待たずに返す"""
+    driver = _FakeDriver()
+
+    name, value = wait_for_any(driver, {
+        "slow": _after(5, "slow"),
+        "missing": _missing_element,
+        "fast": _after(0.1, "fast"),
+    }, timeout=3, poll_frequency=0.01)
+
+    assert (name, value) == ("fast", "fast")
+    assert driver.elapsed() < 1.0
+
+
+def test_earlier_outcome_wins_when_both_hold():
+    """同時に成立した場合は先に書いた結果を返す"""
+    assert wait_for_any(_FakeDriver(), {
+        "error": _after(0, "error"),
+        "done": _after(0, "done"),
+    }, timeout=1)[0] == "error"
+
+
+def test_timeout_names_every_outcome():
+    """どれも成立しなければ、待った結果名を含む TimeoutException を送出する"""
+    driver = _FakeDriver()
+
+    with pytest.raises(TimeoutException) as raised:
+        wait_for_any(driver, {"login_form": _missing_element, "detail": _after(5, True)},
+                     timeout=0.2, poll_frequency=0.01)
+
+    assert "login_form" in str(raised.value) and "detail" in str(raised.value)
+    assert driver.elapsed() < 1.0
+
+
+def test_wait_for_returns_none_on_timeout():
+    """単一の条件の待機は、成立しなければ例外ではなく None を返す"""
+    assert wait_for(_FakeDriver(), _after(5, True), timeout=0.1, poll_frequency=0.01) is None
+    assert wait_for(_FakeDriver(), _after(0, "ok"), timeout=1) == "ok"
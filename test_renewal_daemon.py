@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+renewal_daemon（常駐モード）のテスト
+"""
+
+from datetime import datetime, timedelta
+
+import renewal_daemon
+import renewal_state
+
+
+def _due_24h_before(expiry):
+    return expiry - timedelta(hours=24)
+
+
+def test_plan_next_run_from_saved_expiry(tmp_path, monkeypatch):
+    """保存済みの利用期限から次の実行日時を計算し、不明なら即時実行にする"""
+    path = str(tmp_path / "state.json")
+    monkeypatch.setattr(renewal_state, "STATE_FILE", path)
+    now = datetime(2026, 1, 1, 12, 0)
+
+    assert renewal_daemon.plan_next_run("1", _due_24h_before, now=now) == now
+
+    renewal_state.record_expiry("1", datetime(2026, 1, 3, 12, 0), path)
+    assert renewal_daemon.plan_next_run("1", _due_24h_before, now=now) == datetime(2026, 1, 2, 12, 0)
+
+
+def test_plan_next_run_follows_earliest_server(tmp_path, monkeypatch):
+    """複数のサーバーでは最も早く更新時期が来るサーバーに合わせ、期限不明のサーバーがあれば即時実行する"""
+    path = str(tmp_path / "state.json")
+    monkeypatch.setattr(renewal_state, "STATE_FILE", path)
+    now = datetime(2026, 1, 1, 12, 0)
+    renewal_state.record_expiry("1", datetime(2026, 1, 4, 12, 0), path)
+    renewal_state.record_expiry("2", datetime(2026, 1, 3, 12, 0), path)
+
+    assert renewal_daemon.plan_next_run(["1", "2"], _due_24h_before, now=now) == datetime(2026, 1, 2, 12, 0)
+    assert renewal_daemon.plan_next_run(["1", "2", "3"], _due_24h_before, now=now) == now
+
+
+def test_run_daemon_replans_from_new_expiry(tmp_path, monkeypatch):
+    """更新処理のたびに、保存された新しい利用期限で次回の実行を計画し直す"""
+    path = str(tmp_path / "state.json")
+    monkeypatch.setattr(renewal_state, "STATE_FILE", path)
+    deadlines = []
+    monkeypatch.setattr(renewal_daemon, "sleep_until", deadlines.append)
+
+    expiries = [datetime.now() + timedelta(days=2), datetime.now() + timedelta(days=4)]
+    warmed = []
+
+    def run_once():
+        renewal_state.record_expiry("1", expiries[len(deadlines) - 1], path)
+        return True
+
+    renewal_daemon.run_daemon(run_once, "1", _due_24h_before,
+                              keep_warm=lambda: warmed.append(True), max_cycles=2)
+
+    assert warmed == [True]
+    assert len(deadlines) == 2
+    assert deadlines[1] == _due_24h_before(expiries[0].replace(second=0, microsecond=0))
+
+
+def test_run_daemon_backs_off_after_failure(tmp_path, monkeypatch):
+    """失敗した場合はすぐに再実行せず、再試行間隔を空ける"""
+    path = str(tmp_path / "state.json")
+    monkeypatch.setattr(renewal_state, "STATE_FILE", path)
+    deadlines = []
+    monkeypatch.setattr(renewal_daemon, "sleep_until", deadlines.append)
+
+    renewal_daemon.run_daemon(lambda: False, "1", _due_24h_before,
+                              retry_delay=timedelta(minutes=30), max_cycles=2)
+
+    assert deadlines[1] - deadlines[0] >= timedelta(minutes=29)
+
+
+def test_run_daemon_prepares_shortly_before_each_run(tmp_path, monkeypatch):
+    """prepare は常駐開始時ではなく、各実行の prepare_lead 前に呼ぶ（すぐに実行する場合は呼ばない）"""
+    path = str(tmp_path / "state.json")
+    monkeypatch.setattr(renewal_state, "STATE_FILE", path)
+    events = []
+    monkeypatch.setattr(renewal_daemon, "sleep_until", lambda deadline: events.append(("sleep", deadline)))
+
+    expiry = datetime.now() + timedelta(days=2)
+
+    def run_once():
+        events.append(("run",))
+        renewal_state.record_expiry("1", expiry, path)
+        return True
+
+    renewal_daemon.run_daemon(run_once, "1", _due_24h_before, prepare=lambda: events.append(("prepare",)),
+                              prepare_lead=timedelta(minutes=2), max_cycles=2)
+
+    next_run = _due_24h_before(expiry.replace(second=0, microsecond=0))
+    assert [event[0] for event in events] == ["sleep", "run", "sleep", "prepare", "sleep", "run"]
+    assert events[2][1] == next_run - timedelta(minutes=2)
+    assert events[4][1] == next_run
+
+
+def test_run_daemon_survives_an_exception(tmp_path, monkeypatch):
+    """1回の処理が例外で終わっても常駐を続け、失敗として再試行間隔を空ける"""
+    path = str(tmp_path / "state.json")
+    monkeypatch.setattr(renewal_state, "STATE_FILE", path)
+    deadlines = []
+    monkeypatch.setattr(renewal_daemon, "sleep_until", deadlines.append)
+    calls = []
+
+    def run_once():
+        calls.append(True)
+        raise RuntimeError("chromedriver を起動できません")
+
+    renewal_daemon.run_daemon(run_once, "1", _due_24h_before,
+                              retry_delay=timedelta(minutes=30), max_cycles=2)
+
+    assert len(calls) == 2
+    assert deadlines[1] - deadlines[0] >= timedelta(minutes=29)
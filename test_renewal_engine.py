@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+renewal_engine（共通の更新エンジン）と各スクリプトのプリセットのテスト
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import renewal_engine
+import xserver
+import xserver2
+import xserver_improved
+
+
+@pytest.fixture
+def solvers(monkeypatch):
+    """解析ステージを置き換え、呼ばれた順を記録する"""
+    calls = []
+    answers = {}
+
+    def fake(name):
+        def solve(captcha_image, engine, cancel_event=None):
+            calls.append(name)
+            return answers.get(name)
+        return solve
+
+    for name, (_, function_name) in renewal_engine.SOLVERS.items():
+        monkeypatch.setattr(renewal_engine, function_name, fake(name))
+    monkeypatch.setattr(renewal_engine, "OCR_AVAILABLE", True)
+    monkeypatch.setattr(renewal_engine, "CLAUDE_AVAILABLE", True)
+    monkeypatch.setattr(renewal_engine, "CLAUDE_CODE_AVAILABLE", True)
+    return calls, answers
+
+
+def _engine(**options):
+    return renewal_engine.RenewalEngine(renewal_engine.Preset("test", "user", "pass", ["1"], **options))
+
+
+def test_solver_chain_stops_at_first_accepted_answer(solvers, monkeypatch):
+    """プリセットの順に試し、採用できない回答と使えないステージは飛ばす"""
+    calls, answers = solvers
+    monkeypatch.setattr(renewal_engine, "CLAUDE_AVAILABLE", False)
+    answers.update(ocr="12345", claude_code="654321", handoff="111111")
+    engine = _engine(solvers=("ocr", "claude_api", "claude_code", "handoff"))
+
+    assert engine.solve(object()) == "654321"
+    assert calls == ["ocr", "claude_code"]
+
+    # 3文字以上なら数字以外も採用するプリセット
+    calls.clear()
+    answers.update(ocr="abc")
+    engine = _engine(solvers=("ocr", "claude_code"), min_answer_length=3, digits_only=False)
+    assert engine.solve(object()) == "abc"
+    assert calls == ["ocr"]
+
+
+def test_race_runs_raceable_solvers_then_falls_back(solvers):
+    """レースモードは対話しないステージを同時に実行し、解けなければ残り（受け渡し）を試す"""
+    calls, answers = solvers
+    answers.update(claude_api="222222")
+    engine = _engine(solvers=("ocr", "claude_api", "handoff"), race=True)
+    assert engine.solve(object()) == "222222"
+    assert "handoff" not in calls
+
+    calls.clear()
+    answers.clear()
+    answers.update(handoff="333333")
+    assert engine.solve(object()) == "333333"
+    assert sorted(calls[:2]) == ["claude_api", "ocr"] and calls[2:] == ["handoff"]
+
+
+def test_update_window_and_due_time():
+    """24時間前から更新できるプリセットは、閾値より前でも24時間以内なら更新する"""
+    expiry = datetime.now() + timedelta(hours=20)
+    assert renewal_engine.should_update(expiry, 12) is False
+    assert renewal_engine.should_update(expiry, 12, renewable_hours=24) is True
+    assert renewal_engine.should_update(None, 12) is True
+    assert renewal_engine.should_update(datetime.now() - timedelta(hours=1), 12) is True
+
+    expiry = datetime(2026, 1, 3, 12, 0)
+    assert renewal_engine.renewal_due_time(expiry, 12) == datetime(2026, 1, 3, 0, 0)
+    assert renewal_engine.renewal_due_time(expiry, 12, 24) == datetime(2026, 1, 2, 12, 0)
+
+
+def test_convert_hiragana_to_numbers():
+    assert renewal_engine.convert_hiragana_to_numbers("さん ろく-きゅうに いちはち") == "369218"
+    assert renewal_engine.convert_hiragana_to_numbers("ひとふたみっ4ご") == "12345"
+
+
+def test_scripts_are_presets_of_the_engine(monkeypatch):
+    monkeypatch.setenv("CLAUDE_CODE_FIRST", "false")
+    monkeypatch.setenv("CAPTCHA_RACE_MODE", "true")
+
+    preset = xserver2.build_preset(["1", "2"])
+    assert preset.server_ids == ["1", "2"]
+    assert preset.solvers == ("ocr", "handoff")
+    assert preset.preprocess == "masked"
+    assert preset.accepts("123456") and not preset.accepts("12345a")
+
+    preset = xserver_improved.build_preset()
+    assert preset.solvers == ("ocr", "claude_api", "claude_code")
+    assert preset.race and preset.manual_fallback
+    assert preset.preprocess == "blurred"
+    assert preset.due_time(datetime(2026, 1, 3, 12, 0)) == datetime(2026, 1, 2, 12, 0)
+
+    monkeypatch.setenv("CLAUDE_CODE_FIRST", "true")
+    assert xserver_improved.build_preset().solvers[0] == "claude_code"
+
+    preset = xserver.build_preset()
+    assert preset.server_ids == [xserver.SERVER_ID]
+    assert not preset.check_expiry and preset.solvers == ()
+
+
+def test_temporary_image_files_are_removed(monkeypatch, tmp_path):
+    """一時ファイルに書き出した画像は、別の画像に置き換えた時と quit() で削除する（パスを指定したものは残す）"""
+    written = []
+
+    def fake_write(image, path=None):
+        path = path or str(tmp_path / f"captcha_{len(written)}.png")
+        with open(path, "wb") as f:
+            f.write(b"png")
+        written.append(path)
+        return path
+
+    monkeypatch.setattr(renewal_engine, "write_image_file", fake_write)
+    engine = _engine()
+    first, second = object(), object()
+
+    temporary = engine.image_file(first)
+    assert engine.image_file(first) == temporary
+    engine.image_file(second)
+    assert not os.path.exists(temporary)
+
+    kept = engine.image_file(second, str(tmp_path / "captcha_cropped.png"))
+    temporary = engine.image_file(first)
+    engine.quit()
+    assert not os.path.exists(temporary)
+    assert os.path.exists(kept)
+
+
+def test_daemon_reuses_the_engine_it_warmed(monkeypatch):
+    """常駐モードでは keep_warm / prepare で温めたエンジンを毎回の実行で使う"""
+    import renewal_daemon
+
+    engines = []
+    monkeypatch.setattr(renewal_engine.RenewalEngine, "run", lambda self, server_ids=None: engines.append(self) or True)
+
+    def fake_run_daemon(run_once, keep_warm=None, prepare=None, **_):
+        engines.append(keep_warm.__self__)
+        run_once()
+        run_once()
+
+    monkeypatch.setattr(renewal_daemon, "run_daemon", fake_run_daemon)
+    xserver_improved.run_as_daemon()
+
+    assert len(engines) == 3 and all(engine is engines[0] for engine in engines)
+
+
+class _FakeInput:
+    def __init__(self):
+        self.keys = []
+
+    def clear(self):
+        self.keys.clear()
+
+    def send_keys(self, keys):
+        self.keys.append(keys)
+
+
+class _FakeButton:
+    clicked = False
+
+    def click(self):
+        self.clicked = True
+
+
+class _CompletedDriver:
+    current_url = "https://secure.xserver.ne.jp" + renewal_engine.EXTEND_COMPLETE_PATH
+
+
+def test_submit_answer_clicks_the_button_and_falls_back_to_enter():
+    """送信ボタンが見つかっていればクリックし、なければ入力欄で Enter を押す"""
+    pytest.importorskip("selenium")
+    from selenium.webdriver.common.keys import Keys
+
+    engine = _engine()
+    engine.driver = _CompletedDriver()
+
+    captcha_input, button = _FakeInput(), _FakeButton()
+    assert engine.submit_answer(captcha_input, "123456", button)
+    assert button.clicked and captcha_input.keys == ["123456"]
+
+    captcha_input = _FakeInput()
+    assert engine.submit_answer(captcha_input, "123456")
+    assert captcha_input.keys == ["123456", Keys.RETURN]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+renewal_state（更新状態ファイル）のテスト
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+import renewal_state
+
+
+def _due_24h_before(expiry):
+    return expiry - timedelta(hours=24)
+
+
+def test_record_and_read_expiry(tmp_path):
+    """保存した利用期限をサーバーIDごとに読み出せる"""
+    path = str(tmp_path / "state.json")
+    expiry = datetime(2026, 1, 2, 8, 20)
+
+    renewal_state.record_expiry("40092988", expiry, path)
+    renewal_state.record_expiry("40090849", expiry + timedelta(days=1), path)
+
+    assert renewal_state.get_expiry("40092988", path) == expiry
+    assert renewal_state.get_expiry("40090849", path) == expiry + timedelta(days=1)
+    assert renewal_state.get_expiry("99999999", path) is None
+
+
+def test_record_renewal_drops_stale_expiry(tmp_path):
+    """更新後は古い利用期限を削除し、次回はブラウザで確認させる"""
+    path = str(tmp_path / "state.json")
+    renewed_at = datetime(2026, 1, 1, 9, 0)
+    renewal_state.record_expiry("1", datetime(2026, 1, 2, 8, 20), path)
+
+    renewal_state.record_renewal("1", renewed_at, path)
+
+    assert renewal_state.get_expiry("1", path) is None
+    assert renewal_state.get_last_renewal("1", path) == renewed_at
+
+
+def test_save_state_is_atomic_and_leaves_no_temp_files(tmp_path):
+    """書き込み後に一時ファイルが残らず、内容は正しいJSONになる"""
+    path = str(tmp_path / "state.json")
+    renewal_state.save_state({"servers": {"1": {"expiry": "2026-01-02 08:20"}}}, path)
+
+    assert os.listdir(tmp_path) == ["state.json"]
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["servers"]["1"]["expiry"] == "2026-01-02 08:20"
+
+
+def test_broken_state_file_is_treated_as_empty(tmp_path):
+    """壊れた状態ファイルは無視してブラウザでの確認にフォールバックする"""
+    path = tmp_path / "state.json"
+    path.write_text("{not json", encoding="utf-8")
+
+    assert renewal_state.load_state(str(path)) == {"servers": {}}
+    assert renewal_state.needs_browser_session("1", _due_24h_before, path=str(path))
+
+
+def test_needs_browser_session_uses_due_time(tmp_path):
+    """更新時期の前はブラウザ不要、更新時期以降は必要と判定する"""
+    path = str(tmp_path / "state.json")
+    expiry = datetime(2026, 1, 3, 12, 0)
+    renewal_state.record_expiry("1", expiry, path)
+
+    before_due = expiry - timedelta(hours=30)
+    after_due = expiry - timedelta(hours=23)
+
+    assert not renewal_state.needs_browser_session("1", _due_24h_before, now=before_due, path=path)
+    assert renewal_state.needs_browser_session("1", _due_24h_before, now=after_due, path=path)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+画像認証の処理のプロファイル（stage_profiler.py）のテスト
+"""
+
+import sys
+import types
+
+import pytest
+
+import stage_profiler
+
+STAGES_SOURCE = '''
+import stage_profiler
+
+@stage_profiler.profiled("preprocess")
+def preprocess(size):
+    return [bytearray(1024) for _ in range(size)]
+
+@stage_profiler.profiled("ocr")
+def solve(size):
+    return len(preprocess(size))
+'''
+
+
+@pytest.fixture
+def stages(tmp_path, monkeypatch):
+    """無効の状態で profiled() を付けた関数を持つモジュール"""
+    monkeypatch.setattr(stage_profiler, "ENABLED", False)
+    monkeypatch.setattr(stage_profiler, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(stage_profiler, "_registry", [])
+    monkeypatch.setattr(stage_profiler, "_calls", {})
+    module = types.ModuleType("fake_stages")
+    monkeypatch.setitem(sys.modules, "fake_stages", module)
+    exec(compile(STAGES_SOURCE, "fake_stages.py", "exec"), module.__dict__)
+    return module
+
+
+def test_disabled_profiling_returns_the_function_unchanged(stages, tmp_path):
+    def plain(size):
+        return size
+
+    assert stage_profiler.profiled("extract")(plain) is plain
+    assert stages.solve(100) == 100
+    assert not (tmp_path / "profiles").exists()
+
+
+def test_enable_dumps_profile_and_memory_per_stage(stages, tmp_path):
+    original = stages.solve
+    stage_profiler.enable()
+    assert stages.solve is not original
+
+    assert stages.solve(2000) == 2000
+    assert stages.solve(10) == 10
+
+    run_dir = tmp_path / "profiles" / stage_profiler.RUN_ID
+    assert sorted(path.name for path in run_dir.iterdir()) == ["ocr_1.prof", "ocr_1.txt", "ocr_2.prof", "ocr_2.txt"]
+    report = (run_dir / "ocr_1.txt").read_text(encoding="utf-8")
+    assert "stage: ocr" in report
+    peak = float(report.split("tracemalloc peak: ")[1].split(" MiB")[0])
+    assert peak >= 1.5     # 2000 × 1KiB を確保している
+    assert "fake_stages.py" in report     # メモリ確保の多い行と関数の統計
+    assert "preprocess" in report         # 入れ子のステージは外側のプロファイルに含まれる
+
+    # 単独で呼んだ場合はそのステージとして保存する
+    stages.preprocess(1)
+    assert (run_dir / "preprocess_1.txt").exists()
+
+
+def test_worker_threads_are_included_in_the_stage_profile(tmp_path, monkeypatch):
+    """ステージが ThreadPoolExecutor で実行させた関数も、保存した統計に含まれる"""
+    import pstats
+    from concurrent.futures import ThreadPoolExecutor
+
+    monkeypatch.setattr(stage_profiler, "ENABLED", True)
+    monkeypatch.setattr(stage_profiler, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(stage_profiler, "_calls", {})
+
+    def read_in_worker(size):
+        return sum(range(size))
+
+    @stage_profiler.profiled("ocr")
+    def solve():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            task = stage_profiler.in_worker(read_in_worker)
+            return sum(executor.map(task, [1000, 2000]))
+
+    assert solve() == sum(range(1000)) + sum(range(2000))
+    assert stage_profiler.in_worker(read_in_worker) is read_in_worker     # 計測中でなければそのまま
+
+    stats = pstats.Stats(str(tmp_path / "profiles" / stage_profiler.RUN_ID / "ocr_1.prof"))
+    functions = {name for _, _, name in stats.stats}
+    assert "read_in_worker" in functions
+    assert "solve" in functions
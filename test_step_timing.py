@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+ステップごとの時間計測（step_timing.py）のテスト
+"""
+
+import json
+import threading
+
+import pytest
+
+import step_timing
+
+
+@pytest.fixture
+def reports(tmp_path, monkeypatch):
+    trace = tmp_path / "trace.json"
+    textfile = tmp_path / "xserver.prom"
+    monkeypatch.setattr(step_timing, "TRACE_FILE", str(trace))
+    monkeypatch.setattr(step_timing, "PROMETHEUS_TEXTFILE", str(textfile))
+    return trace, textfile
+
+
+def _events(trace):
+    return [event for event in json.loads(trace.read_text())["traceEvents"] if event["ph"] == "X"]
+
+
+def test_steps_and_spans_nest_under_the_run(reports):
+    trace, textfile = reports
+
+    @step_timing.timed("solver.ocr")
+    def solver():
+        return "123456"
+
+    @step_timing.run("xserver_test")
+    def main():
+        step_timing.step("login")
+        step_timing.step("server", server_id="111")
+        with step_timing.span("renew"):
+            step_timing.step("captcha")
+            solver()
+            step_timing.step("captcha_submit")   # ステップの中から呼んでも兄弟のステップになる
+        step_timing.step("quit")
+        return True
+
+    assert main() is True
+    paths = [event["args"]["path"] for event in _events(trace)]
+    assert paths == ["xserver_test", "xserver_test/login", "xserver_test/server", "xserver_test/server/renew",
+                     "xserver_test/server/renew/captcha", "xserver_test/server/renew/captcha/solver.ocr",
+                     "xserver_test/server/renew/captcha_submit", "xserver_test/quit"]
+    events = {event["args"]["path"]: event for event in _events(trace)}
+    root = events["xserver_test"]
+    for event in events.values():
+        assert event["ts"] >= root["ts"]
+        assert event["ts"] + event["dur"] <= root["ts"] + root["dur"] + 1
+
+    metrics = textfile.read_text()
+    assert 'xserver_step_duration_seconds{script="xserver_test",step="xserver_test/login"}' in metrics
+    # server_id は親のステップから引き継ぐ
+    assert ('xserver_step_count{script="xserver_test",step="xserver_test/server/renew/captcha/solver.ocr",'
+            'server_id="111"} 1') in metrics
+    assert 'xserver_run_success{script="xserver_test"} 1' in metrics
+
+
+def test_current_path_names_the_innermost_step(reports):
+    """失敗時の記録のファイル名に使う、開いているスパンのパス"""
+    @step_timing.run("xserver_test")
+    def main():
+        with step_timing.span("renew", server_id="1"):
+            step_timing.step("update_button")
+            return step_timing.current_path()
+
+    assert main() == "xserver_test/renew/update_button"
+
+
+def test_failed_run_is_reported(reports):
+    trace, textfile = reports
+
+    @step_timing.run("xserver_test")
+    def returns_false():
+        step_timing.step("login")
+        return False
+
+    @step_timing.run("xserver_test")
+    def raises():
+        step_timing.step("login")
+        raise RuntimeError("boom")
+
+    assert returns_false() is False
+    assert 'xserver_run_success{script="xserver_test"} 0' in textfile.read_text()
+
+    with pytest.raises(RuntimeError):
+        raises()
+    assert 'xserver_run_success{script="xserver_test"} 0' in textfile.read_text()
+    assert json.loads(trace.read_text())["metadata"]["ok"] is False
+    assert _events(trace)[0]["args"]["error"] == "RuntimeError: boom"
+
+
+def test_nothing_is_recorded_outside_a_run(reports):
+    trace, textfile = reports
+
+    @step_timing.timed("solver.ocr")
+    def solver():
+        return "123456"
+
+    with step_timing.span("orphan") as item:
+        assert item is None
+        assert step_timing.step("login") is None
+        assert solver() == "123456"
+        assert step_timing.current_path() is None
+    assert not trace.exists()
+    assert not textfile.exists()
+
+
+def test_spans_from_other_threads_are_recorded(reports):
+    trace, _ = reports
+
+    @step_timing.timed("solver.claude_api")
+    def solver():
+        return "123456"
+
+    @step_timing.run("xserver_test")
+    def main():
+        thread = threading.Thread(target=solver, name="captcha-Claude API")
+        thread.start()
+        thread.join()
+
+    main()
+    events = _events(trace)
+    assert [event["args"]["path"] for event in events] == ["xserver_test", "solver.claude_api"]
+    assert events[0]["tid"] != events[1]["tid"]